@@ -1,12 +1,12 @@
-from django.db.models import Q
 import django_filters
+from .fuzzy import EMAIL, NAME, fuzzy_q
 from .models import User, Student
 
 
 class LecturerFilter(django_filters.FilterSet):
     username = django_filters.CharFilter(lookup_expr="exact", label="")
     name = django_filters.CharFilter(method="filter_by_name", label="")
-    email = django_filters.CharFilter(lookup_expr="icontains", label="")
+    email = django_filters.CharFilter(method="filter_by_email", label="")
 
     class Meta:
         model = User
@@ -27,9 +27,10 @@ class LecturerFilter(django_filters.FilterSet):
         )
 
     def filter_by_name(self, queryset, name, value):
-        return queryset.filter(
-            Q(first_name__icontains=value) | Q(last_name__icontains=value)
-        )
+        return queryset.filter(fuzzy_q(value, [NAME]))
+
+    def filter_by_email(self, queryset, name, value):
+        return queryset.filter(fuzzy_q(value, [EMAIL]))
 
 
 class StudentFilter(django_filters.FilterSet):
@@ -40,7 +41,7 @@ class StudentFilter(django_filters.FilterSet):
         field_name="student__name", method="filter_by_name", label=""
     )
     email = django_filters.CharFilter(
-        field_name="student__email", lookup_expr="icontains", label=""
+        field_name="student__email", method="filter_by_email", label=""
     )
     program = django_filters.CharFilter(
         field_name="program__title", lookup_expr="icontains", label=""
@@ -73,7 +74,7 @@ class StudentFilter(django_filters.FilterSet):
         )
 
     def filter_by_name(self, queryset, name, value):
-        return queryset.filter(
-            Q(student__first_name__icontains=value)
-            | Q(student__last_name__icontains=value)
-        )
+        return queryset.filter(fuzzy_q(value, [NAME], prefix="student__"))
+
+    def filter_by_email(self, queryset, name, value):
+        return queryset.filter(fuzzy_q(value, [EMAIL], prefix="student__"))
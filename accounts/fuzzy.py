@@ -0,0 +1,159 @@
+"""
+Typo tolerant user lookups.
+
+A query matches a user when enough of its trigrams appear in the searched
+fields, the way pg_trgm's ``word_similarity`` works: every word is lower
+cased and padded with two spaces in front and one behind before being cut
+into trigrams, and the score is the share of the query's trigrams found.
+Misspelt words match when most of their trigrams survive the typo. The
+padding makes word prefixes score well but not infixes such as "ohn" in
+"Johnson", so plain substring matches are always accepted as well.
+
+On PostgreSQL the lookups use pg_trgm through GIN indexes on the searched
+columns. Other databases use ``UserTrigram``, maintained by a signal
+receiver and rebuilt by the ``rebuild_user_trigrams`` command.
+"""
+import math
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, Count, Q
+from django.db.models.expressions import RawSQL
+
+NAME = "name"
+EMAIL = "email"
+USERNAME = "username"
+# Index field -> User columns
+FIELDS = {
+    NAME: ("first_name", "last_name"),
+    EMAIL: ("email",),
+    USERNAME: ("username",),
+}
+ALL_FIELDS = tuple(FIELDS)
+
+THRESHOLD = 0.5
+BATCH_SIZE = 1000
+WORD_RE = re.compile(r"[^\W_]+")
+
+
+def get_threshold():
+    return getattr(settings, "ACCOUNTS_FUZZY_THRESHOLD", THRESHOLD)
+
+
+def trigrams(text):
+    grams = set()
+    for word in WORD_RE.findall((text or "").lower()):
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def user_trigrams(user):
+    """``(field, gram)`` pairs of ``user``"""
+    return {
+        (field, gram)
+        for field, columns in FIELDS.items()
+        for column in columns
+        for gram in trigrams(getattr(user, column))
+    }
+
+
+def uses_pg_trgm(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def _columns(fields):
+    return [column for field in fields for column in FIELDS[field]]
+
+
+def _contains_condition(value, fields):
+    lookups = Q()
+    for column in _columns(fields):
+        lookups |= Q(**{f"{column}__icontains": value})
+    return lookups
+
+
+def _pg_trgm_condition(value, fields):
+    columns = _columns(fields)
+    # Same expression as the GIN indexes, so they serve both lookups
+    similar = " OR ".join(
+        f'%s <%% UPPER("accounts_user"."{column}"::text)' for column in columns
+    )
+    return _contains_condition(value, fields) | Q(
+        RawSQL(f"({similar})", [value] * len(columns), output_field=BooleanField())
+    )
+
+
+def matching_user_ids(value, fields=ALL_FIELDS, using="default"):
+    """Subquery of the ids of the users matching ``value`` in ``fields``"""
+    from .models import User, UserTrigram
+
+    if uses_pg_trgm(using):
+        return (
+            User.objects.using(using)
+            .filter(_pg_trgm_condition(value, fields))
+            .values("pk")
+        )
+
+    grams = trigrams(value)
+    if not grams:
+        return User.objects.none().values("pk")
+    needed = max(math.ceil(len(grams) * get_threshold()), 1)
+    similar = (
+        UserTrigram.objects.using(using)
+        .filter(gram__in=grams, field__in=fields)
+        .values("user_id")
+        .annotate(hits=Count("gram", distinct=True))
+        .filter(hits__gte=needed)
+        .values("user_id")
+    )
+    return (
+        User.objects.using(using)
+        .filter(_contains_condition(value, fields) | Q(pk__in=similar))
+        .values("pk")
+    )
+
+
+def fuzzy_q(value, fields=ALL_FIELDS, prefix=""):
+    """Q matching ``value`` in the user at ``prefix`` (e.g. ``"student__"``)"""
+    return Q(**{f"{prefix}pk__in": matching_user_ids(value, fields)})
+
+
+def index_user(user, using="default"):
+    from .models import UserTrigram
+
+    if uses_pg_trgm(using):
+        return
+    UserTrigram.objects.using(using).filter(user=user).delete()
+    UserTrigram.objects.using(using).bulk_create(
+        UserTrigram(user=user, field=field, gram=gram)
+        for field, gram in user_trigrams(user)
+    )
+
+
+def rebuild_trigrams(batch_size=BATCH_SIZE, using="default"):
+    """Recreate ``UserTrigram``; returns the number of indexed users"""
+    from .models import User, UserTrigram
+
+    if uses_pg_trgm(using):
+        return 0
+    UserTrigram.objects.using(using).all().delete()
+    columns = [column for columns in FIELDS.values() for column in columns]
+    users = User.objects.using(using).only(*columns).order_by("pk")
+    total = 0
+    last_pk = 0
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return total
+        UserTrigram.objects.using(using).bulk_create(
+            (
+                UserTrigram(user=user, field=field, gram=gram)
+                for user in batch
+                for field, gram in user_trigrams(user)
+            ),
+            batch_size=batch_size,
+        )
+        total += len(batch)
+        last_pk = batch[-1].pk
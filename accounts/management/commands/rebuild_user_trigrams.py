@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from accounts.fuzzy import BATCH_SIZE, rebuild_trigrams, uses_pg_trgm
+
+
+class Command(BaseCommand):
+    help = "Recreate the trigram index of the fuzzy user search"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if uses_pg_trgm():
+            self.stdout.write("PostgreSQL maintains the pg_trgm indexes itself")
+            return
+        total = rebuild_trigrams(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{total} users indexed"))
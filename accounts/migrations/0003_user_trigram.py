@@ -0,0 +1,81 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from accounts.fuzzy import FIELDS, user_trigrams
+
+TRGM_COLUMNS = [column for columns in FIELDS.values() for column in columns]
+
+
+def build_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        for column in TRGM_COLUMNS:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS accounts_user_{column}_trgm "
+                f'ON accounts_user USING GIN (UPPER("{column}"::text) gin_trgm_ops)'
+            )
+        return
+
+    User = apps.get_model("accounts", "User")
+    UserTrigram = apps.get_model("accounts", "UserTrigram")
+    batch = []
+    for user in User.objects.only(*TRGM_COLUMNS).iterator(chunk_size=1000):
+        batch.extend(
+            UserTrigram(user_id=user.pk, field=field, gram=gram)
+            for field, gram in user_trigrams(user)
+        )
+        if len(batch) >= 10000:
+            UserTrigram.objects.bulk_create(batch)
+            batch = []
+    UserTrigram.objects.bulk_create(batch)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        for column in TRGM_COLUMNS:
+            schema_editor.execute(f"DROP INDEX IF EXISTS accounts_user_{column}_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserTrigram",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("field", models.CharField(max_length=10)),
+                ("gram", models.CharField(max_length=3)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["gram", "field"], name="accounts_us_gram_b929ba_idx"
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_index, drop_index),
+    ]
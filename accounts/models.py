@@ -7,6 +7,7 @@ from django.db.models import Q
 from PIL import Image
 
 from course.models import Program
+from .fuzzy import fuzzy_q
 from .validators import ASCIIUsernameValidator
 
 
@@ -43,15 +44,8 @@ class CustomUserManager(UserManager):
     def search(self, query=None):
         queryset = self.get_queryset()
         if query is not None:
-            or_lookup = (
-                Q(username__icontains=query)
-                | Q(first_name__icontains=query)
-                | Q(last_name__icontains=query)
-                | Q(email__icontains=query)
-            )
-            queryset = queryset.filter(
-                or_lookup
-            ).distinct()  # distinct() is often necessary with Q lookups
+            # Typo tolerant, and served by trigram indexes
+            queryset = queryset.filter(fuzzy_q(query))
         return queryset
 
     def get_student_count(self):
@@ -210,3 +204,17 @@ class DepartmentHead(models.Model):
 
     def __str__(self):
         return "{}".format(self.user)
+
+
+class UserTrigram(models.Model):
+    """
+    Application-side trigram index of user names, emails and usernames for
+    databases without pg_trgm; see ``accounts.fuzzy``.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    field = models.CharField(max_length=10)
+    gram = models.CharField(max_length=3)
+
+    class Meta:
+        indexes = [models.Index(fields=["gram", "field"])]
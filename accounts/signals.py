@@ -6,6 +6,7 @@ from allauth.account.signals import user_signed_up
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from .models import User, Student, BACHELOR_DEGREE
+from .fuzzy import FIELDS, index_user
 from .utils import (
     generate_student_credentials,
     generate_lecturer_credentials,
@@ -27,16 +28,29 @@ def post_save_account_receiver(sender, instance=None, created=False, *args, **kw
             instance.username = username
             instance.set_password(password)
             instance.save()
-            # Send email with the generated credentials
-            send_new_account_email(instance, password)
+            # Send email with a link to choose the password
+            send_new_account_email(instance)
 
         if instance.is_lecturer:
             username, password = generate_lecturer_credentials()
             instance.username = username
             instance.set_password(password)
             instance.save()
-            # Send email with the generated credentials
-            send_new_account_email(instance, password)
+            # Send email with a link to choose the password
+            send_new_account_email(instance)
+
+
+INDEXED_COLUMNS = {column for columns in FIELDS.values() for column in columns}
+
+
+@receiver(post_save, sender=User)
+def index_user_trigrams(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Keep the fuzzy search trigrams of the user current
+    """
+    if raw or (update_fields and not INDEXED_COLUMNS.intersection(update_fields)):
+        return
+    index_user(instance)
 
 
 @receiver(user_signed_up)
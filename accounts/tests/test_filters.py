@@ -53,3 +53,38 @@ class StudentFilterTestCase(TestCase):
     def test_program_filter(self):
         filter_set = StudentFilter(data={"program__title": "Computer Science"})
         self.assertEqual(len(filter_set.qs), 3)
+
+
+class FuzzySearchTestCase(TestCase):
+    def setUp(self):
+        self.jane = User.objects.create(username="user1", first_name="Jane", last_name="Williams", email="jane.w@example.com")
+        self.alice = User.objects.create(username="user2", first_name="Alice", last_name="Smith", email="alice@school.org")
+
+    def test_misspelt_names_and_emails_match(self):
+        self.assertEqual(list(LecturerFilter(data={"name": "Wiliams"}).qs), [self.jane])
+        self.assertEqual(list(LecturerFilter(data={"name": "smyth"}).qs), [self.alice])
+        self.assertEqual(list(LecturerFilter(data={"email": "schol.org"}).qs), [self.alice])
+        self.assertEqual(list(LecturerFilter(data={"name": "Bob"}).qs), [])
+
+    def test_index_follows_changes(self):
+        self.alice.last_name = "Johnson"
+        self.alice.save()
+        self.assertEqual(list(User.objects.search("johnsen")), [self.alice])
+        self.assertEqual(list(User.objects.search("smith")), [])
+
+    def test_infixes_match(self):
+        self.alice.last_name = "Johnson"
+        self.alice.save()
+        self.assertEqual(list(User.objects.search("ohn")), [self.alice])
+        self.assertEqual(list(User.objects.search("hnso")), [self.alice])
+        self.assertEqual(list(LecturerFilter(data={"email": "school"}).qs), [self.alice])
+
+    def test_lookup_uses_the_trigram_index(self):
+        from django.db import connection
+        from accounts.fuzzy import matching_user_ids
+
+        sql, params = matching_user_ids("Williams").query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("accounts_us_gram", plan)
@@ -1,8 +1,9 @@
 from datetime import datetime
 from django.contrib.auth import get_user_model
 from django.conf import settings
-import threading
-from core.utils import send_html_email
+from django.contrib.sites.models import Site
+from django.urls import reverse
+from core.mail import queue_html_email
 
 
 def generate_password():
@@ -31,32 +32,33 @@ def generate_lecturer_credentials():
     return generate_lecturer_id(), generate_password()
 
 
-class EmailThread(threading.Thread):
-    def __init__(self, subject, recipient_list, template_name, context):
-        self.subject = subject
-        self.recipient_list = recipient_list
-        self.template_name = template_name
-        self.context = context
-        threading.Thread.__init__(self)
+def password_setup_url(user):
+    """Absolute one-time link letting ``user`` choose their password"""
+    from allauth.account.forms import default_token_generator
+    from allauth.account.utils import user_pk_to_url_str
 
-    def run(self):
-        send_html_email(
-            subject=self.subject,
-            recipient_list=self.recipient_list,
-            template=self.template_name,
-            context=self.context,
-        )
+    path = reverse(
+        "account_reset_password_from_key",
+        kwargs={
+            "uidb36": user_pk_to_url_str(user),
+            "key": default_token_generator.make_token(user),
+        },
+    )
+    scheme = "http" if settings.DEBUG else "https"
+    return f"{scheme}://{Site.objects.get_current().domain}{path}"
 
 
-def send_new_account_email(user, password):
+def send_new_account_email(user):
+    # The mail goes through the outbox, so it carries a set-password link that
+    # expires and stops working once used, never the password itself.
     if user.is_student:
         template_name = "accounts/email/new_student_account_confirmation.html"
     else:
         template_name = "accounts/email/new_lecturer_account_confirmation.html"
     email = {
-        "subject": "Your Dj LMS account confirmation and credentials",
+        "subject": "Your Dj LMS account confirmation",
         "recipient_list": [user.email],
-        "template_name": template_name,
-        "context": {"user": user, "password": password},
+        "template": template_name,
+        "context": {"user": user, "password_url": password_setup_url(user)},
     }
-    EmailThread(**email).start()
+    queue_html_email(**email)
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
-from decouple import config
+from decouple import Csv, config
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -152,6 +152,28 @@ else:
         }
     }
 
+# Cache
+# Counters and cached pages are shared by every worker process, so production
+# needs a shared cache such as Redis (``CACHE_URL=redis://host:6379/0``, with
+# the ``redis`` package). Without one each process keeps its own in-memory
+# cache and the features relying on it read the database instead; the
+# ``core.W001`` check warns about it when DEBUG is off.
+CACHE_URL = config("CACHE_URL", default="")
+
+if CACHE_URL.startswith(("redis://", "rediss://")):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # https://docs.djangoproject.com/en/stable/ref/settings/#std:setting-DEFAULT_AUTO_FIELD
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
@@ -235,6 +257,12 @@ EMAIL_HOST_PASSWORD = config("EMAIL_HOST_PASSWORD", default="")
 EMAIL_FROM_ADDRESS = config("EMAIL_FROM_ADDRESS", default="")
 EMAIL_USE_SSL = False
 
+# Notification types that are also emailed right away to the users on
+# immediate delivery who kept the email preference of the type on, e.g.
+# ``NOTIFICATION_EMAIL_TYPES=announcement,reminder``. None by default: the
+# other types are only emailed in the daily and weekly digests.
+NOTIFICATION_EMAIL_TYPES = config("NOTIFICATION_EMAIL_TYPES", default="", cast=Csv())
+
 # crispy config - disabled for minimal deployment
 # CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 # CRISPY_TEMPLATE_PACK = "bootstrap5"
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.models import Group
 
-from .models import Session, Semester, NewsAndEvents
+from .models import Session, Semester, NewsAndEvents, OutboxEmail
 
 # Temporarily using standard ModelAdmin instead of TranslationAdmin
 class NewsAndEventsAdmin(admin.ModelAdmin):
@@ -10,3 +10,12 @@ class NewsAndEventsAdmin(admin.ModelAdmin):
 admin.site.register(Semester)
 admin.site.register(Session)
 admin.site.register(NewsAndEvents, NewsAndEventsAdmin)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ["subject", "status", "attempts", "next_attempt_at", "sent_at"]
+    list_filter = ["status"]
+    search_fields = ["subject"]
+    # Bodies may hold one-time links, keep them out of the admin
+    exclude = ["body", "html_body"]
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+from .utils import cache_is_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Outside of DEBUG the default cache should be shared by every process."""
+    if settings.DEBUG or cache_is_shared():
+        return []
+    return [
+        Warning(
+            "The default cache is local to each process.",
+            hint=(
+                "Set CACHE_URL to a Redis server. Until then the features "
+                "cached there read the database instead."
+            ),
+            id="core.W001",
+        )
+    ]
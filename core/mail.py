@@ -0,0 +1,202 @@
+"""
+Email outbox.
+
+``queue_email``/``queue_html_email`` store messages in ``OutboxEmail`` instead
+of sending them from the request. ``drain_outbox`` claims due messages and
+sends them from a bounded thread pool; each worker thread reuses a single
+backend connection for its whole share. Failed messages are retried with an
+exponential backoff, and ``EMAIL_OUTBOX_RATE_LIMIT`` caps the number of
+messages sent per minute across all workers.
+
+Run the ``send_queued_email`` command as the mail worker. With
+``EMAIL_OUTBOX_AUTO_DRAIN`` (on by default) a process that queues mail also
+starts one background drainer, so nothing waits for the worker in small
+deployments.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import OutboxEmail, QUEUED, SENDING, SENT, FAILED
+
+WORKERS = 4
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+BACKOFF = timedelta(minutes=1)
+MAX_BACKOFF = timedelta(hours=1)
+# A message claimed for longer than this belongs to a worker that died.
+CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+def queue_email(
+    subject, body, recipient_list, html_body="", from_email=None, send_at=None
+):
+    """Put one message in the outbox, to be sent from ``send_at`` on"""
+    email = OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.EMAIL_FROM_ADDRESS,
+        recipients=list(recipient_list),
+        next_attempt_at=send_at or timezone.now(),
+    )
+    if getattr(settings, "EMAIL_OUTBOX_AUTO_DRAIN", True):
+        transaction.on_commit(kick_outbox)
+    return email
+
+
+def queue_html_email(subject, recipient_list, template, context):
+    """Queued counterpart of ``core.utils.send_html_email``"""
+    html_message = render_to_string(template, context)
+    return queue_email(
+        subject, strip_tags(html_message), recipient_list, html_body=html_message
+    )
+
+
+def backoff(attempts):
+    """Delay before retrying a message that failed ``attempts`` times"""
+    return min(BACKOFF * 2 ** (attempts - 1), MAX_BACKOFF)
+
+
+def _claim(limit, now):
+    """Mark up to ``limit`` due messages as being sent and return them"""
+    OutboxEmail.objects.filter(
+        status=SENDING, claimed_at__lt=now - CLAIM_TIMEOUT
+    ).update(status=QUEUED)
+
+    with transaction.atomic():
+        due = OutboxEmail.objects.filter(status=QUEUED, next_attempt_at__lte=now)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        emails = list(due.order_by("next_attempt_at", "id")[:limit])
+        OutboxEmail.objects.filter(pk__in=[e.pk for e in emails]).update(
+            status=SENDING, claimed_at=now
+        )
+    return emails
+
+
+def _send_share(emails):
+    """Send ``emails`` over one connection; return ``(sent ids, {id: error})``"""
+    sent, errors = [], {}
+    backend = get_connection()
+    try:
+        backend.open()
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=email.from_email,
+                to=email.recipients,
+                connection=backend,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, "text/html")
+            try:
+                message.send()
+            except Exception as error:
+                errors[email.pk] = str(error) or error.__class__.__name__
+            else:
+                sent.append(email.pk)
+    except Exception as error:
+        # The connection itself failed, nothing left in this share was sent.
+        for email in emails:
+            if email.pk not in sent:
+                errors.setdefault(email.pk, str(error) or error.__class__.__name__)
+    finally:
+        try:
+            backend.close()
+        except Exception:
+            pass
+    return sent, errors
+
+
+def _record_failures(emails, errors, now):
+    for email in emails:
+        if email.pk not in errors:
+            continue
+        attempts = email.attempts + 1
+        OutboxEmail.objects.filter(pk=email.pk).update(
+            attempts=F("attempts") + 1,
+            status=FAILED if attempts >= MAX_ATTEMPTS else QUEUED,
+            next_attempt_at=now + backoff(attempts),
+            last_error=errors[email.pk],
+        )
+
+
+def rate_allowance(now):
+    """How many messages the per-minute rate limit still allows"""
+    limit = getattr(settings, "EMAIL_OUTBOX_RATE_LIMIT", None)
+    if not limit:
+        return None
+    recent = OutboxEmail.objects.filter(
+        status=SENT, sent_at__gt=now - timedelta(minutes=1)
+    ).count()
+    return max(limit - recent, 0)
+
+
+def drain_outbox(workers=WORKERS, batch_size=BATCH_SIZE):
+    """
+    Send one batch of due messages. Returns ``(sent, failed)`` counts; a
+    batch of 0 messages means the outbox is empty or rate limited.
+    """
+    now = timezone.now()
+    limit = batch_size
+    allowance = rate_allowance(now)
+    if allowance is not None:
+        limit = min(limit, allowance)
+    if not limit:
+        return 0, 0
+
+    emails = _claim(limit, now)
+    if not emails:
+        return 0, 0
+
+    workers = max(min(workers, len(emails)), 1)
+    shares = [emails[index::workers] for index in range(workers)]
+    sent, errors = [], {}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for share_sent, share_errors in executor.map(_send_share, shares):
+            sent.extend(share_sent)
+            errors.update(share_errors)
+
+    now = timezone.now()
+    OutboxEmail.objects.filter(pk__in=sent).update(
+        status=SENT, sent_at=now, last_error=""
+    )
+    _record_failures(emails, errors, now)
+    return len(sent), len(errors)
+
+
+_drainer = None
+_drainer_lock = threading.Lock()
+
+
+class OutboxDrainer(threading.Thread):
+    """Drain the outbox in the background until nothing is due"""
+
+    def __init__(self):
+        threading.Thread.__init__(self, daemon=True)
+
+    def run(self):
+        try:
+            while drain_outbox() != (0, 0):
+                pass
+        finally:
+            close_old_connections()
+
+
+def kick_outbox():
+    """Start the background drainer of this process unless it is running"""
+    global _drainer
+    with _drainer_lock:
+        if _drainer is None or not _drainer.is_alive():
+            _drainer = OutboxDrainer()
+            _drainer.start()
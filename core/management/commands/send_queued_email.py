@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import BATCH_SIZE, WORKERS, drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Send the messages waiting in the email outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=WORKERS,
+            help="Number of sending threads, each with its own connection",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--loop",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, polling the outbox every SECONDS when it is idle",
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = drain_outbox(
+                workers=options["workers"], batch_size=options["batch_size"]
+            )
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["loop"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{total_sent} sent, {total_failed} failed")
+        )
@@ -1,3 +1,155 @@
-from django.test import TestCase
+import base64
+import os
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from django.core import checks, mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .mail import MAX_ATTEMPTS, backoff, drain_outbox, queue_email
+from .models import OutboxEmail, QUEUED, SENT, FAILED, Session
+from .utils import encode_cursor, keyset_paginate
+
+
+class FlakyBackend(EmailBackend):
+    """locmem backend that refuses every message to bad@example.com"""
+
+    def send_messages(self, messages):
+        for message in messages:
+            if "bad@example.com" in message.to:
+                raise ConnectionError("mailbox unavailable")
+        return super().send_messages(messages)
+
+
+class CountingBackend(EmailBackend):
+    """locmem backend that counts the connections opened"""
+
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+class OutboxTests(TestCase):
+    def queue(self, count, to="student@example.com"):
+        return [queue_email(f"Message {n}", "Body", [to]) for n in range(count)]
+
+    def test_drain_sends_every_due_message(self):
+        self.queue(5)
+        self.assertEqual(drain_outbox(workers=2), (5, 0))
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(OutboxEmail.objects.filter(status=SENT).count(), 5)
+        self.assertEqual(drain_outbox(), (0, 0))
+
+    @override_settings(EMAIL_BACKEND="core.tests.CountingBackend")
+    def test_each_worker_reuses_one_connection(self):
+        self.queue(6)
+        CountingBackend.opened = 0
+        self.assertEqual(drain_outbox(workers=2), (6, 0))
+        self.assertEqual(CountingBackend.opened, 2)
+
+    def test_file_backend(self):
+        self.queue(3)
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                EMAIL_BACKEND="django.core.mail.backends.filebased.EmailBackend",
+                EMAIL_FILE_PATH=directory,
+            ):
+                self.assertEqual(drain_outbox(workers=1), (3, 0))
+            (name,) = os.listdir(directory)
+            with open(os.path.join(directory, name)) as written:
+                self.assertEqual(written.read().count("Subject: Message"), 3)
+
+    @override_settings(EMAIL_BACKEND="core.tests.FlakyBackend")
+    def test_failures_are_retried_with_backoff(self):
+        self.queue(2)
+        (bad,) = self.queue(1, to="bad@example.com")
+
+        self.assertEqual(drain_outbox(), (2, 1))
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), (QUEUED, 1))
+        self.assertGreater(bad.next_attempt_at, timezone.now() + backoff(1) - timedelta(seconds=5))
+
+        OutboxEmail.objects.filter(pk=bad.pk).update(
+            attempts=MAX_ATTEMPTS - 1, next_attempt_at=timezone.now()
+        )
+        self.assertEqual(drain_outbox(), (0, 1))
+        bad.refresh_from_db()
+        self.assertEqual(bad.status, FAILED)
+
+    @override_settings(EMAIL_OUTBOX_RATE_LIMIT=3)
+    def test_rate_limit_caps_messages_per_minute(self):
+        self.queue(5)
+        self.assertEqual(drain_outbox(), (3, 0))
+        self.assertEqual(drain_outbox(), (0, 0))
+        self.assertEqual(OutboxEmail.objects.filter(status=QUEUED).count(), 2)
+
+
+class AccountEmailTests(TestCase):
+    def test_new_account_email_has_no_password(self):
+        from unittest import mock
+
+        from accounts.models import User
+
+        with mock.patch(
+            "accounts.signals.generate_student_credentials",
+            return_value=("STU-1", "s3cret-passw0rd"),
+        ):
+            User.objects.create(username="new", email="new@example.com", is_student=True)
+
+        email = OutboxEmail.objects.get()
+        self.assertNotIn("s3cret-passw0rd", email.body + email.html_body)
+        self.assertIn("/auth/password/reset/key/", email.html_body)
+
+
+class SharedCacheCheckTests(TestCase):
+    @override_settings(
+        DEBUG=False,
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    )
+    def test_local_cache_warns_outside_of_debug(self):
+        ids = [message.id for message in checks.run_checks(tags=[checks.Tags.caches])]
+        self.assertIn("core.W001", ids)
+
+    @override_settings(
+        DEBUG=False,
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": tempfile.mkdtemp(),
+            }
+        },
+    )
+    def test_shared_cache_passes(self):
+        ids = [message.id for message in checks.run_checks(tags=[checks.Tags.caches])]
+        self.assertNotIn("core.W001", ids)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        for year in range(2020, 2025):
+            Session.objects.create(session=f"{year}/{year + 1}")
+
+    def test_pages_follow_the_cursor(self):
+        first, cursor = keyset_paginate(Session.objects.all(), per_page=3)
+        second, last = keyset_paginate(Session.objects.all(), cursor, per_page=3)
+        self.assertEqual(len(first) + len(second), 5)
+        self.assertLess(second[0].pk, first[-1].pk)
+        self.assertIsNone(last)
+
+    def test_malformed_cursors_give_the_first_page(self):
+        first, _ = keyset_paginate(Session.objects.all(), per_page=3)
+        for cursor in [
+            "not base64!",
+            base64.urlsafe_b64encode(b"5").decode(),
+            base64.urlsafe_b64encode(b'{"id": 1}').decode(),
+            encode_cursor(["x"]),
+            encode_cursor([None]),
+            encode_cursor([[1]]),
+        ]:
+            with self.subTest(cursor=cursor):
+                page, _ = keyset_paginate(Session.objects.all(), cursor, per_page=3)
+                self.assertEqual(page, first)
@@ -1,4 +1,11 @@
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
 from django.core.mail import send_mail
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
@@ -146,6 +153,89 @@ def get_pagination_context(queryset, request, per_page=10):
     return paginator.get_page(page)
 
 
+class CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder without its millisecond rounding of times."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    """Encode the ordering values of the last row of a page as a cursor."""
+    payload = json.dumps(list(values), cls=CursorEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by ``encode_cursor``; None if it is invalid."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError, AttributeError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _after_cursor(queryset, ordering, fields, values):
+    """Filter ``queryset`` to the rows after the cursor ``values``"""
+    opts = queryset.model._meta
+    values = [
+        opts.get_field(name).to_python(value) for name, value in zip(fields, values)
+    ]
+    after = Q()
+    for index, name in enumerate(ordering):
+        lookup = "lt" if name.startswith("-") else "gt"
+        condition = Q(**{f"{fields[index]}__{lookup}": values[index]})
+        for previous in range(index):
+            condition &= Q(**{fields[previous]: values[previous]})
+        after |= condition
+    return queryset.filter(after)
+
+
+def keyset_paginate(queryset, cursor=None, per_page=20, ordering=("-id",)):
+    """
+    Paginate by key instead of OFFSET.
+
+    ``ordering`` must end with a unique field. Rows after the cursor are
+    selected with a (a < x) OR (a = x AND b < y) ... predicate so every page
+    costs the same single query, and no COUNT is issued.
+
+    Returns a ``(items, next_cursor)`` tuple; ``next_cursor`` is None on the
+    last page.
+    """
+    fields = [name.lstrip("-") for name in ordering]
+    queryset = queryset.order_by(*ordering)
+
+    values = decode_cursor(cursor) if cursor else None
+    if values is not None and len(values) == len(fields):
+        try:
+            queryset = _after_cursor(queryset, ordering, fields, values)
+        except (TypeError, ValueError, ValidationError):
+            # A tampered cursor, served the first page
+            pass
+
+    items = list(queryset[: per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, name) for name in fields)
+    return items, next_cursor
+
+
+# Backends whose entries are only seen by the process that wrote them
+LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def cache_is_shared(alias="default"):
+    """Whether every process of the site reads and writes the same ``alias`` cache."""
+    return settings.CACHES[alias]["BACKEND"] not in LOCAL_CACHE_BACKENDS
+
+
 def add_standard_context(context, title=None, **kwargs):
     """Add standard context variables."""
     if title:
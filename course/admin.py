@@ -10,7 +10,7 @@ class ProgramAdmin(TranslationAdmin):
     search_fields = ['title', 'summary']
 
 class CourseAdmin(TranslationAdmin):
-    list_display = ['title', 'code', 'program', 'level', 'year', 'semester', 'credit']
+    list_display = ['title', 'code', 'program', 'level', 'year', 'semester', 'credit', 'capacity', 'seats_taken']
     list_filter = ['program', 'level', 'year', 'semester', 'is_elective']
     search_fields = ['title', 'code', 'summary']
 
@@ -0,0 +1,178 @@
+"""
+Bulk course allocation.
+
+``allocate_courses`` assigns many courses to many lecturers for a session in
+one transaction: it checks every lecturer and course with one query each,
+bulk creates the allocations the lecturers do not have yet for that session,
+then inserts every missing allocation/course link with a single ``bulk_create``
+on the ``through`` model.
+
+``import_timetable`` reads a department timetable as CSV with the columns
+``lecturer, course`` and optionally ``session``: the username or email of the
+lecturer, the course code and the session name. Lines that do not resolve
+are reported and skipped, the others are allocated all together.
+"""
+import csv
+
+from django.db import transaction
+from django.db.models import Q
+
+from accounts.models import User
+from core.models import Session
+
+from .models import Course, CourseAllocation
+
+CSV_COLUMNS = ["lecturer", "course"]
+
+
+class AllocationError(ValueError):
+    pass
+
+
+def _allocations(lecturer_ids, session_id):
+    """The allocation of each lecturer for the session, created if missing"""
+    allocations = {}
+    existing = CourseAllocation.objects.filter(
+        lecturer_id__in=lecturer_ids, session_id=session_id
+    ).order_by("-pk")
+    for allocation in existing:
+        # Older data may hold several; the first one created is kept
+        allocations[allocation.lecturer_id] = allocation
+    missing = [
+        CourseAllocation(lecturer_id=lecturer_id, session_id=session_id)
+        for lecturer_id in sorted(set(lecturer_ids) - set(allocations))
+    ]
+    if missing:
+        CourseAllocation.objects.bulk_create(missing)
+        if missing[0].pk is None:
+            # Databases that do not return the ids of bulk inserted rows
+            return _allocations(lecturer_ids, session_id)
+        allocations.update(
+            {allocation.lecturer_id: allocation for allocation in missing}
+        )
+    return allocations
+
+
+def allocate_courses(assignments, session=None):
+    """
+    Allocate ``{lecturer id: course ids}`` for ``session``, all or nothing.
+    Returns the number of courses newly allocated.
+    """
+    assignments = {
+        lecturer_id: set(course_ids)
+        for lecturer_id, course_ids in assignments.items()
+        if course_ids
+    }
+    if not assignments:
+        return 0
+    course_ids = set().union(*assignments.values())
+    session_id = session.pk if session is not None else None
+
+    with transaction.atomic():
+        lecturers = set(
+            User.objects.filter(pk__in=assignments, is_lecturer=True).values_list(
+                "pk", flat=True
+            )
+        )
+        if lecturers != set(assignments):
+            raise AllocationError("Some of the selected users are not lecturers.")
+        courses = set(
+            Course.objects.filter(pk__in=course_ids).values_list("pk", flat=True)
+        )
+        if courses != course_ids:
+            raise AllocationError("Some of the selected courses do not exist.")
+
+        allocations = _allocations(list(assignments), session_id)
+        through = CourseAllocation.courses.through
+        linked = set(
+            through.objects.filter(
+                courseallocation_id__in=[a.pk for a in allocations.values()]
+            ).values_list("courseallocation_id", "course_id")
+        )
+        links = []
+        for lecturer_id, course_ids in sorted(assignments.items()):
+            allocation_id = allocations[lecturer_id].pk
+            links.extend(
+                through(courseallocation_id=allocation_id, course_id=course_id)
+                for course_id in sorted(course_ids)
+                if (allocation_id, course_id) not in linked
+            )
+        # The through table is unique on (allocation, course), so concurrent
+        # allocations of the same course cannot link it twice.
+        through.objects.bulk_create(links, ignore_conflicts=True)
+    return len(links)
+
+
+def read_timetable(stream):
+    """
+    Resolve the lines of a timetable CSV. Returns ``(assignments, errors)``
+    with ``assignments`` as ``{session name or None: {lecturer id: course
+    ids}}`` and ``errors`` as a list of ``(line_number, message)``.
+    """
+    reader = csv.DictReader(stream)
+    missing = set(CSV_COLUMNS) - set(reader.fieldnames or ())
+    if missing:
+        raise AllocationError(f"Missing column(s): {', '.join(sorted(missing))}")
+
+    rows = []
+    for number, row in enumerate(reader, 2):
+        rows.append(
+            (
+                number,
+                (row.get("lecturer") or "").strip(),
+                (row.get("course") or "").strip(),
+                (row.get("session") or "").strip() or None,
+            )
+        )
+
+    names = {lecturer for _, lecturer, _, _ in rows}
+    lecturers = {}
+    for pk, username, email in User.objects.filter(
+        Q(username__in=names) | Q(email__in=names), is_lecturer=True
+    ).values_list("pk", "username", "email"):
+        lecturers[username] = pk
+        if email:
+            lecturers.setdefault(email, pk)
+    courses = dict(
+        Course.objects.filter(
+            code__in={course for _, _, course, _ in rows}
+        ).values_list("code", "pk")
+    )
+    sessions = set(
+        Session.objects.filter(
+            session__in={session for _, _, _, session in rows if session}
+        ).values_list("session", flat=True)
+    )
+
+    assignments = {}
+    errors = []
+    for number, lecturer, course, session in rows:
+        if lecturer not in lecturers:
+            errors.append((number, f"Unknown lecturer: {lecturer!r}"))
+        elif course not in courses:
+            errors.append((number, f"Unknown course: {course!r}"))
+        elif session is not None and session not in sessions:
+            errors.append((number, f"Unknown session: {session!r}"))
+        else:
+            assignments.setdefault(session, {}).setdefault(
+                lecturers[lecturer], set()
+            ).add(courses[course])
+    return assignments, errors
+
+
+def import_timetable(stream, session=None):
+    """
+    Allocate the courses of a timetable CSV in one transaction; lines without
+    a session use ``session``. Returns ``(allocated, errors)``.
+    """
+    assignments, errors = read_timetable(stream)
+    sessions = Session.objects.in_bulk(
+        [name for name in assignments if name is not None], field_name="session"
+    )
+    allocated = 0
+    with transaction.atomic():
+        for name, lecturer_courses in assignments.items():
+            allocated += allocate_courses(
+                lecturer_courses, sessions[name] if name is not None else session
+            )
+    return allocated, errors
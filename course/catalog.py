@@ -0,0 +1,84 @@
+"""
+Cached program catalog.
+
+The program list and, for every program, its courses with their credit and
+course counts are read from the cache. Any saved or deleted course or
+program bumps the catalog version once its transaction commits, which
+outdates every cached entry at once; the next reads rebuild them with one
+query each. Without a cache shared by every process, the other processes
+would never see the version change, so the catalog is read from the
+database each time.
+"""
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from core.utils import cache_is_shared
+
+from .models import Course, Program
+
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+CATALOG_VERSION_KEY = "course:catalog:version"
+
+
+def catalog_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, 1, None)
+
+
+def invalidate_catalog():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 1, None)
+
+
+def _cached(name, build):
+    if not cache_is_shared():
+        return build()
+    key = f"course:catalog:{catalog_version()}:{name}"
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+def program_list():
+    """Every program with its ``course_count``, by title"""
+    return _cached(
+        "programs",
+        lambda: list(
+            Program.objects.annotate(course_count=Count("course")).order_by("title")
+        ),
+    )
+
+
+def _program_entry(program_id):
+    program = Program.objects.filter(pk=program_id).first()
+    if program is None:
+        # Cached too, so that unknown ids do not reach the database each time
+        return {}
+    courses = list(
+        Course.objects.filter(program_id=program_id).order_by("-year", "code")
+    )
+    credits_by_term = OrderedDict()
+    for course in sorted(courses, key=lambda course: (course.year, course.semester)):
+        term = (course.year, course.semester)
+        credits_by_term[term] = credits_by_term.get(term, 0) + (course.credit or 0)
+    return {
+        "program": program,
+        "courses": courses,
+        "course_count": len(courses),
+        "credits": sum(course.credit or 0 for course in courses),
+        "credits_by_term": credits_by_term,
+    }
+
+
+def program_catalog(program_id):
+    """
+    ``{"program", "courses", "course_count", "credits", "credits_by_term"}``
+    of a program, ``credits_by_term`` keyed by ``(year, semester)``; None if
+    there is no such program
+    """
+    return _cached(f"program:{program_id}", lambda: _program_entry(program_id)) or None
@@ -1,5 +1,5 @@
-from django.db.models import Q
 import django_filters
+from accounts.fuzzy import NAME, fuzzy_q
 from .models import Program, CourseAllocation, Course
 
 
@@ -39,10 +39,7 @@ class CourseAllocationFilter(django_filters.FilterSet):
         )
 
     def filter_by_lecturer(self, queryset, name, value):
-        return queryset.filter(
-            Q(lecturer__first_name__icontains=value)
-            | Q(lecturer__last_name__icontains=value)
-        )
+        return queryset.filter(fuzzy_q(value, [NAME], prefix="lecturer__"))
 
     def filter_by_course(self, queryset, name, value):
         return queryset.filter(courses__title__icontains=value)
@@ -1,5 +1,6 @@
 from django import forms
 from accounts.models import User
+from core.models import Session
 from .models import Program, Course, CourseAllocation, Upload, UploadVideo
 
 
@@ -56,6 +57,22 @@ class CourseAllocationForm(forms.ModelForm):
         self.fields["lecturer"].queryset = User.objects.filter(is_lecturer=True)
 
 
+class TimetableImportForm(forms.Form):
+    file = forms.FileField(
+        label="Timetable (CSV)",
+        help_text=(
+            "Columns: lecturer (username or email), course (code), "
+            "session (optional)"
+        ),
+    )
+    session = forms.ModelChoiceField(
+        queryset=Session.objects.all(),
+        required=False,
+        label="Session of the lines without one",
+        widget=forms.Select(attrs={"class": "browser-default custom-select"}),
+    )
+
+
 class EditCourseAllocationForm(forms.ModelForm):
     courses = forms.ModelMultipleChoiceField(
         queryset=Course.objects.all().order_by("level"),
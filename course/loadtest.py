@@ -0,0 +1,146 @@
+"""
+Load test of course registration under contention.
+
+``run_load_test`` creates a throwaway program with one capped course and many
+students, has them all register to the course at once from a pool of
+threads, then has some of them drop it while late students register and
+the waitlisted ones submit their registration again, and checks that the course never holds more students than its capacity and
+that every student ended up either registered or on the waitlist. Run it
+with the ``registration_load_test`` command against a database like the
+production one; SQLite serializes every write and proves little.
+"""
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import OperationalError, connection
+
+from accounts.models import Student, User
+from core.models import Semester
+from result.models import TakenCourse
+
+from .models import FIRST, Course, Program, WaitlistEntry
+from .registration import drop_courses, register_courses
+
+# Lock timeouts and deadlock victims are retried like a student clicking again
+RETRIES = 50
+
+
+def _retry(function, *args):
+    for attempt in range(RETRIES):
+        try:
+            return function(*args)
+        except OperationalError:
+            if attempt == RETRIES - 1:
+                raise
+            time.sleep(0.01 * (attempt + 1))
+
+
+def _in_thread(function, *args):
+    # One connection per registration, like one per request
+    try:
+        return _retry(function, *args)
+    finally:
+        connection.close()
+
+
+def _setup(students, capacity):
+    prefix = f"loadtest-{uuid.uuid4().hex[:8]}"
+    program = Program.objects.create(title=prefix)
+    course = Course.objects.create(
+        title=prefix,
+        code=prefix,
+        program=program,
+        level="Bachelor",
+        semester=FIRST,
+        capacity=capacity,
+    )
+    users = User.objects.bulk_create(
+        User(username=f"{prefix}-{number}") for number in range(students)
+    )
+    if users[0].pk is None:
+        users = list(User.objects.filter(username__startswith=f"{prefix}-"))
+    Student.objects.bulk_create(
+        Student(student=user, program=program, level="Bachelor") for user in users
+    )
+    return course, list(
+        Student.objects.filter(program=program).order_by("student__username")
+    )
+
+
+def check(course, students):
+    """The invariants of the seats of ``course``; returns a list of violations"""
+    course.refresh_from_db()
+    holders = set(
+        TakenCourse.objects.filter(course=course).values_list("student_id", flat=True)
+    )
+    waiting = set(
+        WaitlistEntry.objects.filter(course=course).values_list("student_id", flat=True)
+    )
+    problems = []
+    if len(holders) > course.capacity:
+        problems.append(f"{len(holders)} students hold {course.capacity} seats")
+    if course.seats_taken != len(holders):
+        problems.append(
+            f"seats_taken is {course.seats_taken} for {len(holders)} students"
+        )
+    if holders & waiting:
+        problems.append(f"{len(holders & waiting)} students both hold and wait")
+    if len(waiting) and len(holders) < course.capacity:
+        problems.append(f"{len(waiting)} students wait for free seats")
+    missing = {student.pk for student in students} - holders - waiting
+    if missing:
+        problems.append(f"{len(missing)} students neither hold nor wait")
+    return problems
+
+
+def run_load_test(students=200, capacity=50, workers=16, drops=10, keep=False):
+    """
+    Returns ``{"seconds", "registered", "waitlisted", "problems"}``; an empty
+    ``problems`` list means no over-allocation.
+    """
+    course, everyone = _setup(students + drops, capacity)
+    early, late = everyone[:students], everyone[students:]
+    semester = Semester(semester=course.semester)
+
+    def register(student):
+        return _in_thread(register_courses, student, [course.pk], semester)
+
+    def drop(student):
+        return _in_thread(drop_courses, student, [course.pk])
+
+    try:
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            registrations = list(executor.map(register, early))
+            # Drops promote waitlisted students while late students register
+            # and the waitlisted ones try again
+            dropping = [
+                student
+                for student, registration in zip(early, registrations)
+                if registration.registered
+            ][:drops]
+            waiting = [
+                student
+                for student, registration in zip(early, registrations)
+                if registration.waitlisted
+            ]
+            jobs = [executor.submit(drop, student) for student in dropping]
+            jobs += [executor.submit(register, student) for student in late]
+            jobs += [executor.submit(register, student) for student in waiting]
+            for job in jobs:
+                job.result()
+        seconds = time.monotonic() - started
+
+        return {
+            "seconds": seconds,
+            "registered": TakenCourse.objects.filter(course=course).count(),
+            "waitlisted": WaitlistEntry.objects.filter(course=course).count(),
+            "problems": check(
+                course, [student for student in everyone if student not in dropping]
+            ),
+        }
+    finally:
+        if not keep:
+            User.objects.filter(username__startswith=f"{course.code}-").delete()
+            course.program.delete()
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from course.models import WaitlistEntry
+from course.registration import promote_waitlisted, recount_seats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the seats taken in every course from its registrations and "
+        "fill the seats this frees from the waitlists"
+    )
+
+    def handle(self, *args, **options):
+        courses = recount_seats()
+        promoted = 0
+        waiting = WaitlistEntry.objects.values_list("course_id", flat=True).distinct()
+        for course_id in list(waiting):
+            promoted += len(promote_waitlisted(course_id))
+        self.stdout.write(
+            self.style.SUCCESS(f"{courses} courses recounted, {promoted} promoted")
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from course.loadtest import run_load_test
+
+
+class Command(BaseCommand):
+    help = (
+        "Register many students to one capped course concurrently and check "
+        "that it is never over-allocated. Writes, then deletes, test rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=200)
+        parser.add_argument("--capacity", type=int, default=50)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=16,
+            help="Number of registering threads, each with its own connection",
+        )
+        parser.add_argument(
+            "--drops",
+            type=int,
+            default=10,
+            help="Registered students dropping the course while others register",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the test course and students"
+        )
+
+    def handle(self, *args, **options):
+        report = run_load_test(
+            students=options["students"],
+            capacity=options["capacity"],
+            workers=options["workers"],
+            drops=options["drops"],
+            keep=options["keep"],
+        )
+        self.stdout.write(
+            f"{report['registered']} registered, {report['waitlisted']} waitlisted "
+            f"in {report['seconds']:.2f}s"
+        )
+        if report["problems"]:
+            raise CommandError("; ".join(report["problems"]))
+        self.stdout.write(self.style.SUCCESS("No over-allocation"))
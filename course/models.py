@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.conf import settings
 from django.core.validators import FileExtensionValidator
@@ -103,6 +103,11 @@ class Course(models.Model):
     year = models.IntegerField(choices=YEARS, default=0)
     semester = models.CharField(choices=SEMESTER, max_length=200)
     is_elective = models.BooleanField(default=False, blank=True, null=True)
+    capacity = models.PositiveIntegerField(
+        null=True, blank=True, help_text=_("Seats open for registration, empty for no limit")
+    )
+    # Kept by course.registration with conditional UPDATEs, never read-modify-write
+    seats_taken = models.PositiveIntegerField(default=0, editable=False)
 
     objects = CourseManager()
 
@@ -123,6 +128,12 @@ class Course(models.Model):
         else:
             return False
 
+    @property
+    def seats_left(self):
+        if self.capacity is None:
+            return None
+        return max(self.capacity - self.seats_taken, 0)
+
 
 def course_pre_save_receiver(sender, instance, *args, **kwargs):
     if not instance.slug:
@@ -143,6 +154,40 @@ def log_delete(sender, instance, **kwargs):
     ActivityLog.objects.create(message=_(f"The course '{instance}' has been deleted."))
 
 
+@receiver([post_save, post_delete], sender=Program)
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_catalog(sender, instance, **kwargs):
+    from .catalog import invalidate_catalog
+
+    transaction.on_commit(invalidate_catalog)
+
+
+@receiver(post_save, sender=Course)
+def fill_freed_seats(sender, instance, created, **kwargs):
+    # A raised capacity lets students in from the waitlist
+    if not created and instance.capacity is not None:
+        from .registration import promote_waitlisted
+
+        transaction.on_commit(lambda: promote_waitlisted(instance.pk))
+
+
+class WaitlistEntry(models.Model):
+    student = models.ForeignKey("accounts.Student", on_delete=models.CASCADE)
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="waitlist")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["student", "course"], name="unique_waitlist_entry"
+            )
+        ]
+
+    def __str__(self):
+        return "{0} waiting for {1}".format(self.student, self.course)
+
+
 class CourseAllocation(models.Model):
     lecturer = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -0,0 +1,331 @@
+"""
+Course registration and drop.
+
+``register_courses`` checks the whole selection against the courses the
+student may take this semester in one query, then inserts every
+``TakenCourse`` row with a single ``bulk_create``. ``drop_courses`` is one
+filtered DELETE.
+
+Every change to the registrations of a student holds the row lock of that
+student, taken before any other lock, and reads their registrations under
+it. A repeated or concurrent submission therefore waits for the first one
+and finds the courses already registered; the unique (student, course)
+constraint is only a backstop that aborts the whole transaction.
+
+Courses with a ``capacity`` count their registrations in ``seats_taken``. A
+seat is taken by one conditional UPDATE that only matches while the course
+has room: concurrent registrations never read the count to write it back,
+they only wait for the row lock of the course and can never take more seats
+than there are. Seats are taken in course id order, so those waits cannot
+deadlock, and only for rows that are then inserted. Students who find a
+course full join its waitlist, and may leave it with ``leave_waitlist``.
+Once a drop commits, the freed seats go to the oldest waiting students, each
+registered in a transaction of its own that locks the student first.
+
+``registration_summary`` gives the registration page its courses and credit
+totals from one row query and one conditional aggregate, cached per student
+until their registrations or the course catalog change when the cache is
+shared by every process.
+"""
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from accounts.models import Student
+from core.models import Semester
+from core.utils import cache_is_shared
+from result.models import TakenCourse
+
+from .catalog import CATALOG_VERSION_KEY
+from .models import Course, WaitlistEntry
+
+Registration = namedtuple("Registration", "registered waitlisted")
+
+SUMMARY_CACHE_TIMEOUT = 60 * 60
+
+
+class RegistrationError(ValueError):
+    pass
+
+
+def selected_course_ids(data):
+    """Course ids of the checked boxes of a registration or drop form"""
+    return {int(key) for key in data if key.isdigit()}
+
+
+def registrable_courses(student, semester):
+    return Course.objects.filter(
+        program_id=student.program_id,
+        level=student.level,
+        semester=semester.semester,
+    )
+
+
+def _lock(student):
+    # Serializes the registrations of one student, not those of different ones
+    Student.objects.select_for_update().filter(pk=student.pk).exists()
+
+
+def take_seat(course_id):
+    """Take a seat of the course unless it is full, in one conditional UPDATE"""
+    return bool(
+        Course.objects.filter(
+            Q(capacity__isnull=True) | Q(seats_taken__lt=F("capacity")),
+            pk=course_id,
+        ).update(seats_taken=F("seats_taken") + 1)
+    )
+
+
+def release_seats(course_ids):
+    Course.objects.filter(pk__in=course_ids, seats_taken__gt=0).update(
+        seats_taken=F("seats_taken") - 1
+    )
+
+
+def register_courses(student, course_ids, semester=None):
+    """
+    Register ``student`` to ``course_ids`` all at once, or to none of them;
+    the student joins the waitlist of the courses that are full. Returns the
+    ids of the courses registered and waitlisted by this call.
+    """
+    course_ids = set(course_ids)
+    if not course_ids:
+        return Registration(set(), set())
+    semester = semester or Semester.objects.filter(is_current_semester=True).first()
+    if semester is None:
+        raise RegistrationError("No active semester found.")
+
+    with transaction.atomic():
+        _lock(student)
+        allowed = set(
+            registrable_courses(student, semester)
+            .filter(pk__in=course_ids)
+            .values_list("pk", flat=True)
+        )
+        if allowed != course_ids:
+            raise RegistrationError(
+                "Some of the selected courses are not open for registration."
+            )
+        already = set(
+            TakenCourse.objects.filter(
+                student=student, course_id__in=course_ids
+            ).values_list("course_id", flat=True)
+        )
+        # In id order, so that two registrations never wait on each other
+        registered, waitlisted = set(), set()
+        for course_id in sorted(course_ids - already):
+            (registered if take_seat(course_id) else waitlisted).add(course_id)
+
+        # No conflict can drop a row here and leak its seat: every insert
+        # holds the lock of the student and ``already`` was read under it
+        TakenCourse.objects.bulk_create(
+            [
+                TakenCourse(student=student, course_id=course_id)
+                for course_id in sorted(registered)
+            ]
+        )
+        if waitlisted:
+            WaitlistEntry.objects.bulk_create(
+                [
+                    WaitlistEntry(student=student, course_id=course_id)
+                    for course_id in sorted(waitlisted)
+                ],
+                ignore_conflicts=True,
+            )
+        WaitlistEntry.objects.filter(
+            student=student, course_id__in=registered
+        ).delete()
+        invalidate_summaries([student.pk])
+    return Registration(registered, waitlisted)
+
+
+def _promote_next(course_id):
+    """
+    Register the oldest student of the waitlist of the course if it has a
+    free seat. Returns ``(done, student_id)``: ``done`` once the waitlist is
+    empty or the course full, ``student_id`` None if no one was registered.
+    """
+    waiting = (
+        WaitlistEntry.objects.filter(course_id=course_id)
+        .order_by("created_at", "id")
+        .values_list("pk", "student_id")
+        .first()
+    )
+    if waiting is None:
+        return True, None
+    entry_id, student_id = waiting
+    with transaction.atomic():
+        # The same lock order as ``register_courses``: student, then course
+        _lock(Student(pk=student_id))
+        entry = WaitlistEntry.objects.select_for_update().filter(pk=entry_id).first()
+        if entry is None:
+            # Registered, left or promoted meanwhile
+            return False, None
+        taken = TakenCourse.objects.filter(
+            student_id=student_id, course_id=course_id
+        ).exists()
+        if not taken:
+            if not take_seat(course_id):
+                return True, None
+            TakenCourse.objects.create(student_id=student_id, course_id=course_id)
+            invalidate_summaries([student_id])
+        entry.delete()
+    return False, (None if taken else student_id)
+
+
+def promote_waitlisted(course_id):
+    """
+    Register the oldest students of the waitlist of the course while it has
+    free seats. Returns the ids of the students registered.
+    """
+    promoted = []
+    while True:
+        done, student_id = _promote_next(course_id)
+        if student_id is not None:
+            promoted.append(student_id)
+        if done:
+            return promoted
+
+
+def _promote_dropped(course_ids):
+    waiting = WaitlistEntry.objects.filter(course_id__in=course_ids)
+    for course_id in sorted(set(waiting.values_list("course_id", flat=True))):
+        promote_waitlisted(course_id)
+
+
+def drop_courses(student, course_ids):
+    """
+    Drop the registrations of ``student`` to ``course_ids`` and, once that
+    commits, give the seats to the waitlists; returns the count
+    """
+    if not course_ids:
+        return 0
+    with transaction.atomic():
+        _lock(student)
+        held = sorted(
+            TakenCourse.objects.filter(
+                student=student, course_id__in=set(course_ids)
+            ).values_list("course_id", flat=True)
+        )
+        if not held:
+            return 0
+        TakenCourse.objects.filter(student=student, course_id__in=held).delete()
+        invalidate_summaries([student.pk])
+        release_seats(held)
+        # Promoting here would lock other students while holding this one
+        transaction.on_commit(lambda: _promote_dropped(held))
+    return len(held)
+
+
+def leave_waitlist(student, course_ids):
+    """Take ``student`` off the waitlists of ``course_ids``; returns the count"""
+    if not course_ids:
+        return 0
+    with transaction.atomic():
+        _lock(student)
+        left, _ = WaitlistEntry.objects.filter(
+            student=student, course_id__in=set(course_ids)
+        ).delete()
+        if left:
+            invalidate_summaries([student.pk])
+    return left
+
+
+def recount_seats(courses=None):
+    """Set ``seats_taken`` from the registrations, e.g. after editing them by hand"""
+    taken = (
+        TakenCourse.objects.filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    courses = Course.objects.all() if courses is None else courses
+    return courses.update(seats_taken=Coalesce(Subquery(taken), 0))
+
+
+def summary_cache_key(student_id):
+    return f"course:registration:{student_id}"
+
+
+def invalidate_summaries(student_ids):
+    """Forget the cached summaries of ``student_ids`` once the transaction commits"""
+    keys = [summary_cache_key(student_id) for student_id in student_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _summarize(student, semester):
+    courses = Course.objects.filter(level=student.level).annotate(
+        is_registered=Exists(
+            TakenCourse.objects.filter(student=student, course=OuterRef("pk"))
+        ),
+        is_waitlisted=Exists(
+            WaitlistEntry.objects.filter(student=student, course=OuterRef("pk"))
+        ),
+    )
+    own = Q(program_id=student.program_id)
+    registered = Q(is_registered=True)
+    available = own & Q(semester=semester.semester, is_registered=False)
+
+    totals = courses.filter(own | registered).aggregate(
+        all_courses=Count("pk", filter=own),
+        registered=Count("pk", filter=registered),
+        registered_credit=Sum("credit", filter=registered, default=0),
+        first_credit=Sum("credit", filter=available & Q(semester="First"), default=0),
+        second_credit=Sum(
+            "credit", filter=available & Q(semester="Second"), default=0
+        ),
+    )
+    rows = list(courses.filter(available | registered).order_by("year", "pk"))
+    return {
+        "courses": [course for course in rows if not course.is_registered],
+        "registered_courses": [course for course in rows if course.is_registered],
+        "waitlisted_courses": [
+            course
+            for course in rows
+            if course.is_waitlisted and not course.is_registered
+        ],
+        "no_course_is_registered": totals["registered"] == 0,
+        "all_courses_are_registered": totals["registered"] == totals["all_courses"],
+        "total_first_semester_credit": totals["first_credit"],
+        "total_sec_semester_credit": totals["second_credit"],
+        "total_registered_credit": totals["registered_credit"],
+    }
+
+
+def _refresh_seats(courses):
+    # Seats change with every registration, they are never served from the cache
+    capped = [course for course in courses if course.capacity is not None]
+    if capped:
+        seats = dict(
+            Course.objects.filter(pk__in=[course.pk for course in capped]).values_list(
+                "pk", "seats_taken"
+            )
+        )
+        for course in capped:
+            course.seats_taken = seats.get(course.pk, course.seats_taken)
+
+
+def registration_summary(student, semester):
+    """
+    Context of the registration page of ``student`` for ``semester``: the
+    courses open to them, those they registered and the credit totals
+    """
+    if not cache_is_shared():
+        # Registrations in other processes could not invalidate a local copy
+        return _summarize(student, semester)
+
+    key = summary_cache_key(student.pk)
+    cached = cache.get_many([key, CATALOG_VERSION_KEY])
+    stamp = (semester.pk, semester.semester, cached.get(CATALOG_VERSION_KEY))
+    if key in cached and cached[key][0] == stamp:
+        summary = cached[key][1]
+    else:
+        summary = _summarize(student, semester)
+        cache.set(key, (stamp, summary), SUMMARY_CACHE_TIMEOUT)
+    _refresh_seats(summary["courses"])
+    return summary
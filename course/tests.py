@@ -1,3 +1,403 @@
-from django.test import TestCase
+import io
+import json
+import tempfile
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import User, Student
+from core.models import Semester, Session
+from result.models import TakenCourse
+from .allocation import AllocationError, allocate_courses, import_timetable
+from .catalog import program_catalog, program_list
+from .loadtest import run_load_test
+from .models import Program, Course, CourseAllocation, WaitlistEntry
+from .registration import (
+    RegistrationError,
+    drop_courses,
+    leave_waitlist,
+    promote_waitlisted,
+    recount_seats,
+    register_courses,
+    registration_summary,
+)
+
+# The caches below are only used when every process shares them
+shared_cache = override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": tempfile.mkdtemp(),
+        }
+    }
+)
+
+
+class RegistrationTests(TestCase):
+    def setUp(self):
+        Semester.objects.create(semester="First", is_current_semester=True)
+        program = Program.objects.create(title="Physics")
+        self.student = Student.objects.create(
+            student=User.objects.create(username="s1"), program=program, level="Bachelor"
+        )
+        self.courses = [
+            Course.objects.create(
+                title=f"Physics {n}", code=f"PH{n}", program=program,
+                level="Bachelor", semester="First",
+            )
+            for n in range(3)
+        ]
+        self.closed = Course.objects.create(
+            title="Physics 9", code="PH9", program=program, level="Bachelor", semester="Second"
+        )
+        self.ids = {course.pk for course in self.courses}
+
+    def test_register_is_one_insert_and_idempotent(self):
+        # semester, savepoint, student lock, validation, already registered,
+        # a seat per course, insert, waitlist cleanup, release
+        with self.assertNumQueries(11):
+            registration = register_courses(self.student, self.ids)
+        self.assertEqual(registration.registered, self.ids)
+        self.assertEqual(register_courses(self.student, self.ids).registered, set())
+        self.assertEqual(TakenCourse.objects.filter(student=self.student).count(), 3)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            TakenCourse.objects.create(student=self.student, course=self.courses[0])
+
+    def test_invalid_selection_registers_nothing(self):
+        with self.assertRaises(RegistrationError):
+            register_courses(self.student, self.ids | {self.closed.pk})
+        self.assertFalse(TakenCourse.objects.exists())
+
+    def test_drop_is_one_delete(self):
+        register_courses(self.student, self.ids)
+        dropped = [self.courses[0].pk, self.courses[1].pk]
+        # savepoint, student lock, held courses, delete, seats, release; the
+        # waitlists are read once it commits
+        with self.assertNumQueries(6):
+            self.assertEqual(drop_courses(self.student, dropped), 2)
+        self.assertEqual(
+            list(TakenCourse.objects.values_list("course_id", flat=True)),
+            [self.courses[2].pk],
+        )
+
+
+@shared_cache
+class CatalogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.program = Program.objects.create(title="Physics")
+        other = Program.objects.create(title="Chemistry")
+        for n, (year, semester) in enumerate([(1, "First"), (1, "First"), (2, "Second")]):
+            Course.objects.create(
+                title=f"Physics {n}", code=f"PH{n}", program=self.program,
+                year=year, semester=semester, credit=n + 1,
+            )
+        Course.objects.create(title="Chemistry", code="CH1", program=other, credit=9)
+
+    def test_program_catalog(self):
+        # program, courses
+        with self.assertNumQueries(2):
+            catalog = program_catalog(self.program.pk)
+        self.assertEqual(catalog["course_count"], 3)
+        self.assertEqual(catalog["credits"], 6)
+        self.assertEqual(
+            dict(catalog["credits_by_term"]), {(1, "First"): 3, (2, "Second"): 3}
+        )
+        self.assertEqual(catalog["courses"][0].code, "PH2")
+        self.assertIsNone(program_catalog(0))
+        with self.assertNumQueries(0):
+            self.assertEqual(program_catalog(self.program.pk)["credits"], 6)
+            self.assertIsNone(program_catalog(0))
+
+    def test_program_list(self):
+        self.assertEqual(
+            [(p.title, p.course_count) for p in program_list()],
+            [("Chemistry", 1), ("Physics", 3)],
+        )
+
+    def test_changes_invalidate(self):
+        program_catalog(self.program.pk)
+        program_list()
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(
+                title="Physics 3", code="PH3", program=self.program, credit=4
+            )
+        self.assertEqual(program_catalog(self.program.pk)["credits"], 10)
+        self.assertEqual(program_list()[1].course_count, 4)
+
+
+@shared_cache
+class SummaryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.semester = Semester.objects.create(
+            semester="First", is_current_semester=True
+        )
+        program = Program.objects.create(title="Physics")
+        self.student = Student.objects.create(
+            student=User.objects.create(username="s1"), program=program, level="Bachelor"
+        )
+        self.courses = [
+            Course.objects.create(
+                title=f"Physics {n}", code=f"PH{n}", program=program,
+                level="Bachelor", semester="First", credit=n + 1,
+            )
+            for n in range(3)
+        ]
+        Course.objects.create(
+            title="Physics 9", code="PH9", program=program,
+            level="Bachelor", semester="Second", credit=5,
+        )
+
+    def summary(self):
+        return registration_summary(self.student, self.semester)
+
+    def test_two_queries_then_cached(self):
+        with self.assertNumQueries(2):
+            summary = self.summary()
+        self.assertEqual(summary["courses"], self.courses)
+        self.assertEqual(summary["total_first_semester_credit"], 6)
+        self.assertEqual(summary["total_sec_semester_credit"], 0)
+        self.assertTrue(summary["no_course_is_registered"])
+        self.assertFalse(summary["all_courses_are_registered"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.summary()["courses"], self.courses)
+
+    def test_registration_invalidates(self):
+        self.summary()
+        with self.captureOnCommitCallbacks(execute=True):
+            register_courses(self.student, [self.courses[0].pk, self.courses[2].pk])
+        summary = self.summary()
+        self.assertEqual(summary["courses"], [self.courses[1]])
+        self.assertEqual(summary["registered_courses"], [self.courses[0], self.courses[2]])
+        self.assertEqual(summary["total_registered_credit"], 4)
+        self.assertEqual(summary["total_first_semester_credit"], 2)
+        self.assertFalse(summary["no_course_is_registered"])
+
+    def test_course_change_invalidates(self):
+        self.summary()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.courses[1].credit = 10
+            self.courses[1].save()
+        self.assertEqual(self.summary()["total_first_semester_credit"], 14)
+
+    @override_settings(
+        CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    )
+    def test_local_cache_is_not_used(self):
+        self.summary()
+        # Registered by another process, whose invalidation is not seen here
+        TakenCourse.objects.create(student=self.student, course=self.courses[0])
+        self.assertEqual(self.summary()["registered_courses"], [self.courses[0]])
+
+
+class CapacityTests(TestCase):
+    def setUp(self):
+        Semester.objects.create(semester="First", is_current_semester=True)
+        self.program = Program.objects.create(title="Physics")
+        self.course = Course.objects.create(
+            title="Physics 1", code="PH1", program=self.program,
+            level="Bachelor", semester="First", capacity=2,
+        )
+        self.students = [self.student(n) for n in range(4)]
+
+    def student(self, n):
+        return Student.objects.create(
+            student=User.objects.create(username=f"s{n}"),
+            program=self.program,
+            level="Bachelor",
+        )
+
+    def register(self, student):
+        return register_courses(student, [self.course.pk])
+
+    def test_full_course_waitlists(self):
+        for student in self.students:
+            self.register(student)
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.seats_taken, 2)
+        self.assertEqual(self.course.seats_left, 0)
+        self.assertEqual(TakenCourse.objects.count(), 2)
+        self.assertEqual(
+            list(WaitlistEntry.objects.values_list("student", flat=True)),
+            [self.students[2].pk, self.students[3].pk],
+        )
+        # Registering again keeps the place in the queue
+        self.assertEqual(self.register(self.students[3]).waitlisted, {self.course.pk})
+        self.assertEqual(WaitlistEntry.objects.count(), 2)
+
+    def test_drop_promotes_oldest_waiting_student(self):
+        for student in self.students:
+            self.register(student)
+        with self.captureOnCommitCallbacks(execute=True):
+            drop_courses(self.students[0], [self.course.pk])
+
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.seats_taken, 2)
+        self.assertEqual(
+            set(TakenCourse.objects.values_list("student", flat=True)),
+            {self.students[1].pk, self.students[2].pk},
+        )
+        self.assertEqual(
+            list(WaitlistEntry.objects.values_list("student", flat=True)),
+            [self.students[3].pk],
+        )
+
+    def test_promotion_skips_registered_students(self):
+        for student in self.students:
+            self.register(student)
+        # Registered by hand while waiting, e.g. in the admin
+        TakenCourse.objects.create(student=self.students[2], course=self.course)
+        recount_seats()
+        Course.objects.filter(pk=self.course.pk).update(capacity=4)
+
+        self.assertEqual(promote_waitlisted(self.course.pk), [self.students[3].pk])
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.seats_taken, 4)
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_leave_waitlist(self):
+        for student in self.students:
+            self.register(student)
+        self.assertEqual(leave_waitlist(self.students[2], [self.course.pk]), 1)
+        self.assertEqual(leave_waitlist(self.students[2], [self.course.pk]), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            drop_courses(self.students[0], [self.course.pk])
+        self.assertEqual(
+            set(TakenCourse.objects.values_list("student", flat=True)),
+            {self.students[1].pk, self.students[3].pk},
+        )
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+    def test_recount(self):
+        self.register(self.students[0])
+        Course.objects.update(seats_taken=0)
+        recount_seats()
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.seats_taken, 1)
+
+
+class LoadTests(TransactionTestCase):
+    def test_no_over_allocation(self):
+        report = run_load_test(students=12, capacity=5, workers=4, drops=3)
+        self.assertEqual(report["problems"], [])
+        self.assertEqual(report["registered"], 5)
+        self.assertEqual(report["waitlisted"], 7)
+        self.assertFalse(Course.objects.exists())
+
+
+class AllocationTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Physics")
+        self.courses = [
+            Course.objects.create(title=f"Physics {n}", code=f"PH{n}", program=program)
+            for n in range(3)
+        ]
+        self.lecturers = [
+            User.objects.create(username=f"l{n}", email=f"l{n}@example.com", is_lecturer=True)
+            for n in range(2)
+        ]
+        # Lecturers are given generated usernames when created
+        self.names = [
+            User.objects.get(pk=lecturer.pk).username for lecturer in self.lecturers
+        ]
+        self.session = Session.objects.create(session="2026/2027")
+
+    def allocated(self):
+        return {
+            (self.lecturers.index(allocation.lecturer), course.code)
+            for allocation in CourseAllocation.objects.all()
+            for course in allocation.courses.all()
+        }
+
+    def test_allocate_in_one_transaction(self):
+        assignments = {
+            self.lecturers[0].pk: [self.courses[0].pk, self.courses[1].pk],
+            self.lecturers[1].pk: [self.courses[2].pk],
+        }
+        # savepoint, lecturers, courses, allocations, insert allocations,
+        # existing links, insert links, release
+        with self.assertNumQueries(8):
+            self.assertEqual(allocate_courses(assignments, self.session), 3)
+        self.assertEqual(allocate_courses(assignments, self.session), 0)
+        self.assertEqual(CourseAllocation.objects.filter(session=self.session).count(), 2)
+        self.assertEqual(
+            self.allocated(), {(0, "PH0"), (0, "PH1"), (1, "PH2")}
+        )
+
+    def test_invalid_lecturer_allocates_nothing(self):
+        student = User.objects.create(username="s1")
+        with self.assertRaises(AllocationError):
+            allocate_courses(
+                {self.lecturers[0].pk: [self.courses[0].pk], student.pk: [self.courses[1].pk]}
+            )
+        self.assertFalse(CourseAllocation.objects.exists())
+
+    def test_import_timetable(self):
+        stream = io.StringIO(
+            "lecturer,course,session\n"
+            f"{self.names[0]},PH0,2026/2027\n"
+            "l1@example.com,PH1,\n"
+            f"{self.names[1]},PH9,\n"
+            "nobody,PH2,\n"
+        )
+        allocated, errors = import_timetable(stream)
+        self.assertEqual(allocated, 2)
+        self.assertEqual([line for line, _ in errors], [4, 5])
+        self.assertEqual(self.allocated(), {(0, "PH0"), (1, "PH1")})
+        self.assertEqual(
+            CourseAllocation.objects.get(lecturer=self.lecturers[0]).session, self.session
+        )
+
+    def test_form_adds_to_the_existing_allocation(self):
+        allocation = CourseAllocation.objects.create(
+            lecturer=self.lecturers[0], session=self.session
+        )
+        allocation.courses.add(self.courses[0])
+        self.client.force_login(User.objects.create(username="admin", is_superuser=True))
+
+        response = self.client.post(
+            reverse("course_allocation"),
+            {"lecturer": self.lecturers[0].pk, "courses": [self.courses[1].pk]},
+        )
+
+        self.assertRedirects(
+            response, reverse("course_allocation_view"), fetch_redirect_response=False
+        )
+        self.assertEqual(
+            CourseAllocation.objects.get(lecturer=self.lecturers[0]).pk, allocation.pk
+        )
+        self.assertEqual(self.allocated(), {(0, "PH0"), (0, "PH1")})
+
+    def test_form_allocates_new_lecturers_for_the_current_session(self):
+        self.session.is_current_session = True
+        self.session.save()
+        self.client.force_login(User.objects.create(username="admin", is_superuser=True))
+        self.client.post(
+            reverse("course_allocation"),
+            {"lecturer": self.lecturers[1].pk, "courses": [self.courses[2].pk]},
+        )
+        self.assertEqual(
+            CourseAllocation.objects.get(lecturer=self.lecturers[1]).session, self.session
+        )
+
+    def test_bulk_endpoint(self):
+        self.client.force_login(User.objects.create(username="admin", is_superuser=True))
+        url = reverse("bulk_allocate_courses")
+        body = {
+            "session": self.session.pk,
+            "allocations": [
+                {"lecturer": self.lecturers[0].pk, "courses": [self.courses[0].pk]},
+                {"lecturer": self.lecturers[1].pk, "courses": [self.courses[1].pk]},
+            ],
+        }
+        response = self.client.post(url, json.dumps(body), content_type="application/json")
+        self.assertEqual(response.json(), {"allocated": 2})
+        body["allocations"][0]["courses"] = [0]
+        response = self.client.post(url, json.dumps(body), content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(url, "[]", content_type="application/json")
+        self.assertEqual(response.status_code, 400)
@@ -29,6 +29,14 @@ urlpatterns = [
         name="edit_allocated_course",
     ),
     path("course/<int:pk>/deallocate/", deallocate_course, name="course_deallocate"),
+    path(
+        "course/allocations/bulk/", bulk_allocate_courses, name="bulk_allocate_courses"
+    ),
+    path(
+        "course/allocations/import/",
+        import_timetable_view,
+        name="import_timetable",
+    ),
     # File uploads urls
     path(
         "course/<slug>/documentations/upload/",
@@ -69,6 +77,11 @@ urlpatterns = [
     # course registration
     path("course/registration/", course_registration, name="course_registration"),
     path("course/drop/", course_drop, name="course_drop"),
+    path(
+        "course/waitlist/leave/",
+        course_leave_waitlist,
+        name="course_leave_waitlist",
+    ),
     path("my_courses/", user_course_list, name="user_course_list"),
     
     # Video Progress Tracking API URLs
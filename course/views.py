@@ -1,9 +1,14 @@
+import io
+import json
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.db.models import Sum, Avg, Max, Min, Count
 from django.contrib.auth.decorators import login_required
 from django.views.generic import CreateView
 from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_POST
 from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView
@@ -21,9 +26,20 @@ from .forms import (
     EditCourseAllocationForm,
     UploadFormFile,
     UploadFormVideo,
+    TimetableImportForm,
 )
+from .allocation import AllocationError, allocate_courses, import_timetable
+from .catalog import program_catalog, program_list
 from .filters import ProgramFilter, CourseAllocationFilter
 from .models import Program, Course, CourseAllocation, Upload, UploadVideo
+from .registration import (
+    RegistrationError,
+    drop_courses,
+    leave_waitlist,
+    register_courses,
+    registration_summary,
+    selected_course_ids,
+)
 
 
 @method_decorator([login_required, lecturer_required], name="dispatch")
@@ -34,6 +50,13 @@ class ProgramFilterView(FilterView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context["title"] = "Programs"
+        # Same match as the title filter, over the cached catalog
+        title = (self.request.GET.get("title") or "").casefold()
+        context["programs"] = [
+            program
+            for program in program_list()
+            if title in (program.title or "").casefold()
+        ]
         return context
 
 
@@ -65,23 +88,24 @@ def program_add(request):
 
 @login_required
 def program_detail(request, pk):
-    program = Program.objects.get(pk=pk)
-    courses = Course.objects.filter(program_id=pk).order_by("-year")
-    credits = Course.objects.aggregate(Sum("credit"))
-
-    paginator = Paginator(courses, 10)
-    page = request.GET.get("page")
-
-    courses = paginator.get_page(page)
+    catalog = program_catalog(pk)
+    if catalog is None:
+        raise Http404
+    paginator = Paginator(catalog["courses"], 10)
+    courses = paginator.get_page(request.GET.get("page"))
 
     return render(
         request,
         "course/program_single.html",
         {
-            "title": program.title,
-            "program": program,
+            "title": catalog["program"].title,
+            "program": catalog["program"],
             "courses": courses,
-            "credits": credits,
+            "credits": catalog["credits"],
+            "credits_by_term": catalog["credits_by_term"],
+            "current_semester": Semester.objects.filter(
+                is_current_semester=True
+            ).first(),
         },
     )
 
@@ -252,21 +276,23 @@ class CourseAllocationFormView(CreateView):
         return kwargs
 
     def form_valid(self, form):
-        # if a staff has been allocated a course before update it else create new
+        # Adds the courses to the existing allocation of the lecturer, whatever
+        # its session, or to a new one for the current session
         lecturer = form.cleaned_data["lecturer"]
         selected_courses = form.cleaned_data["courses"]
-        courses = ()
-        for course in selected_courses:
-            courses += (course.pk,)
-        # print(courses)
-
-        try:
-            a = CourseAllocation.objects.get(lecturer=lecturer)
-        except:
-            a = CourseAllocation.objects.create(lecturer=lecturer)
-        for i in range(0, selected_courses.count()):
-            a.courses.add(courses[i])
-            a.save()
+        allocation = (
+            CourseAllocation.objects.filter(lecturer=lecturer)
+            .select_related("session")
+            .order_by("pk")
+            .first()
+        )
+        if allocation is not None:
+            session = allocation.session
+        else:
+            session = Session.objects.filter(is_current_session=True).first()
+        allocate_courses(
+            {lecturer.pk: [course.pk for course in selected_courses]}, session
+        )
         return redirect("course_allocation_view")
 
     def get_context_data(self, **kwargs):
@@ -315,6 +341,68 @@ def deallocate_course(request, pk):
     return redirect("course_allocation_view")
 
 
+@login_required
+@lecturer_required
+@require_POST
+def bulk_allocate_courses(request):
+    """
+    Allocate courses to many lecturers at once from a JSON body
+    ``{"session": id or null, "allocations": [{"lecturer": id, "courses": [ids]}]}``
+    """
+    try:
+        data = json.loads(request.body)
+        session_id = data.get("session")
+        assignments = {}
+        for item in data["allocations"]:
+            assignments.setdefault(int(item["lecturer"]), set()).update(
+                int(course_id) for course_id in item["courses"]
+            )
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return JsonResponse({"error": "Invalid allocations"}, status=400)
+
+    session = None
+    if session_id is not None:
+        session = Session.objects.filter(pk=session_id).first()
+        if session is None:
+            return JsonResponse({"error": "Session not found"}, status=404)
+    try:
+        allocated = allocate_courses(assignments, session)
+    except AllocationError as error:
+        return JsonResponse({"error": str(error)}, status=400)
+    return JsonResponse({"allocated": allocated})
+
+
+@login_required
+@lecturer_required
+def import_timetable_view(request):
+    errors = []
+    if request.method == "POST":
+        form = TimetableImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            stream = io.TextIOWrapper(
+                form.cleaned_data["file"].file, encoding="utf-8-sig", newline=""
+            )
+            try:
+                allocated, errors = import_timetable(
+                    stream, session=form.cleaned_data["session"]
+                )
+            except (AllocationError, UnicodeDecodeError) as error:
+                messages.error(request, str(error))
+            else:
+                messages.success(request, f"{allocated} course(s) allocated.")
+                if not errors:
+                    return redirect("course_allocation_view")
+                messages.warning(request, f"{len(errors)} line(s) were skipped.")
+    else:
+        form = TimetableImportForm()
+
+    return render(
+        request,
+        "course/timetable_import_form.html",
+        {"title": "Import Timetable", "form": form, "errors": errors[:100]},
+    )
+
+
 # ########################################################
 
 
@@ -455,17 +543,21 @@ def handle_video_delete(request, slug, video_slug):
 @student_required
 def course_registration(request):
     if request.method == "POST":
-        student = Student.objects.get(student__pk=request.user.id)
-        ids = ()
-        data = request.POST.copy()
-        data.pop("csrfmiddlewaretoken", None)  # remove csrf_token
-        for key in data.keys():
-            ids = ids + (str(key),)
-        for s in range(0, len(ids)):
-            course = Course.objects.get(pk=ids[s])
-            obj = TakenCourse.objects.create(student=student, course=course)
-            obj.save()
-        messages.success(request, "Courses registered successfully!")
+        student = get_object_or_404(Student, student__pk=request.user.id)
+        try:
+            registration = register_courses(student, selected_course_ids(request.POST))
+        except RegistrationError as error:
+            messages.error(request, str(error))
+        else:
+            if registration.registered:
+                messages.success(request, "Courses registered successfully!")
+            if registration.waitlisted:
+                full = Course.objects.filter(pk__in=registration.waitlisted)
+                messages.warning(
+                    request,
+                    "Full, you are on the waitlist of: "
+                    + ", ".join(course.code for course in full),
+                )
         return redirect("course_registration")
     else:
         current_semester = Semester.objects.filter(is_current_semester=True).first()
@@ -473,59 +565,12 @@ def course_registration(request):
             messages.error(request, "No active semester found.")
             return render(request, "course/course_registration.html")
 
-        # student = Student.objects.get(student__pk=request.user.id)
         student = get_object_or_404(Student, student__id=request.user.id)
-        taken_courses = TakenCourse.objects.filter(student__student__id=request.user.id)
-        t = ()
-        for i in taken_courses:
-            t += (i.course.pk,)
-
-        courses = (
-            Course.objects.filter(
-                program__pk=student.program.id,
-                level=student.level,
-                semester=current_semester,
-            )
-            .exclude(id__in=t)
-            .order_by("year")
-        )
-        all_courses = Course.objects.filter(
-            level=student.level, program__pk=student.program.id
-        )
-
-        no_course_is_registered = False  # Check if no course is registered
-        all_courses_are_registered = False
-
-        registered_courses = Course.objects.filter(level=student.level).filter(id__in=t)
-        if (
-            registered_courses.count() == 0
-        ):  # Check if number of registered courses is 0
-            no_course_is_registered = True
-
-        if registered_courses.count() == all_courses.count():
-            all_courses_are_registered = True
-
-        total_first_semester_credit = 0
-        total_sec_semester_credit = 0
-        total_registered_credit = 0
-        for i in courses:
-            if i.semester == "First":
-                total_first_semester_credit += int(i.credit)
-            if i.semester == "Second":
-                total_sec_semester_credit += int(i.credit)
-        for i in registered_courses:
-            total_registered_credit += int(i.credit)
         context = {
             "is_calender_on": True,
-            "all_courses_are_registered": all_courses_are_registered,
-            "no_course_is_registered": no_course_is_registered,
             "current_semester": current_semester,
-            "courses": courses,
-            "total_first_semester_credit": total_first_semester_credit,
-            "total_sec_semester_credit": total_sec_semester_credit,
-            "registered_courses": registered_courses,
-            "total_registered_credit": total_registered_credit,
             "student": student,
+            **registration_summary(student, current_semester),
         }
         return render(request, "course/course_registration.html", context)
 
@@ -534,20 +579,22 @@ def course_registration(request):
 @student_required
 def course_drop(request):
     if request.method == "POST":
-        student = Student.objects.get(student__pk=request.user.id)
-        ids = ()
-        data = request.POST.copy()
-        data.pop("csrfmiddlewaretoken", None)  # remove csrf_token
-        for key in data.keys():
-            ids = ids + (str(key),)
-        for s in range(0, len(ids)):
-            course = Course.objects.get(pk=ids[s])
-            obj = TakenCourse.objects.get(student=student, course=course)
-            obj.delete()
+        student = get_object_or_404(Student, student__pk=request.user.id)
+        drop_courses(student, selected_course_ids(request.POST))
         messages.success(request, "Successfully Dropped!")
         return redirect("course_registration")
 
 
+@login_required
+@student_required
+def course_leave_waitlist(request):
+    if request.method == "POST":
+        student = get_object_or_404(Student, student__pk=request.user.id)
+        leave_waitlist(student, selected_course_ids(request.POST))
+        messages.success(request, "You left the selected waitlists.")
+        return redirect("course_registration")
+
+
 # ########################################################
 
 
@@ -1,8 +1,10 @@
 from django.contrib import admin
+from django.db.models import Count, Q
 from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
-from .models import Notification, NotificationPreference
+from .models import Notification, NotificationPreference, AnnouncementJob, Broadcast
+from .models import publish_broadcast
 
 
 @admin.register(Notification)
@@ -105,12 +107,7 @@ class NotificationAdmin(admin.ModelAdmin):
     actions = ['mark_as_read', 'mark_as_unread', 'delete_selected']
     
     def mark_as_read(self, request, queryset):
-        updated = 0
-        for notification in queryset:
-            if not notification.is_read:
-                notification.mark_as_read()
-                updated += 1
-        
+        updated = queryset.mark_read()
         self.message_user(
             request,
             f'{updated} notification(s) marked as read.'
@@ -118,10 +115,7 @@ class NotificationAdmin(admin.ModelAdmin):
     mark_as_read.short_description = "Mark selected notifications as read"
     
     def mark_as_unread(self, request, queryset):
-        updated = queryset.filter(is_read=True).update(
-            is_read=False,
-            read_at=None
-        )
+        updated = queryset.mark_unread()
         self.message_user(
             request,
             f'{updated} notification(s) marked as unread.'
@@ -224,3 +218,59 @@ class NotificationPreferenceAdmin(admin.ModelAdmin):
             color, enabled, total
         )
     app_notifications_summary.short_description = 'App Notifications'
+
+
+@admin.register(AnnouncementJob)
+class AnnouncementJobAdmin(admin.ModelAdmin):
+    list_display = [
+        'title',
+        'status',
+        'sent_count',
+        'total_recipients',
+        'progress_display',
+        'created_at',
+        'finished_at'
+    ]
+    list_filter = ['status', 'priority', 'created_at']
+    search_fields = ['title', 'message']
+    readonly_fields = [
+        'status',
+        'total_recipients',
+        'sent_count',
+        'last_user_id',
+        'error',
+        'created_at',
+        'updated_at',
+        'started_at',
+        'finished_at'
+    ]
+    
+    def progress_display(self, obj):
+        return f'{obj.progress}%'
+    progress_display.short_description = 'Progress'
+
+
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ['title', 'audience', 'priority', 'read_count', 'created_at']
+    list_filter = ['audience', 'priority', 'created_at']
+    search_fields = ['title', 'message']
+    readonly_fields = ['created_by', 'created_at']
+    date_hierarchy = 'created_at'
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            read_total=Count('receipts', filter=Q(receipts__read_at__isnull=False))
+        )
+    
+    def read_count(self, obj):
+        return obj.read_total
+    read_count.short_description = 'Read by'
+    read_count.admin_order_field = 'read_total'
+    
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        if not change:
+            publish_broadcast()
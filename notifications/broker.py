@@ -0,0 +1,117 @@
+"""
+Publish/subscribe of notification changes for the live notification stream.
+
+Publishers only say *which user* has something new, so a message carries no
+payload and may be dropped or coalesced freely. Subscribers read the actual
+notifications and unread count themselves, from the last id they sent.
+
+``InProcessBroker`` fans messages out to the streams served by the current
+process. Set ``NOTIFICATIONS_BROKER`` to the dotted path of another
+``BaseBroker`` subclass to fan out across processes.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+DEFAULT_BROKER = "notifications.broker.InProcessBroker"
+
+
+class Subscription:
+    """Wake-up flag of one connected stream, owned by its event loop"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+
+    def notify(self):
+        """Wake the stream up; safe to call from any thread"""
+        self.loop.call_soon_threadsafe(self.event.set)
+
+    async def wait(self, timeout):
+        """Return True if woken up, False when ``timeout`` seconds passed"""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+
+class BaseBroker:
+    def subscribe(self, user_id):
+        """Return a ``Subscription`` woken up by ``publish(user_id)``"""
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        raise NotImplementedError
+
+    def publish(self, user_ids):
+        raise NotImplementedError
+
+    def publish_all(self):
+        """Wake up every subscriber, e.g. for a broadcast"""
+        raise NotImplementedError
+
+
+class InProcessBroker(BaseBroker):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_ids):
+        with self._lock:
+            woken = [
+                subscription
+                for user_id in user_ids
+                for subscription in self._subscriptions.get(user_id, ())
+            ]
+        self._notify(woken)
+
+    def publish_all(self):
+        with self._lock:
+            woken = [
+                subscription
+                for subscriptions in self._subscriptions.values()
+                for subscription in subscriptions
+            ]
+        self._notify(woken)
+
+    def _notify(self, woken):
+        for subscription in woken:
+            try:
+                subscription.notify()
+            except RuntimeError:
+                # The stream's event loop has already been closed.
+                self.unsubscribe(subscription)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                path = getattr(settings, "NOTIFICATIONS_BROKER", DEFAULT_BROKER)
+                _broker = import_string(path)()
+    return _broker
@@ -0,0 +1,167 @@
+"""
+Daily and weekly notification digests.
+
+Users whose ``digest_frequency`` is due are selected in one query that also
+leaves out those inside their quiet hours; they are simply picked up by the
+next run. Each batch of users gets its unread notifications of the enabled
+email types in one query, the digest template is compiled once per run, and
+the batch is sent with a single ``send_messages`` call over one SMTP
+connection.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F, Q
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import (
+    Notification,
+    NotificationPreference,
+    PROGRESS_UPDATE,
+    COURSE_COMPLETION,
+    ACHIEVEMENT,
+    ANNOUNCEMENT,
+    REMINDER,
+)
+
+DAILY = 'daily'
+WEEKLY = 'weekly'
+DIGEST_PERIODS = {
+    DAILY: timedelta(days=1),
+    WEEKLY: timedelta(days=7),
+}
+DIGEST_TEMPLATE = 'notifications/email/digest.html'
+DIGEST_MAX_ITEMS = 20
+BATCH_SIZE = 200
+
+# Same mapping as NotificationPreference.should_send_notification
+EMAIL_PREFERENCE_FIELDS = {
+    PROGRESS_UPDATE: 'email_progress_updates',
+    COURSE_COMPLETION: 'email_course_completion',
+    ACHIEVEMENT: 'email_achievements',
+    ANNOUNCEMENT: 'email_announcements',
+    REMINDER: 'email_reminders',
+}
+
+
+def quiet_hours_q(at, prefix=''):
+    """Match preferences whose quiet hours contain the local time ``at``"""
+    start = f'{prefix}quiet_hours_start'
+    end = f'{prefix}quiet_hours_end'
+    same_day = (
+        Q(**{f'{start}__lte': F(end)})
+        & Q(**{f'{start}__lte': at})
+        & Q(**{f'{end}__gt': at})
+    )
+    overnight = Q(**{f'{start}__gt': F(end)}) & (
+        Q(**{f'{start}__lte': at}) | Q(**{f'{end}__gt': at})
+    )
+    return Q(**{f'{start}__isnull': False, f'{end}__isnull': False}) & (same_day | overnight)
+
+
+def email_disabled_q(prefix='recipient__notification_preferences__'):
+    """Match notifications whose type the recipient does not want by email"""
+    disabled = Q()
+    for notification_type, field in EMAIL_PREFERENCE_FIELDS.items():
+        disabled |= Q(notification_type=notification_type, **{f'{prefix}{field}': False})
+    return disabled
+
+
+def due_preferences(frequency, now):
+    """Preferences of the users whose ``frequency`` digest is due at ``now``"""
+    period = DIGEST_PERIODS[frequency]
+    return (
+        NotificationPreference.objects.filter(
+            digest_frequency=frequency,
+            user__is_active=True
+        )
+        .exclude(user__email='')
+        .filter(Q(last_digest_at__isnull=True) | Q(last_digest_at__lte=now - period))
+        .exclude(quiet_hours_q(timezone.localtime(now).time()))
+    )
+
+
+def _digest_message(template, user, notifications, frequency, connection):
+    context = {
+        'user': user,
+        'frequency': frequency,
+        'notifications': notifications[:DIGEST_MAX_ITEMS],
+        'more': max(len(notifications) - DIGEST_MAX_ITEMS, 0),
+    }
+    html_message = template.render(context)
+    message = EmailMultiAlternatives(
+        subject=f'Your {frequency} notification digest ({len(notifications)} new)',
+        body=strip_tags(html_message),
+        from_email=settings.EMAIL_FROM_ADDRESS,
+        to=[user.email],
+        connection=connection
+    )
+    message.attach_alternative(html_message, 'text/html')
+    return message
+
+
+def _send_batch(preferences, frequency, now, template, connection):
+    period = DIGEST_PERIODS[frequency]
+    since = {p.user_id: p.last_digest_at or now - period for p in preferences}
+
+    pending = {user_id: [] for user_id in since}
+    notifications = (
+        Notification.objects.filter(
+            recipient_id__in=list(since),
+            is_read=False,
+            created_at__gt=min(since.values()),
+            created_at__lte=now
+        )
+        .exclude(email_disabled_q())
+        .only('recipient_id', 'title', 'message', 'notification_type', 'created_at', 'action_url')
+        .order_by('recipient_id', '-created_at')
+    )
+    for notification in notifications:
+        if notification.created_at > since[notification.recipient_id]:
+            pending[notification.recipient_id].append(notification)
+
+    messages = [
+        _digest_message(template, preference.user, pending[preference.user_id], frequency, connection)
+        for preference in preferences
+        if pending[preference.user_id]
+    ]
+    sent = connection.send_messages(messages) if messages else 0
+
+    NotificationPreference.objects.filter(
+        pk__in=[preference.pk for preference in preferences]
+    ).update(last_digest_at=now)
+    return sent or 0
+
+
+def send_digests(frequency, now=None, batch_size=BATCH_SIZE, connection=None):
+    """
+    Email the ``frequency`` digest to every user it is due for. Returns the
+    number of digests sent.
+    """
+    now = now or timezone.now()
+    template = get_template(DIGEST_TEMPLATE)
+    connection = connection or get_connection()
+
+    preferences = (
+        due_preferences(frequency, now)
+        .select_related('user')
+        .only('user', 'user__email', 'user__username', 'user__first_name', 'user__last_name', 'last_digest_at')
+        .order_by('pk')
+    )
+
+    sent = 0
+    last_pk = 0
+    connection.open()
+    try:
+        while True:
+            batch = list(preferences.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                break
+            sent += _send_batch(batch, frequency, now, template, connection)
+            last_pk = batch[-1].pk
+    finally:
+        connection.close()
+    return sent
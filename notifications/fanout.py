@@ -0,0 +1,118 @@
+"""
+Fan-out of announcements to every student.
+
+Recipient ids are streamed with ``iterator()`` in id order, students who
+turned in-app announcements off are excluded in the same query, and the
+notifications are inserted in fixed-size batches. Each batch is committed
+together with the job cursor, so a job interrupted by a crash resumes after
+the last student it reached without sending anyone a duplicate.
+"""
+import threading
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    AnnouncementJob,
+    create_announcement_batch,
+    JOB_PENDING,
+    JOB_RUNNING,
+    JOB_DONE,
+    JOB_FAILED,
+)
+
+BATCH_SIZE = 1000
+# A running job whose cursor has not moved for this long is considered dead.
+STALE_AFTER = timedelta(minutes=10)
+
+
+def announcement_recipients(after_id=0):
+    """Ids of the students who accept in-app announcements, in id order"""
+    return (
+        get_user_model().objects.filter(is_student=True, is_active=True, pk__gt=after_id)
+        .exclude(notification_preferences__app_announcements=False)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def claim_job(job_id):
+    """
+    Mark a pending job, or a running job whose worker died, as running.
+    Returns False if another worker holds the job.
+    """
+    now = timezone.now()
+    return bool(
+        AnnouncementJob.objects.filter(pk=job_id)
+        .filter(
+            Q(status=JOB_PENDING)
+            | Q(status=JOB_RUNNING, updated_at__lt=now - STALE_AFTER)
+        )
+        .update(status=JOB_RUNNING, updated_at=now)
+    )
+
+
+def run_announcement_job(job_id, batch_size=BATCH_SIZE):
+    """
+    Send a claimed job from its cursor to the last student, committing
+    progress after every batch. Returns the job.
+    """
+    job = AnnouncementJob.objects.get(pk=job_id)
+    if job.started_at is None:
+        job.started_at = timezone.now()
+        job.total_recipients = announcement_recipients().count()
+        job.save(update_fields=['started_at', 'total_recipients', 'updated_at'])
+    
+    recipients = announcement_recipients(job.last_user_id).iterator(chunk_size=batch_size)
+    try:
+        while True:
+            user_ids = list(islice(recipients, batch_size))
+            if not user_ids:
+                break
+            with transaction.atomic():
+                job.sent_count += create_announcement_batch(
+                    user_ids, job.title, job.message, job.priority
+                )
+                job.last_user_id = user_ids[-1]
+                job.save(update_fields=['sent_count', 'last_user_id', 'updated_at'])
+    except Exception as error:
+        job.status = JOB_FAILED
+        job.error = str(error)
+        job.save(update_fields=['status', 'error', 'updated_at'])
+        raise
+    
+    job.status = JOB_DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at', 'updated_at'])
+    return job
+
+
+class AnnouncementThread(threading.Thread):
+    """Run an announcement job outside the request that created it"""
+    
+    def __init__(self, job_id):
+        self.job_id = job_id
+        threading.Thread.__init__(self, daemon=True)
+    
+    def run(self):
+        try:
+            if claim_job(self.job_id):
+                run_announcement_job(self.job_id)
+        finally:
+            close_old_connections()
+
+
+def start_announcement(title, message, priority, created_by=None):
+    """Queue an announcement to every student and start sending it"""
+    job = AnnouncementJob.objects.create(
+        title=title,
+        message=message,
+        priority=priority,
+        created_by=created_by
+    )
+    transaction.on_commit(lambda: AnnouncementThread(job.pk).start())
+    return job
@@ -0,0 +1,56 @@
+"""
+Django management command to archive and delete old read notifications.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.retention import BATCH_SIZE, get_retention_days, prune_notifications
+
+
+class Command(BaseCommand):
+    help = 'Archives read notifications older than the retention period and deletes them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Retention period in days (default: NOTIFICATIONS_RETENTION_DAYS or 90)',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            help='Directory of the compressed archives (default: NOTIFICATIONS_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--no-archive',
+            action='store_true',
+            help='Delete without writing an archive',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Rows deleted per transaction (default: {BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else get_retention_days()
+        result = prune_notifications(
+            days=days,
+            archive_dir=options['archive_dir'],
+            archive=not options['no_archive'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {result['processed']} notification(s) older than {days} days "
+            f"in {result['seconds']:.1f}s ({result['rate']:.0f} rows/s)"
+        ))
+        if result['archive']:
+            self.stdout.write(f"Archived to {result['archive']}")
@@ -0,0 +1,41 @@
+"""
+Django management command to rebuild the cached unread notification counters.
+"""
+
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from notifications.models import reconcile_unread_counts
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Recounts the cached unread notification counters from the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames',
+            nargs='*',
+            help='Only reconcile these users (default: every user)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of users reconciled per query (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['usernames']:
+            users = users.filter(username__in=options['usernames'])
+
+        user_ids = list(users.values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        for start in range(0, len(user_ids), batch_size):
+            reconcile_unread_counts(user_ids[start:start + batch_size])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Reconciled unread counters of {len(user_ids)} user(s)')
+        )
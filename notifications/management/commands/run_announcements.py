@@ -0,0 +1,41 @@
+"""
+Django management command to send queued announcements and resume interrupted ones.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.fanout import BATCH_SIZE, claim_job, run_announcement_job
+from notifications.models import AnnouncementJob, JOB_PENDING, JOB_RUNNING, JOB_FAILED
+
+
+class Command(BaseCommand):
+    help = 'Sends pending announcements and resumes those whose worker stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Also resume announcements that failed',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Number of notifications inserted per transaction (default: {BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            AnnouncementJob.objects.filter(status=JOB_FAILED).update(status=JOB_PENDING, error='')
+
+        job_ids = AnnouncementJob.objects.filter(
+            status__in=[JOB_PENDING, JOB_RUNNING]
+        ).order_by('created_at').values_list('pk', flat=True)
+
+        for job_id in job_ids:
+            if not claim_job(job_id):
+                continue
+            job = run_announcement_job(job_id, batch_size=options['batch_size'])
+            self.stdout.write(
+                self.style.SUCCESS(f'{job.title}: sent to {job.sent_count} student(s)')
+            )
@@ -0,0 +1,31 @@
+"""
+Django management command to email the daily and weekly notification digests.
+Run it every hour or so; users in their quiet hours are picked up by a later run.
+"""
+
+from django.core.management.base import BaseCommand
+
+from notifications.digest import BATCH_SIZE, DIGEST_PERIODS, send_digests
+
+
+class Command(BaseCommand):
+    help = 'Emails the notification digests that are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frequency',
+            choices=list(DIGEST_PERIODS),
+            help='Only send this digest frequency (default: all)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help=f'Number of users handled per query and SMTP batch (default: {BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        frequencies = [options['frequency']] if options['frequency'] else list(DIGEST_PERIODS)
+        for frequency in frequencies:
+            sent = send_digests(frequency, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} {frequency} digest(s)'))
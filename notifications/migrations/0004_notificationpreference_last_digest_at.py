@@ -0,0 +1,22 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notifications", "0003_broadcast"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="notificationpreference",
+            name="last_digest_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the last notification digest was emailed",
+                null=True,
+            ),
+        ),
+    ]
@@ -1,10 +1,20 @@
-from django.db import models
+from collections import Counter
+from datetime import timedelta
+from itertools import islice
+
+from django.db import models, transaction
+from django.db.models import Count, Exists, OuterRef
 from django.conf import settings
+from django.core.cache import cache
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from core.mail import queue_email
+from core.utils import cache_is_shared
+from .broker import get_broker
+
 # Notification Types
 PROGRESS_UPDATE = 'progress_update'
 COURSE_COMPLETION = 'course_completion'
@@ -40,7 +50,113 @@ PRIORITY_LEVELS = (
 )
 
 
-class NotificationManager(models.Manager):
+TYPE_ICONS = {
+    PROGRESS_UPDATE: 'chart-line',
+    COURSE_COMPLETION: 'graduation-cap',
+    VIDEO_COMPLETION: 'play-circle',
+    ACHIEVEMENT: 'trophy',
+    ANNOUNCEMENT: 'bullhorn',
+    REMINDER: 'clock',
+    MILESTONE: 'flag',
+    WELCOME: 'hand-wave',
+}
+
+TYPE_COLORS = {
+    PROGRESS_UPDATE: 'info',
+    COURSE_COMPLETION: 'success',
+    VIDEO_COMPLETION: 'primary',
+    ACHIEVEMENT: 'warning',
+    ANNOUNCEMENT: 'secondary',
+    REMINDER: 'warning',
+    MILESTONE: 'success',
+    WELCOME: 'primary',
+}
+
+
+def time_since(created_at, now):
+    """Human readable time between ``created_at`` and ``now``"""
+    diff = now - created_at
+    
+    if diff.days > 0:
+        return f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
+    elif diff.seconds > 3600:
+        hours = diff.seconds // 3600
+        return f"{hours} hour{'s' if hours > 1 else ''} ago"
+    elif diff.seconds > 60:
+        minutes = diff.seconds // 60
+        return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
+    else:
+        return "Just now"
+
+
+# Unread counters are kept in the cache and adjusted with incr/decr, so the
+# notification badge costs a single key lookup. A missing key is recomputed
+# from the database on the next read.
+UNREAD_COUNT_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def unread_count_cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def get_unread_count(user):
+    """
+    Number of unread notifications and broadcasts of ``user``, served from
+    the cache when every process shares it and from the database otherwise
+    """
+    if not cache_is_shared():
+        return (
+            Notification.objects.filter(recipient=user, is_read=False).count()
+            + Broadcast.objects.for_user(user).unread_by(user).count()
+        )
+    key = unread_count_cache_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient=user, is_read=False).count()
+        cache.add(key, count, UNREAD_COUNT_CACHE_TIMEOUT)
+    elif count < 0:
+        # Drifted, e.g. counted before a change and adjusted after it
+        count = Notification.objects.filter(recipient=user, is_read=False).count()
+        cache.set(key, count, UNREAD_COUNT_CACHE_TIMEOUT)
+    return count + get_unread_broadcast_count(user)
+
+
+def adjust_unread_counts(deltas):
+    """
+    Add ``{user_id: delta}`` to the cached counters that exist and wake up
+    the live streams of those users, once the transaction commits
+    """
+    changed = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if changed:
+        transaction.on_commit(lambda: _apply_unread_deltas(changed))
+
+
+def _apply_unread_deltas(deltas):
+    for user_id, delta in deltas.items():
+        try:
+            cache.incr(unread_count_cache_key(user_id), delta)
+        except ValueError:
+            # Not cached, the next read counts from the database.
+            pass
+    get_broker().publish(list(deltas))
+
+
+def reconcile_unread_counts(user_ids):
+    """Reset the cached counters of ``user_ids`` from the database"""
+    counts = dict.fromkeys(user_ids, 0)
+    counts.update(
+        Notification.objects.filter(recipient_id__in=user_ids, is_read=False)
+        .values_list('recipient')
+        .annotate(count=Count('id'))
+    )
+    cache.set_many(
+        {unread_count_cache_key(user_id): count for user_id, count in counts.items()},
+        UNREAD_COUNT_CACHE_TIMEOUT
+    )
+    return counts
+
+
+class NotificationQuerySet(models.QuerySet):
     def unread(self):
         """Get unread notifications"""
         return self.filter(is_read=False)
@@ -60,6 +176,65 @@ class NotificationManager(models.Manager):
     def by_type(self, notification_type):
         """Get notifications by type"""
         return self.filter(notification_type=notification_type)
+    
+    def matching(self, notification_type=None, before=None, ids=None):
+        """Narrow down to a type, to those created before a time and/or to ids"""
+        queryset = self
+        if notification_type:
+            queryset = queryset.filter(notification_type=notification_type)
+        if before is not None:
+            queryset = queryset.filter(created_at__lt=before)
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        return queryset
+    
+    def _locked_rows(self, *fields):
+        """``(pk, recipient_id, *fields)`` of the rows, locked until the commit"""
+        return list(
+            self.select_for_update().order_by('pk').values_list('pk', 'recipient_id', *fields)
+        )
+    
+    def update_by_recipient(self, **fields):
+        """
+        Update the rows with one UPDATE; returns ``{recipient_id: rows
+        updated}``. The rows are locked when they are read, so the counts are
+        those of the rows the UPDATE changes.
+        """
+        with transaction.atomic(savepoint=False):
+            rows = self._locked_rows()
+            if rows:
+                # The base manager's plain queryset, without the counters
+                self.model._base_manager.filter(pk__in=[pk for pk, _ in rows]).update(**fields)
+        return dict(Counter(recipient_id for _, recipient_id in rows))
+    
+    def mark_read(self):
+        """Mark every unread notification as read"""
+        updated = self.filter(is_read=False).update_by_recipient(
+            is_read=True, read_at=timezone.now()
+        )
+        adjust_unread_counts({user_id: -count for user_id, count in updated.items()})
+        return sum(updated.values())
+    
+    def mark_unread(self):
+        """Mark every read notification as unread"""
+        updated = self.filter(is_read=True).update_by_recipient(is_read=False, read_at=None)
+        adjust_unread_counts(updated)
+        return sum(updated.values())
+    
+    def delete(self):
+        # The rows are locked when they are read, so the counters only lose
+        # the unread rows that this DELETE removes
+        with transaction.atomic(savepoint=False):
+            rows = self._locked_rows('is_read')
+            deleted = self.model._base_manager.filter(
+                pk__in=[pk for pk, _, _ in rows]
+            ).delete()
+        taken = Counter(recipient_id for _, recipient_id, is_read in rows if not is_read)
+        adjust_unread_counts({user_id: -count for user_id, count in taken.items()})
+        return deleted
+
+
+NotificationManager = models.Manager.from_queryset(NotificationQuerySet)
 
 
 class Notification(models.Model):
@@ -157,6 +332,8 @@ class Notification(models.Model):
         help_text=_("Bootstrap color class")
     )
     
+    is_broadcast = False
+    
     objects = NotificationManager()
     
     class Meta:
@@ -170,12 +347,29 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.title} - {self.recipient.username}"
     
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        super().save(*args, **kwargs)
+        if adding and not self.is_read:
+            adjust_unread_counts({self.recipient_id: 1})
+    
+    def delete(self, *args, **kwargs):
+        # The row, not this possibly stale instance, tells whether it was unread
+        with transaction.atomic():
+            taken = Notification.objects.filter(pk=self.pk, is_read=False).update(is_read=True)
+            deleted = super().delete(*args, **kwargs)
+        adjust_unread_counts({self.recipient_id: -taken})
+        return deleted
+    
     def mark_as_read(self):
         """Mark notification as read"""
         if not self.is_read:
             self.is_read = True
             self.read_at = timezone.now()
-            self.save(update_fields=['is_read', 'read_at'])
+            updated = Notification.objects.filter(pk=self.pk, is_read=False).update(
+                is_read=True, read_at=self.read_at
+            )
+            adjust_unread_counts({self.recipient_id: -updated})
     
     def mark_as_sent(self):
         """Mark notification as sent"""
@@ -187,19 +381,7 @@ class Notification(models.Model):
     @property
     def time_since_created(self):
         """Human readable time since creation"""
-        now = timezone.now()
-        diff = now - self.created_at
-        
-        if diff.days > 0:
-            return f"{diff.days} day{'s' if diff.days > 1 else ''} ago"
-        elif diff.seconds > 3600:
-            hours = diff.seconds // 3600
-            return f"{hours} hour{'s' if hours > 1 else ''} ago"
-        elif diff.seconds > 60:
-            minutes = diff.seconds // 60
-            return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
-        else:
-            return "Just now"
+        return time_since(self.created_at, timezone.now())
     
     @property
     def priority_badge_class(self):
@@ -215,32 +397,12 @@ class Notification(models.Model):
     @property
     def type_icon(self):
         """Get icon based on notification type"""
-        type_icons = {
-            PROGRESS_UPDATE: 'chart-line',
-            COURSE_COMPLETION: 'graduation-cap',
-            VIDEO_COMPLETION: 'play-circle',
-            ACHIEVEMENT: 'trophy',
-            ANNOUNCEMENT: 'bullhorn',
-            REMINDER: 'clock',
-            MILESTONE: 'flag',
-            WELCOME: 'hand-wave',
-        }
-        return type_icons.get(self.notification_type, self.icon)
+        return TYPE_ICONS.get(self.notification_type, self.icon)
     
     @property
     def type_color(self):
         """Get color based on notification type"""
-        type_colors = {
-            PROGRESS_UPDATE: 'info',
-            COURSE_COMPLETION: 'success',
-            VIDEO_COMPLETION: 'primary',
-            ACHIEVEMENT: 'warning',
-            ANNOUNCEMENT: 'secondary',
-            REMINDER: 'warning',
-            MILESTONE: 'success',
-            WELCOME: 'primary',
-        }
-        return type_colors.get(self.notification_type, self.color)
+        return TYPE_COLORS.get(self.notification_type, self.color)
 
 
 class NotificationPreference(models.Model):
@@ -322,12 +484,40 @@ class NotificationPreference(models.Model):
         help_text=_("End of quiet hours")
     )
     
+    last_digest_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text=_("When the last notification digest was emailed")
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Notification preferences for {self.user.username}"
     
+    def in_quiet_hours(self, at):
+        """Whether the local time ``at`` falls in the quiet hours"""
+        start, end = self.quiet_hours_start, self.quiet_hours_end
+        if start is None or end is None:
+            return False
+        if start <= end:
+            return start <= at < end
+        return at >= start or at < end
+    
+    def quiet_hours_end_after(self, now):
+        """The end of the quiet hours ``now`` falls in"""
+        local = timezone.localtime(now)
+        end = local.replace(
+            hour=self.quiet_hours_end.hour,
+            minute=self.quiet_hours_end.minute,
+            second=0,
+            microsecond=0
+        )
+        if end <= local:
+            end += timedelta(days=1)
+        return end
+    
     def should_send_notification(self, notification_type, delivery_method='app'):
         """Check if notification should be sent based on preferences"""
         if delivery_method == 'email':
@@ -350,6 +540,246 @@ class NotificationPreference(models.Model):
             return app_prefs.get(notification_type, True)
 
 
+# Announcement job status
+JOB_PENDING = 'pending'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+JOB_STATUS = (
+    (JOB_PENDING, _('Pending')),
+    (JOB_RUNNING, _('Running')),
+    (JOB_DONE, _('Done')),
+    (JOB_FAILED, _('Failed')),
+)
+
+
+class AnnouncementJob(models.Model):
+    """
+    An announcement being fanned out to every student in the background.
+    ``last_user_id`` is committed together with each batch of notifications,
+    so an interrupted job resumes after the last student it reached.
+    """
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    priority = models.CharField(
+        max_length=10,
+        choices=PRIORITY_LEVELS,
+        default=MEDIUM
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='announcement_jobs'
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=JOB_STATUS,
+        default=JOB_PENDING
+    )
+    total_recipients = models.PositiveIntegerField(default=0)
+    sent_count = models.PositiveIntegerField(default=0)
+    last_user_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.title} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        """Percentage of the recipients reached so far"""
+        if self.status == JOB_DONE:
+            return 100
+        if not self.total_recipients:
+            return 0
+        return min(round(self.sent_count * 100 / self.total_recipients), 100)
+
+
+# Broadcast audiences
+AUDIENCE_ALL = 'all'
+AUDIENCE_STUDENTS = 'students'
+AUDIENCE_LECTURERS = 'lecturers'
+
+AUDIENCES = (
+    (AUDIENCE_ALL, _('Everyone')),
+    (AUDIENCE_STUDENTS, _('Students')),
+    (AUDIENCE_LECTURERS, _('Lecturers')),
+)
+
+# Bumped on every new broadcast so cached unread broadcast counts expire.
+BROADCAST_VERSION_KEY = 'notifications:broadcast_version'
+
+
+class BroadcastQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Broadcasts addressed to ``user`` since they joined, minus deleted ones"""
+        audiences = [AUDIENCE_ALL]
+        if user.is_student:
+            audiences.append(AUDIENCE_STUDENTS)
+        if user.is_lecturer:
+            audiences.append(AUDIENCE_LECTURERS)
+        return self.filter(
+            audience__in=audiences,
+            created_at__gte=user.date_joined
+        ).exclude(
+            Exists(BroadcastReceipt.objects.filter(
+                broadcast=OuterRef('pk'), user=user, deleted=True
+            ))
+        ).exclude(
+            Exists(NotificationPreference.objects.filter(
+                user=user, app_announcements=False
+            ))
+        )
+    
+    def with_read_state(self, user):
+        """Annotate ``is_read`` for ``user``"""
+        return self.annotate(is_read=Exists(BroadcastReceipt.objects.filter(
+            broadcast=OuterRef('pk'), user=user, read_at__isnull=False
+        )))
+    
+    def unread_by(self, user):
+        return self.with_read_state(user).filter(is_read=False)
+
+
+class Broadcast(models.Model):
+    """
+    An announcement stored once for a whole audience. Per-user state lives in
+    ``BroadcastReceipt`` rows, which only exist once a user read or deleted
+    the broadcast.
+    """
+    title = models.CharField(max_length=200)
+    message = models.TextField()
+    priority = models.CharField(
+        max_length=10,
+        choices=PRIORITY_LEVELS,
+        default=MEDIUM
+    )
+    audience = models.CharField(
+        max_length=10,
+        choices=AUDIENCES,
+        default=AUDIENCE_STUDENTS
+    )
+    action_url = models.URLField(blank=True, null=True)
+    icon = models.CharField(max_length=50, default='bullhorn')
+    color = models.CharField(max_length=20, default='info')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='broadcasts'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    notification_type = ANNOUNCEMENT
+    is_broadcast = True
+    
+    objects = BroadcastQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.title} ({self.get_audience_display()})"
+
+
+class BroadcastReceipt(models.Model):
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='broadcast_receipts'
+    )
+    read_at = models.DateTimeField(null=True, blank=True)
+    deleted = models.BooleanField(default=False)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['broadcast', 'user'], name='unique_broadcast_receipt'),
+        ]
+    
+    def __str__(self):
+        return f"{self.broadcast_id} - {self.user_id}"
+
+
+def broadcast_count_cache_key(user_id):
+    version = cache.get_or_set(BROADCAST_VERSION_KEY, 1, None)
+    return f'notifications:unread_broadcasts:{user_id}:{version}'
+
+
+def get_unread_broadcast_count(user):
+    key = broadcast_count_cache_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Broadcast.objects.for_user(user).unread_by(user).count()
+        cache.add(key, count, UNREAD_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def create_broadcast(title, message, audience=AUDIENCE_STUDENTS, priority=MEDIUM, **kwargs):
+    """Announce to a whole audience with a single row"""
+    broadcast = Broadcast.objects.create(
+        title=title,
+        message=message,
+        audience=audience,
+        priority=priority,
+        **kwargs
+    )
+    publish_broadcast()
+    return broadcast
+
+
+def publish_broadcast():
+    """Expire every cached unread broadcast count and wake up live streams"""
+    try:
+        cache.incr(BROADCAST_VERSION_KEY)
+    except ValueError:
+        cache.set(BROADCAST_VERSION_KEY, 2, None)
+    transaction.on_commit(lambda: get_broker().publish_all())
+
+
+def _update_receipts(user, broadcast_ids, **fields):
+    """Set ``fields`` on the receipts of ``user``, creating missing ones"""
+    broadcast_ids = list(broadcast_ids)
+    if not broadcast_ids:
+        return
+    with transaction.atomic():
+        BroadcastReceipt.objects.bulk_create(
+            [BroadcastReceipt(broadcast_id=pk, user=user) for pk in broadcast_ids],
+            ignore_conflicts=True
+        )
+        BroadcastReceipt.objects.filter(
+            user=user, broadcast_id__in=broadcast_ids
+        ).update(**fields)
+    cache.delete(broadcast_count_cache_key(user.pk))
+    transaction.on_commit(lambda: get_broker().publish([user.pk]))
+
+
+def mark_broadcasts_read(user, broadcasts):
+    """Mark the unread ``broadcasts`` of ``user`` as read; returns how many"""
+    broadcast_ids = list(broadcasts.unread_by(user).values_list('pk', flat=True))
+    _update_receipts(user, broadcast_ids, read_at=timezone.now())
+    return len(broadcast_ids)
+
+
+def delete_broadcasts(user, broadcasts):
+    """Hide ``broadcasts`` from ``user``; returns how many"""
+    broadcast_ids = list(broadcasts.values_list('pk', flat=True))
+    _update_receipts(user, broadcast_ids, deleted=True)
+    return len(broadcast_ids)
+
+
 # Signal to create notification preferences for new users
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_notification_preferences(sender, instance, created, **kwargs):
@@ -357,6 +787,37 @@ def create_notification_preferences(sender, instance, created, **kwargs):
         NotificationPreference.objects.get_or_create(user=instance)
 
 
+# Preferences are read on every notification created, so they are cached
+# per user and invalidated whenever they are saved. Only a cache shared by
+# every process sees those invalidations.
+PREFERENCES_CACHE_TIMEOUT = 60 * 60
+
+
+def preferences_cache_key(user_id):
+    return f'notifications:preferences:{user_id}'
+
+
+def get_preferences(user_id):
+    """Notification preferences of a user, defaults if they have none"""
+    shared = cache_is_shared()
+    key = preferences_cache_key(user_id)
+    preferences = cache.get(key) if shared else None
+    if preferences is None:
+        preferences = (
+            NotificationPreference.objects.filter(user_id=user_id).first()
+            or NotificationPreference(user_id=user_id)
+        )
+        if shared:
+            cache.set(key, preferences, PREFERENCES_CACHE_TIMEOUT)
+    return preferences
+
+
+@receiver([post_save, post_delete], sender=NotificationPreference)
+def invalidate_preferences(sender, instance, **kwargs):
+    key = preferences_cache_key(instance.user_id)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
 # Utility Functions for Creating Notifications
 def create_notification(
     recipient,
@@ -371,23 +832,43 @@ def create_notification(
     color=None
 ):
     """
-    Utility function to create notifications
+    Utility function to create notifications, as far as the recipient's
+    preferences allow. Returns None when in-app notifications of this type
+    are turned off. For the types listed in ``NOTIFICATION_EMAIL_TYPES``,
+    users on immediate delivery also get an email copy through the outbox,
+    held back until their quiet hours are over.
     """
-    notification = Notification.objects.create(
-        recipient=recipient,
-        title=title,
-        message=message,
-        notification_type=notification_type,
-        priority=priority,
-        related_course=related_course,
-        related_video=related_video,
-        action_url=action_url,
-        icon=icon or 'bell',
-        color=color or 'primary'
-    )
+    preferences = get_preferences(recipient.pk)
+    now = timezone.now()
+    
+    notification = None
+    if preferences.should_send_notification(notification_type, 'app'):
+        # In-app notifications are delivered by being stored
+        notification = Notification.objects.create(
+            recipient=recipient,
+            title=title,
+            message=message,
+            notification_type=notification_type,
+            priority=priority,
+            related_course=related_course,
+            related_video=related_video,
+            action_url=action_url,
+            icon=icon or 'bell',
+            color=color or 'primary',
+            is_sent=True,
+            sent_at=now
+        )
     
-    # Mark as sent immediately for in-app notifications
-    notification.mark_as_sent()
+    if (
+        recipient.email
+        and notification_type in settings.NOTIFICATION_EMAIL_TYPES
+        and preferences.digest_frequency == 'immediate'
+        and preferences.should_send_notification(notification_type, 'email')
+    ):
+        send_at = None
+        if preferences.in_quiet_hours(timezone.localtime(now).time()):
+            send_at = preferences.quiet_hours_end_after(now)
+        queue_email(title, message, [recipient.email], send_at=send_at)
     
     return notification
 
@@ -469,27 +950,40 @@ def create_welcome_notification(student):
     )
 
 
-def bulk_create_announcement(title, message, users=None, priority=MEDIUM):
-    """Create announcement for multiple users"""
+def create_announcement_batch(user_ids, title, message, priority=MEDIUM):
+    """Insert one announcement per user id; returns the number created"""
+    Notification.objects.bulk_create([
+        Notification(
+            recipient_id=user_id,
+            title=title,
+            message=message,
+            notification_type=ANNOUNCEMENT,
+            priority=priority,
+            icon='bullhorn',
+            color='info'
+        )
+        for user_id in user_ids
+    ])
+    adjust_unread_counts(dict.fromkeys(user_ids, 1))
+    return len(user_ids)
+
+
+def bulk_create_announcement(title, message, users=None, priority=MEDIUM, batch_size=1000):
+    """Create announcement for multiple users, inserting in fixed-size batches"""
     if users is None:
         from accounts.models import User
         users = User.objects.filter(is_student=True)
     
-    notifications = []
-    for user in users:
-        notifications.append(
-            Notification(
-                recipient=user,
-                title=title,
-                message=message,
-                notification_type=ANNOUNCEMENT,
-                priority=priority,
-                icon='bullhorn',
-                color='info'
-            )
-        )
+    if isinstance(users, models.QuerySet):
+        user_ids = users.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=batch_size)
+    else:
+        user_ids = (user.pk for user in users)
     
-    # Bulk create for efficiency
-    Notification.objects.bulk_create(notifications)
+    count = 0
+    while True:
+        batch = list(islice(user_ids, batch_size))
+        if not batch:
+            break
+        count += create_announcement_batch(batch, title, message, priority)
     
-    return len(notifications)
+    return count
@@ -0,0 +1,108 @@
+"""
+Retention of old notifications.
+
+Read notifications older than the retention period are removed in small
+batches walked in id order, each in its own short transaction, so pruning
+runs online next to normal traffic. Before a batch is deleted its rows are
+appended to a gzip compressed JSON Lines archive; a crash between the two
+steps can repeat rows in the archive but never lose one.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Notification
+
+RETENTION_DAYS = 90
+BATCH_SIZE = 1000
+ARCHIVE_FIELDS = (
+    'id', 'recipient_id', 'title', 'message', 'notification_type', 'priority',
+    'is_read', 'is_sent', 'created_at', 'read_at', 'sent_at',
+    'related_course_id', 'related_video_id', 'action_url', 'icon', 'color',
+)
+
+
+def get_retention_days():
+    return getattr(settings, 'NOTIFICATIONS_RETENTION_DAYS', RETENTION_DAYS)
+
+
+def get_archive_dir():
+    return getattr(
+        settings,
+        'NOTIFICATIONS_ARCHIVE_DIR',
+        os.path.join(settings.BASE_DIR, 'archive', 'notifications')
+    )
+
+
+def expired_notifications(days, now=None):
+    """Read notifications created more than ``days`` days ago"""
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    return Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+
+def prune_notifications(days=None, archive_dir=None, archive=True,
+                        batch_size=BATCH_SIZE, pause=0, now=None):
+    """
+    Archive and delete expired notifications. ``pause`` seconds are slept
+    between batches to leave room for other writers. Returns a dict with the
+    number of rows processed, the elapsed seconds, the rate and the archive
+    path.
+    """
+    days = get_retention_days() if days is None else days
+    now = now or timezone.now()
+    expired = expired_notifications(days, now).order_by('id')
+
+    path = None
+    archive_file = None
+    if archive:
+        archive_dir = archive_dir or get_archive_dir()
+        os.makedirs(archive_dir, exist_ok=True)
+        path = os.path.join(
+            archive_dir, f"notifications-{now:%Y%m%d-%H%M%S}.jsonl.gz"
+        )
+
+    processed = 0
+    last_id = 0
+    started = time.monotonic()
+    try:
+        while True:
+            rows = list(
+                expired.filter(id__gt=last_id).values(*ARCHIVE_FIELDS)[:batch_size]
+            )
+            if not rows:
+                break
+            if archive:
+                if archive_file is None:
+                    archive_file = gzip.open(path, 'at', encoding='utf-8')
+                archive_file.writelines(
+                    json.dumps(row, cls=DjangoJSONEncoder) + '\n' for row in rows
+                )
+                archive_file.flush()
+
+            ids = [row['id'] for row in rows]
+            with transaction.atomic():
+                # Re-check the filter in case a row was marked unread meanwhile.
+                expired.filter(id__in=ids).delete()
+
+            processed += len(rows)
+            last_id = ids[-1]
+            if pause:
+                time.sleep(pause)
+    finally:
+        if archive_file is not None:
+            archive_file.close()
+
+    elapsed = time.monotonic() - started
+    return {
+        'processed': processed,
+        'seconds': elapsed,
+        'rate': processed / elapsed if elapsed else 0.0,
+        'archive': path if processed and archive else None,
+    }
@@ -1,3 +1,537 @@
-from django.test import TestCase
+import gzip
+import io
+import json
+import tempfile
+from datetime import timedelta
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import OutboxEmail
+from course.models import Program, Course
+from .broker import InProcessBroker
+from .digest import send_digests
+from .retention import prune_notifications
+from .fanout import claim_job, run_announcement_job
+from .models import (
+    AnnouncementJob,
+    BroadcastReceipt,
+    create_broadcast,
+    Notification,
+    NotificationPreference,
+    bulk_create_announcement,
+    create_notification,
+    get_preferences,
+    get_unread_count,
+    unread_count_cache_key,
+    ANNOUNCEMENT,
+    REMINDER,
+    JOB_PENDING,
+    JOB_RUNNING,
+    JOB_DONE,
+    AUDIENCE_ALL,
+    AUDIENCE_STUDENTS,
+)
+from .views import MergedFeed, NotificationListView, _event_stream, _parse_stream_cursor
+
+User = get_user_model()
+
+# The unread counters are only cached in a cache shared by every process
+shared_cache = override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(),
+    }
+})
+
+
+class NotificationTestMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='student', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        for notification_type in (ANNOUNCEMENT, ANNOUNCEMENT, REMINDER):
+            Notification.objects.create(
+                recipient=self.user,
+                title='Title',
+                message='Message',
+                notification_type=notification_type
+            )
+        Notification.objects.create(recipient=self.other, title='Title', message='Message')
+
+
+class BulkNotificationTests(NotificationTestMixin, TestCase):
+    def test_mark_read_is_a_single_update(self):
+        # the locked rows, one UPDATE
+        with self.assertNumQueries(2):
+            updated = Notification.objects.for_user(self.user).mark_read()
+        self.assertEqual(updated, 3)
+        self.assertFalse(Notification.objects.filter(recipient=self.user, read_at=None).exists())
+        self.assertEqual(Notification.objects.for_user(self.other).unread().count(), 1)
+        self.assertEqual(Notification.objects.for_user(self.user).mark_unread(), 3)
+
+    def test_bulk_changes_across_users_are_one_statement(self):
+        # the locked rows, one UPDATE or DELETE whatever the number of users
+        with self.assertNumQueries(2):
+            self.assertEqual(Notification.objects.all().mark_read(), 4)
+        with self.assertNumQueries(2):
+            self.assertEqual(Notification.objects.by_type(ANNOUNCEMENT).delete()[0], 3)
+
+    def test_mark_all_read_view_applies_filters(self):
+        self.client.login(username='student', password='password')
+        url = reverse('notifications:mark_all_notifications_read')
+
+        response = self.client.post(
+            url, json.dumps({'type': REMINDER}), content_type='application/json'
+        )
+        self.assertEqual(response.json()['updated_count'], 1)
+
+        past = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.post(url, {'before': past})
+        self.assertEqual(response.json()['updated_count'], 0)
+
+        response = self.client.post(url, {'before': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_delete_only_touches_own_notifications(self):
+        self.client.login(username='student', password='password')
+        foreign = Notification.objects.get(recipient=self.other)
+        response = self.client.post(
+            reverse('notifications:delete_notifications'), {'ids': f'{foreign.id}'}
+        )
+        self.assertEqual(response.json()['deleted_count'], 0)
+        self.assertTrue(Notification.objects.filter(pk=foreign.pk).exists())
+
+    def test_delete_everything_takes_an_explicit_flag(self):
+        self.client.login(username='student', password='password')
+        url = reverse('notifications:delete_notifications')
+
+        self.assertEqual(self.client.post(url).status_code, 400)
+        response = self.client.post(url, '[1, 2]', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Notification.objects.for_user(self.user).count(), 3)
+
+        response = self.client.post(url, json.dumps({'all': True}), content_type='application/json')
+        self.assertEqual(response.json()['deleted_count'], 3)
+
+    def test_delete_checks_the_csrf_token(self):
+        client = Client(enforce_csrf_checks=True)
+        client.login(username='student', password='password')
+        response = client.post(reverse('notifications:delete_notifications'), {'all': 'true'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(Notification.objects.for_user(self.user).count(), 3)
+
+
+@shared_cache
+class UnreadCounterTests(NotificationTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def test_counter_follows_every_change(self):
+        self.assertEqual(get_unread_count(self.user), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(
+                recipient=self.user, title='Title', message='Message'
+            )
+        self.assertEqual(get_unread_count(self.user), 4)
+        with self.captureOnCommitCallbacks(execute=True):
+            notification.mark_as_read()
+            # Another copy of the same row, already read by then
+            Notification.objects.get(pk=notification.pk).delete()
+        self.assertEqual(get_unread_count(self.user), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.for_user(self.user).by_type(REMINDER).delete()
+        self.assertEqual(get_unread_count(self.user), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.for_user(self.user).mark_read()
+            self.assertEqual(Notification.objects.for_user(self.user).mark_read(), 0)
+        self.assertEqual(get_unread_count(self.user), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.for_user(self.user).mark_unread()
+        self.assertEqual(get_unread_count(self.user), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_create_announcement('Title', 'Message', users=[self.user])
+        self.assertEqual(get_unread_count(self.user), 3)
+
+    def test_counter_changes_once_the_transaction_commits(self):
+        self.assertEqual(get_unread_count(self.user), 3)
+        with self.captureOnCommitCallbacks() as callbacks:
+            Notification.objects.for_user(self.user).mark_read()
+            self.assertEqual(get_unread_count(self.user), 3)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_unread_count(self.user), 0)
+
+    def test_negative_counter_is_recounted(self):
+        cache.set(unread_count_cache_key(self.user.pk), -2)
+        self.assertEqual(get_unread_count(self.user), 3)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    })
+    def test_local_cache_is_not_trusted(self):
+        cache.set(unread_count_cache_key(self.user.pk), 42)
+        self.assertEqual(get_unread_count(self.user), 3)
+
+    def test_reconcile_fixes_a_drifted_counter(self):
+        cache.set(unread_count_cache_key(self.user.pk), 42)
+        call_command('reconcile_unread_counts', stdout=io.StringIO())
+        self.assertEqual(get_unread_count(self.user), 3)
+        self.assertEqual(get_unread_count(self.other), 1)
+
+
+class NotificationStreamTests(NotificationTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+
+    def test_broker_wakes_up_subscribers_of_the_user(self):
+        broker = InProcessBroker()
+
+        async def listen():
+            subscription = broker.subscribe(self.user.pk)
+            await sync_to_async(broker.publish, thread_sensitive=False)([self.other.pk])
+            missed = await subscription.wait(0.01)
+            await sync_to_async(broker.publish, thread_sensitive=False)([self.user.pk])
+            woken = await subscription.wait(1)
+            broker.unsubscribe(subscription)
+            return missed, woken
+
+        self.assertEqual(async_to_sync(listen)(), (False, True))
+
+    def test_stream_resumes_after_the_last_ids(self):
+        first = Notification.objects.for_user(self.user).order_by('id').first()
+        last = Notification.objects.for_user(self.user).order_by('id').last()
+        seen = create_broadcast('Seen', 'Message', audience=AUDIENCE_ALL)
+        broadcast = create_broadcast('Holiday', 'No classes on Friday', audience=AUDIENCE_ALL)
+
+        async def read(count):
+            stream = _event_stream(self.user, (first.id, seen.id), heartbeat=0.01)
+            chunks = [await stream.__anext__() for _ in range(count)]
+            await stream.aclose()
+            return chunks
+
+        retry, *notifications, announced, counter, heartbeat = async_to_sync(read)(6)
+        self.assertTrue(retry.startswith('retry:'))
+        self.assertIn(f'id: {first.id}:{seen.id}\n', retry)
+        self.assertEqual(len(notifications), 2)
+        self.assertNotIn(f'id: {first.id}:', ''.join(notifications))
+        self.assertIn(f'id: {last.id}:{broadcast.id}\n', announced)
+        self.assertIn('"broadcast": true', announced)
+        self.assertIn('"unread_count": 5', counter)
+        self.assertEqual(heartbeat, ': heartbeat\n\n')
+
+    def test_stream_ends_after_its_max_age(self):
+        async def read():
+            stream = _event_stream(self.user, (0, 0), heartbeat=10, max_age=0.05)
+            return [chunk async for chunk in stream]
+
+        # Reading it to the end returns instead of waiting forever
+        chunks = async_to_sync(read)()
+        self.assertIn('"unread_count": 3', ''.join(chunks))
+
+    def test_stream_is_refused_outside_of_asgi(self):
+        self.client.login(username='student', password='password')
+        response = self.client.get(reverse('notifications:notification_stream'))
+        self.assertEqual(response.status_code, 204)
+
+    def test_stream_cursor_keeps_both_ids(self):
+        self.assertEqual(_parse_stream_cursor('12:5'), (12, 5))
+        self.assertEqual(_parse_stream_cursor('12'), (12, None))
+        self.assertIsNone(_parse_stream_cursor('12:x'))
+        self.assertIsNone(_parse_stream_cursor(None))
+
+
+@shared_cache
+class NotificationFeedTests(NotificationTestMixin, TestCase):
+    def test_feed_walks_every_page_with_one_query_per_source(self):
+        program = Program.objects.create(title='Computer Science')
+        course = Course.objects.create(
+            title='Algorithms', code='CS101', program=program, semester='First'
+        )
+        for _ in range(4):
+            Notification.objects.create(
+                recipient=self.user, title='Title', message='Message', related_course=course
+            )
+        cache.clear()
+        self.client.login(username='student', password='password')
+        get_unread_count(self.user)
+        url = reverse('notifications:notification_feed_api')
+
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            # session, user, one page query per source
+            with self.assertNumQueries(4):
+                data = self.client.get(url, {'per_page': 3, 'cursor': cursor}).json()
+            seen.extend(n['id'] for n in data['notifications'])
+            cursor = data['next_cursor']
+
+        expected = list(
+            Notification.objects.for_user(self.user)
+            .order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(seen, expected)
+        self.assertEqual(data['notifications'][0]['related_course'], None)
+        self.assertEqual(
+            self.client.get(url).json()['notifications'][0]['related_course']['title'],
+            'Algorithms'
+        )
+
+
+class AnnouncementFanOutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.students = [
+            User.objects.create_user(username=f'student{n}', password='password', is_student=True)
+            for n in range(5)
+        ]
+        NotificationPreference.objects.filter(user=self.students[1]).update(
+            app_announcements=False
+        )
+        self.job = AnnouncementJob.objects.create(title='Exams', message='Exams start Monday')
+
+    def test_job_skips_opted_out_students_and_resumes_after_its_cursor(self):
+        # A previous worker reached the second student before it died.
+        Notification.objects.create(recipient=self.students[0], title='Exams', message='-')
+        AnnouncementJob.objects.filter(pk=self.job.pk).update(
+            status=JOB_RUNNING,
+            sent_count=1,
+            last_user_id=self.students[1].pk,
+            updated_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertTrue(claim_job(self.job.pk))
+        self.assertFalse(claim_job(self.job.pk))
+        job = run_announcement_job(self.job.pk, batch_size=2)
+
+        self.assertEqual(job.status, JOB_DONE)
+        self.assertEqual((job.sent_count, job.total_recipients), (4, 4))
+        self.assertEqual(job.progress, 100)
+        self.assertEqual(
+            list(
+                Notification.objects.order_by('recipient_id')
+                .values_list('recipient', flat=True)
+            ),
+            [self.students[n].pk for n in (0, 2, 3, 4)]
+        )
+
+    def test_api_queues_the_announcement(self):
+        User.objects.create_user(username='admin', password='password', is_staff=True)
+        self.client.login(username='admin', password='password')
+        response = self.client.post(
+            reverse('notifications:create_announcement_api'),
+            json.dumps({'title': 'Holiday', 'message': 'No classes on Friday', 'personal': True}),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 202)
+        self.assertFalse(Notification.objects.exists())
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], JOB_PENDING)
+
+
+class BroadcastTests(NotificationTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        User.objects.filter(pk=self.user.pk).update(is_student=True)
+        self.user.refresh_from_db()
+        self.broadcast = create_broadcast('Exams', 'Exams start Monday', audience=AUDIENCE_STUDENTS)
+        self.client.login(username='student', password='password')
+
+    def test_broadcast_is_one_row_merged_into_the_feed(self):
+        self.assertEqual(Notification.objects.count(), 4)
+        self.assertFalse(BroadcastReceipt.objects.exists())
+        self.assertEqual(get_unread_count(self.user), 4)
+        self.assertEqual(get_unread_count(self.other), 1)
+
+        url = reverse('notifications:notification_feed_api')
+        first = self.client.get(url, {'per_page': 2}).json()
+        rest = self.client.get(url, {'per_page': 2, 'cursor': first['next_cursor']}).json()
+        items = first['notifications'] + rest['notifications']
+        self.assertEqual(len(items), 4)
+        self.assertEqual(sum(item['broadcast'] for item in items), 1)
+
+        listed = self.client.get(reverse('notifications:notification_list_api'), {'per_page': 3}).json()
+        self.assertEqual(listed['pagination']['total_count'], 4)
+        self.assertEqual(listed['pagination']['total_pages'], 2)
+    
+    def test_list_pages_both_sources_in_one_query(self):
+        url = reverse('notifications:notification_list_api')
+        first = self.client.get(url, {'per_page': 1}).json()
+        self.assertTrue(first['notifications'][0]['broadcast'])
+        
+        # One UNION for the keys of the page, one query for its items
+        feed = MergedFeed(self._request())
+        with self.assertNumQueries(2):
+            items = feed[1:3]
+        self.assertEqual([item.is_broadcast for item in items], [False, False])
+        
+        pages = [
+            self.client.get(url, {'per_page': 3, 'page': page}).json()['notifications']
+            for page in (1, 2)
+        ]
+        keys = [(item['broadcast'], item['id']) for page in pages for item in page]
+        self.assertEqual(len(set(keys)), 4)
+        
+        view = NotificationListView()
+        view.setup(self._request())
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+        self.assertEqual(sum(item.is_broadcast for item in context['notifications']), 1)
+        self.assertEqual(context['total_count'], 4)
+    
+    def _request(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return request
+
+    def test_read_and_delete_write_receipts(self):
+        self.client.post(reverse('notifications:mark_all_notifications_read'), {'type': ANNOUNCEMENT})
+        self.assertEqual(get_unread_count(self.user), 1)
+        receipt = BroadcastReceipt.objects.get(user=self.user)
+        self.assertIsNotNone(receipt.read_at)
+
+        self.client.post(reverse('notifications:delete_broadcast', args=[self.broadcast.pk]))
+        data = self.client.get(reverse('notifications:notification_feed_api')).json()
+        self.assertFalse(any(item['broadcast'] for item in data['notifications']))
+
+        create_broadcast('Holiday', 'No classes on Friday')
+        self.assertEqual(get_unread_count(self.user), 2)
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.users = []
+        for n in range(3):
+            user = User.objects.create_user(
+                username=f'digest{n}', password='password', email=f'digest{n}@example.com'
+            )
+            NotificationPreference.objects.filter(user=user).update(digest_frequency='daily')
+            for notification_type in (ANNOUNCEMENT, REMINDER):
+                Notification.objects.create(
+                    recipient=user, title=notification_type, message='-', notification_type=notification_type
+                )
+            self.users.append(user)
+
+        # The second user is in quiet hours, the third does not want reminders.
+        at = timezone.localtime(self.now)
+        NotificationPreference.objects.filter(user=self.users[1]).update(
+            quiet_hours_start=(at - timedelta(hours=1)).time(),
+            quiet_hours_end=(at + timedelta(hours=1)).time()
+        )
+        NotificationPreference.objects.filter(user=self.users[2]).update(email_reminders=False)
+
+    def test_due_digests_go_out_in_one_batch(self):
+        connection = mail.get_connection()
+        sent = send_digests('daily', now=self.now + timedelta(seconds=1), connection=connection)
+
+        self.assertEqual(sent, 2)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['digest0@example.com', 'digest2@example.com']
+        )
+        third = next(m for m in mail.outbox if m.to == ['digest2@example.com'])
+        self.assertIn('(1 new)', third.subject)
+
+        # After the quiet hours only the deferred digest is still due.
+        mail.outbox = []
+        self.assertEqual(send_digests('daily', now=self.now + timedelta(hours=2)), 1)
+        self.assertEqual(mail.outbox[0].to, ['digest1@example.com'])
+
+
+@shared_cache
+@override_settings(NOTIFICATION_EMAIL_TYPES=[ANNOUNCEMENT, REMINDER])
+class DispatchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='dispatch', password='password', email='dispatch@example.com'
+        )
+        self.preferences = NotificationPreference.objects.get(user=self.user)
+
+    def test_cached_preferences_make_creation_a_single_insert(self):
+        user = User.objects.create_user(username='no-email', password='password')
+        create_notification(user, 'Title', 'Message')
+
+        with self.assertNumQueries(1):
+            notification = create_notification(user, 'Title', 'Message')
+        self.assertTrue(notification.is_sent)
+        self.assertIsNotNone(notification.sent_at)
+
+    def test_disabled_app_notifications_are_not_stored(self):
+        self.preferences.app_announcements = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.preferences.save()
+
+        self.assertIsNone(create_notification(self.user, 'Title', 'Message', ANNOUNCEMENT))
+        self.assertFalse(Notification.objects.filter(recipient=self.user).exists())
+        # Email is a separate preference
+        self.assertEqual(OutboxEmail.objects.count(), 1)
+
+    def test_email_is_held_back_until_the_quiet_hours_end(self):
+        at = timezone.localtime(timezone.now())
+        self.preferences.quiet_hours_start = (at - timedelta(hours=1)).time()
+        self.preferences.quiet_hours_end = (at + timedelta(hours=1)).time()
+        self.preferences.save()
+
+        create_notification(self.user, 'Title', 'Message', REMINDER)
+
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.recipients, ['dispatch@example.com'])
+        self.assertGreater(email.next_attempt_at, at + timedelta(minutes=58))
+        self.assertLessEqual(email.next_attempt_at, at + timedelta(hours=1))
+
+    @override_settings(NOTIFICATION_EMAIL_TYPES=[])
+    def test_only_the_configured_types_are_emailed(self):
+        create_notification(self.user, 'Title', 'Message', ANNOUNCEMENT)
+        self.assertTrue(Notification.objects.filter(recipient=self.user).exists())
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_preference_changes_apply_once_committed(self):
+        get_preferences(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.preferences.email_announcements = False
+            self.preferences.save()
+        self.assertTrue(get_preferences(self.user.pk).email_announcements)
+        for callback in callbacks:
+            callback()
+        self.assertFalse(get_preferences(self.user.pk).email_announcements)
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    })
+    def test_local_cache_is_not_trusted(self):
+        get_preferences(self.user.pk)
+        # Saved by another process, whose invalidation is not seen here
+        NotificationPreference.objects.filter(user=self.user).update(email_reminders=False)
+        self.assertFalse(get_preferences(self.user.pk).email_reminders)
+
+
+class RetentionTests(NotificationTestMixin, TestCase):
+    def test_old_read_notifications_are_archived_then_deleted(self):
+        old = timezone.now() - timedelta(days=100)
+        Notification.objects.for_user(self.user).update(created_at=old)
+        Notification.objects.for_user(self.user).by_type(ANNOUNCEMENT).mark_read()
+
+        with tempfile.TemporaryDirectory() as directory:
+            result = prune_notifications(days=90, archive_dir=directory, batch_size=1)
+            with gzip.open(result['archive'], 'rt') as archive:
+                archived = [json.loads(line) for line in archive]
+
+        self.assertEqual(result['processed'], 2)
+        self.assertEqual({row['notification_type'] for row in archived}, {ANNOUNCEMENT})
+        # Unread and recent notifications are kept.
+        self.assertEqual(Notification.objects.count(), 2)
@@ -6,10 +6,15 @@ app_name = 'notifications'
 urlpatterns = [
     # API endpoints
     path('api/list/', views.notification_list_api, name='notification_list_api'),
+    path('api/feed/', views.notification_feed_api, name='notification_feed_api'),
     path('api/count/', views.notification_count_api, name='notification_count_api'),
+    path('api/stream/', views.notification_stream, name='notification_stream'),
     path('api/mark-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
     path('api/mark-all-read/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
     path('api/delete/<int:notification_id>/', views.delete_notification, name='delete_notification'),
+    path('api/delete-all/', views.delete_notifications, name='delete_notifications'),
+    path('api/broadcasts/<int:broadcast_id>/mark-read/', views.mark_broadcast_read, name='mark_broadcast_read'),
+    path('api/broadcasts/<int:broadcast_id>/delete/', views.delete_broadcast, name='delete_broadcast'),
     
     # HTML views
     path('', views.NotificationListView.as_view(), name='notification_list'),
@@ -17,5 +22,6 @@ urlpatterns = [
     
     # Admin functions
     path('api/create-announcement/', views.create_announcement_api, name='create_announcement_api'),
+    path('api/announcements/<int:job_id>/', views.announcement_status_api, name='announcement_status_api'),
     path('api/test/', views.notification_test_view, name='notification_test'),
 ]
\ No newline at end of file
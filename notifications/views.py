@@ -1,78 +1,301 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.http import require_POST, require_GET
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Q, Max, Value, IntegerField
+import math
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 import json
 
-from .models import Notification, NotificationPreference
-from .models import create_notification, bulk_create_announcement
+from .models import Notification, NotificationPreference, AnnouncementJob, Broadcast
+from .models import create_notification, get_unread_count
+from .models import create_broadcast, mark_broadcasts_read, delete_broadcasts
+from .models import ANNOUNCEMENT, AUDIENCES, AUDIENCE_STUDENTS, NOTIFICATION_TYPES
+from .models import time_since, TYPE_ICONS, TYPE_COLORS
+from .broker import get_broker
+from .fanout import start_announcement
+from core.utils import encode_cursor, decode_cursor
 
+LIST_FIELDS = (
+    'id', 'title', 'message', 'notification_type', 'priority', 'is_read',
+    'created_at', 'action_url', 'icon', 'color',
+    'related_course', 'related_video',
+)
+FEED_MAX_PAGE_SIZE = 100
+# Personal notifications and broadcasts are merged newest first on
+# (created_at, source, id).
+NOTIFICATION_SOURCE = 0
+BROADCAST_SOURCE = 1
+STREAM_HEARTBEAT = 15
+# Django does not notice disconnected clients, so a stream ends after this
+# many seconds and the client reconnects from its Last-Event-ID
+STREAM_MAX_AGE = 300
+STREAM_BATCH_SIZE = 50
+STREAM_FIELDS = (
+    'id', 'title', 'message', 'notification_type', 'priority',
+    'created_at', 'action_url', 'icon', 'color'
+)
+BROADCAST_STREAM_FIELDS = tuple(
+    field for field in STREAM_FIELDS if field != 'notification_type'
+)
 
-@login_required
-@require_GET
-def notification_list_api(request):
-    """API endpoint to get user's notifications"""
-    
-    # Get query parameters
-    page = int(request.GET.get('page', 1))
-    per_page = int(request.GET.get('per_page', 10))
-    unread_only = request.GET.get('unread_only', 'false').lower() == 'true'
-    notification_type = request.GET.get('type', None)
-    
-    # Build queryset
+
+def _list_queryset(request):
+    """The user's notifications narrowed by the unread_only and type filters"""
     notifications = Notification.objects.for_user(request.user)
     
-    if unread_only:
+    if request.GET.get('unread_only', 'false').lower() == 'true':
         notifications = notifications.unread()
     
+    notification_type = request.GET.get('type', None)
     if notification_type:
         notifications = notifications.by_type(notification_type)
     
-    # Paginate
-    paginator = Paginator(notifications, per_page)
-    page_obj = paginator.get_page(page)
+    return (
+        notifications
+        .select_related('related_course', 'related_video')
+        .only(*LIST_FIELDS)
+    )
+
+
+def _broadcast_queryset(request):
+    """The user's broadcasts narrowed like ``_list_queryset``, None if excluded"""
+    notification_type = request.GET.get('type', None)
+    if notification_type and notification_type != ANNOUNCEMENT:
+        return None
+    
+    broadcasts = Broadcast.objects.for_user(request.user).with_read_state(request.user)
+    
+    if request.GET.get('unread_only', 'false').lower() == 'true':
+        broadcasts = broadcasts.filter(is_read=False)
+    
+    return broadcasts
+
+
+def serialize_notification(notification, now):
+    """Serialize a notification loaded with ``LIST_FIELDS``, relative to ``now``"""
+    course = notification.related_course
+    video = notification.related_video
+    return {
+        'id': notification.id,
+        'broadcast': False,
+        'title': notification.title,
+        'message': notification.message,
+        'type': notification.notification_type,
+        'priority': notification.priority,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+        'time_since': time_since(notification.created_at, now),
+        'icon': TYPE_ICONS.get(notification.notification_type, notification.icon),
+        'color': TYPE_COLORS.get(notification.notification_type, notification.color),
+        'action_url': notification.action_url,
+        'related_course': {
+            'id': course.id,
+            'title': course.title
+        } if course else None,
+        'related_video': {
+            'id': video.id,
+            'title': video.title
+        } if video else None,
+    }
+
+
+def serialize_broadcast(broadcast, now):
+    """Serialize a broadcast annotated by ``with_read_state``, like a notification"""
+    return {
+        'id': broadcast.id,
+        'broadcast': True,
+        'title': broadcast.title,
+        'message': broadcast.message,
+        'type': ANNOUNCEMENT,
+        'priority': broadcast.priority,
+        'is_read': broadcast.is_read,
+        'created_at': broadcast.created_at.isoformat(),
+        'time_since': time_since(broadcast.created_at, now),
+        'icon': broadcast.icon,
+        'color': broadcast.color,
+        'action_url': broadcast.action_url,
+        'related_course': None,
+        'related_video': None,
+    }
+
+
+SERIALIZERS = {
+    NOTIFICATION_SOURCE: serialize_notification,
+    BROADCAST_SOURCE: serialize_broadcast,
+}
+
+
+def _after(cursor, source):
+    """Rows of ``source`` that come after ``cursor`` in the merged order"""
+    created_at, cursor_source, cursor_id = cursor
+    older = Q(created_at__lt=created_at)
+    if source < cursor_source:
+        return older | Q(created_at=created_at)
+    if source == cursor_source:
+        return older | Q(created_at=created_at, id__lt=cursor_id)
+    return older
+
+
+def serialize_item(item, now):
+    """Serialize a notification or a broadcast of the merged feed"""
+    source = BROADCAST_SOURCE if item.is_broadcast else NOTIFICATION_SOURCE
+    return SERIALIZERS[source](item, now)
+
+
+class MergedFeed:
+    """
+    The notifications and broadcasts of a request as one sequence, newest
+    first, that ``Paginator`` can page: a slice is a single UNION of the
+    ``(created_at, source, id)`` keys of both sources ordered and cut by the
+    database, then one query per source loads the items of that page.
+    """
+    
+    def __init__(self, request):
+        sources = {
+            NOTIFICATION_SOURCE: _list_queryset(request),
+            BROADCAST_SOURCE: _broadcast_queryset(request),
+        }
+        self.sources = {
+            source: queryset for source, queryset in sources.items() if queryset is not None
+        }
+    
+    def count(self):
+        return sum(queryset.count() for queryset in self.sources.values())
+    
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        keys = [
+            queryset.order_by()
+            .annotate(source=Value(source, output_field=IntegerField()))
+            .values_list('created_at', 'source', 'id')
+            for source, queryset in self.sources.items()
+        ]
+        keys = list(
+            keys[0].union(*keys[1:], all=True)
+            .order_by('-created_at', '-source', '-id')[index]
+        )
+        items = {
+            source: queryset.in_bulk([pk for _, key_source, pk in keys if key_source == source])
+            for source, queryset in self.sources.items()
+            if any(key_source == source for _, key_source, _ in keys)
+        }
+        # Rows deleted since the keys were read are left out
+        return [
+            items[source][pk] for _, source, pk in keys if pk in items[source]
+        ]
+
+
+def _merged_rows(request, limit, cursor=None):
+    """
+    Up to ``limit`` newest ``(created_at, source, id, item)`` rows of each
+    source after ``cursor``, merged newest first
+    """
+    sources = {
+        NOTIFICATION_SOURCE: _list_queryset(request),
+        BROADCAST_SOURCE: _broadcast_queryset(request),
+    }
+    rows = []
+    for source, queryset in sources.items():
+        if queryset is None:
+            continue
+        if cursor is not None:
+            queryset = queryset.filter(_after(cursor, source))
+        rows.extend(
+            (item.created_at, source, item.id, item)
+            for item in queryset.order_by('-created_at', '-id')[:limit]
+        )
+    rows.sort(key=lambda row: row[:3], reverse=True)
+    return rows
+
+
+def _parse_feed_cursor(cursor):
+    values = decode_cursor(cursor) if cursor else None
+    if not isinstance(values, list) or len(values) != 3:
+        return None
+    created_at, source, item_id = values
+    created_at = parse_datetime(created_at) if isinstance(created_at, str) else None
+    if created_at is None or not isinstance(source, int) or not isinstance(item_id, int):
+        return None
+    return created_at, source, item_id
+
+
+@login_required
+@require_GET
+def notification_list_api(request):
+    """API endpoint to get user's notifications"""
+    
+    # Get query parameters
+    try:
+        page = int(request.GET.get('page', 1))
+        per_page = min(max(int(request.GET.get('per_page', 10)), 1), FEED_MAX_PAGE_SIZE)
+    except ValueError:
+        page, per_page = 1, 10
+    
+    # Paginate over personal notifications and broadcasts together
+    feed = MergedFeed(request)
+    total_count = feed.count()
+    total_pages = max(math.ceil(total_count / per_page), 1)
+    page = min(max(page, 1), total_pages)
+    items = feed[(page - 1) * per_page:page * per_page]
     
     # Serialize notifications
-    notifications_data = []
-    for notification in page_obj:
-        notifications_data.append({
-            'id': notification.id,
-            'title': notification.title,
-            'message': notification.message,
-            'type': notification.notification_type,
-            'priority': notification.priority,
-            'is_read': notification.is_read,
-            'created_at': notification.created_at.isoformat(),
-            'time_since': notification.time_since_created,
-            'icon': notification.type_icon,
-            'color': notification.type_color,
-            'action_url': notification.action_url,
-            'related_course': {
-                'id': notification.related_course.id,
-                'title': notification.related_course.title
-            } if notification.related_course else None,
-            'related_video': {
-                'id': notification.related_video.id,
-                'title': notification.related_video.title
-            } if notification.related_video else None,
-        })
+    now = timezone.now()
+    notifications_data = [serialize_item(item, now) for item in items]
     
     return JsonResponse({
         'notifications': notifications_data,
         'pagination': {
-            'current_page': page_obj.number,
-            'total_pages': paginator.num_pages,
-            'total_count': paginator.count,
-            'has_next': page_obj.has_next(),
-            'has_previous': page_obj.has_previous(),
+            'current_page': page,
+            'total_pages': total_pages,
+            'total_count': total_count,
+            'has_next': page < total_pages,
+            'has_previous': page > 1,
         },
-        'unread_count': Notification.objects.for_user(request.user).unread().count()
+        'unread_count': get_unread_count(request.user)
+    })
+
+
+@login_required
+@require_GET
+def notification_feed_api(request):
+    """
+    Cursor paginated variant of ``notification_list_api``. Pages are keyed on
+    ``(created_at, source, id)`` so every page costs one indexed query per
+    source and no COUNT.
+    """
+    
+    try:
+        per_page = min(max(int(request.GET.get('per_page', 10)), 1), FEED_MAX_PAGE_SIZE)
+    except ValueError:
+        per_page = 10
+    
+    rows = _merged_rows(
+        request, per_page + 1, cursor=_parse_feed_cursor(request.GET.get('cursor'))
+    )
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1][:3])
+    
+    now = timezone.now()
+    return JsonResponse({
+        'notifications': [SERIALIZERS[source](item, now) for _, source, _, item in rows],
+        'next_cursor': next_cursor,
+        'unread_count': get_unread_count(request.user)
     })
 
 
@@ -97,18 +320,87 @@ def mark_notification_read(request, notification_id):
     })
 
 
+def _bulk_data(request):
+    """The JSON object or form data of a bulk request"""
+    if request.content_type == 'application/json' and request.body:
+        data = json.loads(request.body)
+        if not isinstance(data, dict):
+            raise ValueError('The body must be a JSON object')
+        return data
+    return request.POST
+
+
+def _bulk_filters(data):
+    """
+    Read the optional ``type``, ``before`` (ISO timestamp) and ``ids`` filters
+    of a bulk request
+    """
+    before = data.get('before')
+    if before:
+        before = parse_datetime(before)
+        if before is None:
+            raise ValueError('Invalid before timestamp')
+        if timezone.is_naive(before):
+            before = timezone.make_aware(before)
+    
+    return {
+        'notification_type': data.get('type') or None,
+        'before': before or None,
+        'ids': _id_list(data.get('ids')),
+        'broadcast_ids': _id_list(data.get('broadcast_ids')),
+    }
+
+
+def _is_true(value):
+    return value is True or str(value).lower() in ('true', '1', 'on')
+
+
+def _id_list(ids):
+    if isinstance(ids, str):
+        ids = [i for i in ids.split(',') if i.strip()]
+    if ids is not None:
+        ids = [int(i) for i in ids]
+    return ids
+
+
+def _bulk_targets(user, notification_type=None, before=None, ids=None, broadcast_ids=None):
+    """
+    The notifications and broadcasts of ``user`` matching the bulk filters.
+    Listing ids of only one kind leaves the other kind out.
+    """
+    if broadcast_ids is not None and ids is None:
+        ids = []
+    notifications = Notification.objects.for_user(user).matching(notification_type, before, ids)
+    
+    broadcasts = Broadcast.objects.none()
+    if not notification_type or notification_type == ANNOUNCEMENT:
+        broadcasts = Broadcast.objects.for_user(user)
+        if before is not None:
+            broadcasts = broadcasts.filter(created_at__lt=before)
+        if ids is not None and broadcast_ids is None:
+            broadcast_ids = []
+        if broadcast_ids is not None:
+            broadcasts = broadcasts.filter(id__in=broadcast_ids)
+    
+    return notifications, broadcasts
+
+
 @login_required
 @require_POST
 @csrf_exempt 
 def mark_all_notifications_read(request):
-    """Mark all user's notifications as read"""
+    """Mark all user's notifications, or those matching the filters, as read"""
     
-    updated_count = 0
-    unread_notifications = Notification.objects.for_user(request.user).unread()
+    try:
+        filters = _bulk_filters(_bulk_data(request))
+    except (TypeError, ValueError):
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid filters'
+        }, status=400)
     
-    for notification in unread_notifications:
-        notification.mark_as_read()
-        updated_count += 1
+    notifications, broadcasts = _bulk_targets(request.user, **filters)
+    updated_count = notifications.mark_read() + mark_broadcasts_read(request.user, broadcasts)
     
     return JsonResponse({
         'success': True,
@@ -117,18 +409,213 @@ def mark_all_notifications_read(request):
     })
 
 
+@login_required
+@require_POST
+def delete_notifications(request):
+    """
+    Delete all user's notifications matching the filters; deleting every
+    notification takes an explicit ``all`` flag
+    """
+    
+    try:
+        data = _bulk_data(request)
+        filters = _bulk_filters(data)
+    except (TypeError, ValueError):
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid filters'
+        }, status=400)
+    
+    if all(value is None for value in filters.values()) and not _is_true(data.get('all')):
+        return JsonResponse({
+            'success': False,
+            'error': 'Pass filters, or all: true to delete every notification'
+        }, status=400)
+    
+    notifications, broadcasts = _bulk_targets(request.user, **filters)
+    deleted_count, _ = notifications.delete()
+    deleted_count += delete_broadcasts(request.user, broadcasts)
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'{deleted_count} notifications deleted',
+        'deleted_count': deleted_count
+    })
+
+
+@login_required
+@require_POST
+def mark_broadcast_read(request, broadcast_id):
+    """Mark a specific broadcast as read for the user"""
+    
+    broadcasts = Broadcast.objects.for_user(request.user).filter(id=broadcast_id)
+    get_object_or_404(broadcasts)
+    mark_broadcasts_read(request.user, broadcasts)
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Notification marked as read',
+        'broadcast_id': broadcast_id
+    })
+
+
+@login_required
+@require_POST
+def delete_broadcast(request, broadcast_id):
+    """Hide a specific broadcast from the user"""
+    
+    broadcasts = Broadcast.objects.for_user(request.user).filter(id=broadcast_id)
+    get_object_or_404(broadcasts)
+    delete_broadcasts(request.user, broadcasts)
+    
+    return JsonResponse({
+        'success': True,
+        'message': 'Notification deleted successfully'
+    })
+
+
 @login_required
 @require_GET
 def notification_count_api(request):
     """Get unread notification count for user"""
     
-    unread_count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-    
     return JsonResponse({
-        'unread_count': unread_count
+        'unread_count': get_unread_count(request.user)
     })
 
 
+def _sse(event, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event}')
+    lines.append('data: ' + json.dumps(data, cls=DjangoJSONEncoder))
+    return '\n'.join(lines) + '\n\n'
+
+
+def _stream_user(request):
+    return request.user if request.user.is_authenticated else None
+
+
+def _latest_ids(user):
+    """Ids of the newest notification and broadcast of ``user``, 0 if none"""
+    return (
+        Notification.objects.filter(recipient=user).aggregate(last=Max('id'))['last'] or 0,
+        Broadcast.objects.for_user(user).aggregate(last=Max('id'))['last'] or 0,
+    )
+
+
+def _parse_stream_cursor(value):
+    """
+    ``(notification id, broadcast id)`` of a ``last_id`` like ``"12:5"``;
+    either is None when missing, the whole cursor None when invalid
+    """
+    parts = (value or '').split(':')
+    if len(parts) > 2:
+        return None
+    try:
+        ids = [int(part) for part in parts]
+    except ValueError:
+        return None
+    return ids[0], ids[1] if len(ids) > 1 else None
+
+
+def _pending_notifications(user, last_id, last_broadcast_id):
+    notifications = [
+        dict(notification, broadcast=False)
+        for notification in Notification.objects.filter(recipient=user, id__gt=last_id)
+        .order_by('id')
+        .values(*STREAM_FIELDS)[:STREAM_BATCH_SIZE]
+    ]
+    broadcasts = [
+        dict(broadcast, notification_type=ANNOUNCEMENT, broadcast=True)
+        for broadcast in Broadcast.objects.for_user(user)
+        .filter(id__gt=last_broadcast_id)
+        .order_by('id')
+        .values(*BROADCAST_STREAM_FIELDS)[:STREAM_BATCH_SIZE]
+    ]
+    return notifications, broadcasts, get_unread_count(user)
+
+
+async def _event_stream(user, cursor, heartbeat, max_age=STREAM_MAX_AGE):
+    """
+    Send the notifications and broadcasts created after ``cursor``, a
+    ``(notification id, broadcast id)`` pair, and every unread count change,
+    waiting on the broker in between and sending a heartbeat comment
+    whenever nothing happened for ``heartbeat`` seconds. Each event id holds
+    both ids, as ``"<notification id>:<broadcast id>"``. The stream ends
+    after ``max_age`` seconds.
+    """
+    broker = get_broker()
+    # Subscribe before the first read so nothing published in between is lost.
+    subscription = broker.subscribe(user.pk)
+    pending = sync_to_async(_pending_notifications)
+    last_id, last_broadcast_id = cursor
+    last_count = None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_age
+    try:
+        # The id makes a client reconnect from the cursor even if no
+        # notification was sent before the stream ended
+        yield f'retry: 3000\nid: {last_id}:{last_broadcast_id}\n\n'
+        while True:
+            notifications, broadcasts, count = await pending(user, last_id, last_broadcast_id)
+            for notification in notifications:
+                last_id = notification['id']
+                yield _sse('notification', notification, f'{last_id}:{last_broadcast_id}')
+            for broadcast in broadcasts:
+                last_broadcast_id = broadcast['id']
+                yield _sse('notification', broadcast, f'{last_id}:{last_broadcast_id}')
+            if count != last_count:
+                last_count = count
+                yield _sse('count', {'unread_count': count})
+            if STREAM_BATCH_SIZE in (len(notifications), len(broadcasts)):
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            if not await subscription.wait(min(heartbeat, remaining)):
+                yield ': heartbeat\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def notification_stream(request):
+    """
+    Server-Sent Events stream of new notifications, broadcasts and unread
+    counts. Served by the ASGI application; a reconnecting client resumes
+    from its ``Last-Event-ID`` header (or ``?last_id=``) instead of the
+    latest ids. Under WSGI the response would only be sent once the stream
+    ended, so it answers 204, which tells the client to poll instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'Authentication required'
+        }, status=401)
+    
+    cursor = _parse_stream_cursor(
+        request.headers.get('Last-Event-ID') or request.GET.get('last_id')
+    )
+    if cursor is None or None in cursor:
+        latest = await sync_to_async(_latest_ids)(user)
+        # A bare notification id comes from before broadcasts were streamed
+        cursor = (cursor[0], latest[1]) if cursor is not None else latest
+    
+    heartbeat = getattr(settings, 'NOTIFICATIONS_STREAM_HEARTBEAT', STREAM_HEARTBEAT)
+    max_age = getattr(settings, 'NOTIFICATIONS_STREAM_MAX_AGE', STREAM_MAX_AGE)
+    response = StreamingHttpResponse(
+        _event_stream(user, cursor, heartbeat, max_age),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @require_POST
 @csrf_exempt
@@ -158,24 +645,31 @@ class NotificationListView(ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        return Notification.objects.for_user(self.request.user)
+        # Personal notifications and broadcasts, paged together in the database
+        return MergedFeed(self.request)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
         # Add notification statistics
         user_notifications = Notification.objects.for_user(self.request.user)
+        broadcast_count = Broadcast.objects.for_user(self.request.user).count()
+        type_counts = {
+            nt[0]: user_notifications.by_type(nt[0]).count()
+            for nt in NOTIFICATION_TYPES
+        }
+        type_counts[ANNOUNCEMENT] += broadcast_count
         context.update({
-            'unread_count': user_notifications.unread().count(),
-            'total_count': user_notifications.count(),
+            'unread_count': get_unread_count(self.request.user),
+            'total_count': user_notifications.count() + broadcast_count,
             'notification_types': [
                 {
                     'type': nt[0],
                     'label': nt[1],
-                    'count': user_notifications.by_type(nt[0]).count()
+                    'count': type_counts[nt[0]]
                 }
-                for nt in Notification.NOTIFICATION_TYPES
-                if user_notifications.by_type(nt[0]).exists()
+                for nt in NOTIFICATION_TYPES
+                if type_counts[nt[0]]
             ]
         })
         
@@ -234,7 +728,10 @@ def notification_preferences_view(request):
 @require_POST
 @csrf_exempt
 def create_announcement_api(request):
-    """Create announcement for all students (admin only)"""
+    """
+    Create an announcement for all students (admin only). It is stored once
+    as a broadcast unless ``personal`` asks for a copy per student.
+    """
     
     if not request.user.is_staff:
         return JsonResponse({
@@ -254,21 +751,42 @@ def create_announcement_api(request):
                 'error': 'Title and message are required'
             }, status=400)
         
-        # Create announcement for all students
-        from accounts.models import User
-        students = User.objects.filter(is_student=True)
+        if data.get('personal'):
+            # Fan a personal copy out to every student in the background
+            job = start_announcement(
+                title=title,
+                message=message,
+                priority=priority,
+                created_by=request.user
+            )
+            
+            return JsonResponse({
+                'success': True,
+                'message': 'Announcement queued for all students',
+                'job_id': job.id,
+                'status_url': reverse('notifications:announcement_status_api', args=[job.id])
+            }, status=202)
         
-        count = bulk_create_announcement(
+        audience = data.get('audience', AUDIENCE_STUDENTS)
+        if audience not in dict(AUDIENCES):
+            return JsonResponse({
+                'success': False,
+                'error': 'Unknown audience'
+            }, status=400)
+        
+        # One shared row for the whole audience
+        broadcast = create_broadcast(
             title=title,
             message=message,
-            users=students,
-            priority=priority
+            audience=audience,
+            priority=priority,
+            created_by=request.user
         )
         
         return JsonResponse({
             'success': True,
-            'message': f'Announcement sent to {count} students',
-            'count': count
+            'message': f'Announcement sent to {broadcast.get_audience_display().lower()}',
+            'broadcast_id': broadcast.id
         })
         
     except json.JSONDecodeError:
@@ -283,6 +801,31 @@ def create_announcement_api(request):
         }, status=500)
 
 
+@login_required
+@require_GET
+def announcement_status_api(request, job_id):
+    """Progress of an announcement being sent (admin only)"""
+    
+    if not request.user.is_staff:
+        return JsonResponse({
+            'success': False,
+            'error': 'Permission denied'
+        }, status=403)
+    
+    job = get_object_or_404(AnnouncementJob, id=job_id)
+    
+    return JsonResponse({
+        'job_id': job.id,
+        'status': job.status,
+        'total_recipients': job.total_recipients,
+        'sent_count': job.sent_count,
+        'progress': job.progress,
+        'error': job.error,
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    })
+
+
 @login_required
 def notification_test_view(request):
     """Test notification creation (for demo purposes)"""
@@ -331,6 +874,9 @@ def notification_test_view(request):
     )
     test_notifications.append(achievement_notif)
     
+    # Types turned off in the user's preferences create nothing
+    test_notifications = [n for n in test_notifications if n is not None]
+    
     return JsonResponse({
         'success': True,
         'message': f'Created {len(test_notifications)} test notifications',
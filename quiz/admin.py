@@ -12,6 +12,7 @@ from .models import (
     MCQuestion,
     Choice,
     EssayQuestion,
+    EssayGradeSuggestion,
     Sitting,
 )
 
@@ -83,6 +84,7 @@ class EssayQuestionAdmin(admin.ModelAdmin):
         "content",
         "quiz",
         "explanation",
+        "answer_keywords",
     )
     search_fields = ("content", "explanation")
     filter_horizontal = ("quiz",)
@@ -93,3 +95,9 @@ admin.site.register(MCQuestion, MCQuestionAdmin)
 admin.site.register(Progress, ProgressAdmin)
 admin.site.register(EssayQuestion, EssayQuestionAdmin)
 admin.site.register(Sitting)
+
+
+@admin.register(EssayGradeSuggestion)
+class EssayGradeSuggestionAdmin(admin.ModelAdmin):
+    list_display = ("question", "sitting", "score", "confidence", "correct", "status")
+    list_filter = ("status", "correct", "scorer")
@@ -0,0 +1,147 @@
+"""
+Item analysis of quiz questions.
+
+Completed sittings are streamed in chunks ordered by ``(end, id)``. Each
+chunk is folded into per-question running totals held in memory, then the
+totals and the quiz watermark are saved in one transaction, so an
+interrupted run resumes where it stopped and later runs only read sittings
+completed since the last one.
+"""
+import json
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import ItemAnalysisState, ItemStatistic, MCQuestion, Sitting
+
+CHUNK_SIZE = 1000
+
+
+def _fold_chunk(sittings, stats, mc_questions):
+    """Add a chunk of sittings to the ``stats`` totals keyed by question id"""
+    for sitting in sittings:
+        question_ids = sitting._question_ids()
+        incorrect = set(sitting.get_incorrect_questions)
+        answers = json.loads(sitting.user_answers or "{}")
+        score = float(sitting.current_score)
+
+        for question_id in question_ids:
+            totals = stats.get(question_id)
+            if totals is None:
+                # The question has since been removed from the quiz.
+                continue
+            correct = question_id not in incorrect
+            totals["attempts"] += 1
+            totals["score_sum"] += score
+            totals["score_square_sum"] += score * score
+            if correct:
+                totals["correct_count"] += 1
+                totals["correct_score_sum"] += score
+            if question_id in mc_questions:
+                answer = answers.get(str(question_id))
+                if answer not in (None, ""):
+                    totals["distractors"][str(answer)] += 1
+
+
+def _empty_totals(statistic=None):
+    return {
+        "attempts": statistic.attempts if statistic else 0,
+        "correct_count": statistic.correct_count if statistic else 0,
+        "score_sum": statistic.score_sum if statistic else 0.0,
+        "score_square_sum": statistic.score_square_sum if statistic else 0.0,
+        "correct_score_sum": statistic.correct_score_sum if statistic else 0.0,
+        "distractors": Counter(statistic.distractor_counts if statistic else {}),
+    }
+
+
+def _save(quiz, stats, existing, state, last, processed):
+    new, changed = [], []
+    for question_id, totals in stats.items():
+        statistic = existing.get(question_id)
+        if statistic is None:
+            statistic = ItemStatistic(quiz=quiz, question_id=question_id)
+            existing[question_id] = statistic
+            new.append(statistic)
+        else:
+            changed.append(statistic)
+        statistic.attempts = totals["attempts"]
+        statistic.correct_count = totals["correct_count"]
+        statistic.score_sum = totals["score_sum"]
+        statistic.score_square_sum = totals["score_square_sum"]
+        statistic.correct_score_sum = totals["correct_score_sum"]
+        statistic.distractor_counts = dict(totals["distractors"])
+
+    with transaction.atomic():
+        ItemStatistic.objects.bulk_create(new)
+        ItemStatistic.objects.bulk_update(
+            changed,
+            [
+                "attempts",
+                "correct_count",
+                "score_sum",
+                "score_square_sum",
+                "correct_score_sum",
+                "distractor_counts",
+            ],
+        )
+        state.last_end = last.end
+        state.last_sitting_id = last.id
+        state.sittings_processed += processed
+        state.save()
+
+
+def analyze_quiz(quiz, full=False, chunk_size=CHUNK_SIZE):
+    """
+    Fold the completed sittings of ``quiz`` not yet analysed into its item
+    statistics. ``full`` discards the totals and starts over, which is
+    needed after sittings already analysed have been re-marked.
+    Returns the number of sittings processed.
+    """
+    state, _ = ItemAnalysisState.objects.get_or_create(quiz=quiz)
+    if full:
+        with transaction.atomic():
+            ItemStatistic.objects.filter(quiz=quiz).delete()
+            state.last_end = None
+            state.last_sitting_id = 0
+            state.sittings_processed = 0
+            state.save()
+
+    existing = {s.question_id: s for s in ItemStatistic.objects.filter(quiz=quiz)}
+    stats = {
+        question_id: _empty_totals(existing.get(question_id))
+        for question_id in quiz.question_set.values_list("id", flat=True)
+    }
+    mc_questions = set(
+        MCQuestion.objects.filter(quiz=quiz).values_list("id", flat=True)
+    )
+
+    sittings = (
+        Sitting.objects.filter(quiz=quiz, complete=True, end__isnull=False)
+        .only(
+            "id",
+            "end",
+            "question_order",
+            "incorrect_questions",
+            "user_answers",
+            "current_score",
+        )
+        .order_by("end", "id")
+    )
+
+    processed = 0
+    while True:
+        pending = sittings
+        if state.last_end is not None:
+            pending = sittings.filter(
+                Q(end__gt=state.last_end)
+                | Q(end=state.last_end, id__gt=state.last_sitting_id)
+            )
+        chunk = list(pending[:chunk_size])
+        if not chunk:
+            break
+
+        _fold_chunk(chunk, stats, mc_questions)
+        _save(quiz, stats, existing, state, chunk[-1], len(chunk))
+        processed += len(chunk)
+    return processed
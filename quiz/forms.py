@@ -8,19 +8,20 @@ from django.forms.models import inlineformset_factory
 
 from accounts.models import User
 from .models import Question, Quiz, MCQuestion, Choice
+from .question_bank import FORMATS, JSONL
 
 
 class QuestionForm(forms.Form):
-    def __init__(self, question, *args, **kwargs):
+    def __init__(self, question, *args, seed=None, **kwargs):
         super(QuestionForm, self).__init__(*args, **kwargs)
-        choice_list = [x for x in question.get_choices_list()]
+        choice_list = [x for x in question.get_choices_list(seed=seed)]
         self.fields["answers"] = forms.ChoiceField(
             choices=choice_list, widget=RadioSelect
         )
 
 
 class EssayForm(forms.Form):
-    def __init__(self, question, *args, **kwargs):
+    def __init__(self, question, *args, seed=None, **kwargs):
         super(EssayForm, self).__init__(*args, **kwargs)
         self.fields["answers"] = forms.CharField(
             widget=Textarea(attrs={"style": "width:100%"})
@@ -54,6 +55,11 @@ class QuizAddForm(forms.ModelForm):
         return quiz
 
 
+class QuestionImportForm(forms.Form):
+    file = forms.FileField(label=_("Question bank file"))
+    format = forms.ChoiceField(choices=FORMATS, initial=JSONL, label=_("Format"))
+
+
 class MCQuestionForm(forms.ModelForm):
     class Meta:
         model = MCQuestion
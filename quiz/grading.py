@@ -0,0 +1,195 @@
+"""
+Offline grading of essay answers.
+
+A scorer receives plain data (the question text, its answer keywords and the
+student answer) and returns a ``(score, confidence)`` pair, both between 0
+and 1. Scorers run in a process pool so heavy scorers, e.g. one that loads a
+local model in ``__init__``, do not block each other. Set
+``QUIZ_ESSAY_SCORER`` to the dotted path of a ``BaseScorer`` subclass to
+replace the default keyword scorer.
+"""
+import json
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import (
+    EssayQuestion,
+    EssayGradeSuggestion,
+    Sitting,
+    PENDING,
+    ACCEPTED,
+)
+
+DEFAULT_SCORER = "quiz.grading.KeywordScorer"
+PASS_SCORE = 0.5
+BATCH_SIZE = 500
+
+WORD_RE = re.compile(r"\w+")
+
+
+class BaseScorer:
+    name = "base"
+
+    def score(self, question, keywords, answer):
+        raise NotImplementedError
+
+
+class KeywordScorer(BaseScorer):
+    """Score an answer by the share of rubric keywords it mentions"""
+
+    name = "keyword"
+
+    def score(self, question, keywords, answer):
+        if not keywords:
+            return 0.0, 0.0
+
+        text = " ".join(WORD_RE.findall(answer.lower()))
+        words = set(text.split())
+        matched = 0
+        for keyword in keywords:
+            keyword = " ".join(WORD_RE.findall(keyword.lower()))
+            if " " in keyword:
+                matched += f" {keyword} " in f" {text} "
+            else:
+                matched += keyword in words
+
+        score = matched / len(keywords)
+        # Answers far from the pass line, and answers long enough to contain
+        # every keyword, are the ones the keyword match is sure about.
+        certainty = abs(score - PASS_SCORE) / PASS_SCORE
+        coverage = min(len(words) / (len(keywords) * 3), 1.0)
+        return score, round(certainty * coverage, 4)
+
+
+def get_scorer_path():
+    return getattr(settings, "QUIZ_ESSAY_SCORER", DEFAULT_SCORER)
+
+
+_worker_scorer = None
+
+
+def _init_worker(scorer_path):
+    global _worker_scorer
+    _worker_scorer = import_string(scorer_path)()
+
+
+def _score_job(job):
+    key, question, keywords, answer = job
+    score, confidence = _worker_scorer.score(question, keywords, answer)
+    return key, score, confidence
+
+
+def pending_essay_answers(quiz):
+    """
+    Yield ``((sitting_id, question_id), question, keywords, answer)`` for
+    every answered essay question of a completed sitting of ``quiz`` that has
+    no suggestion yet.
+    """
+    essays = {
+        question.id: (question.content, question.get_answer_keywords())
+        for question in EssayQuestion.objects.filter(quiz=quiz)
+    }
+    if not essays:
+        return
+
+    graded = set(
+        EssayGradeSuggestion.objects.filter(sitting__quiz=quiz).values_list(
+            "sitting_id", "question_id"
+        )
+    )
+    sittings = (
+        Sitting.objects.filter(quiz=quiz, complete=True)
+        .only("id", "question_order", "user_answers")
+        .iterator(chunk_size=BATCH_SIZE)
+    )
+    for sitting in sittings:
+        answers = json.loads(sitting.user_answers or "{}")
+        for question_id in sitting._question_ids():
+            answer = answers.get(str(question_id))
+            if question_id not in essays or not answer:
+                continue
+            if (sitting.id, question_id) in graded:
+                continue
+            content, keywords = essays[question_id]
+            yield (sitting.id, question_id), content, keywords, answer
+
+
+def grade_pending_essays(quiz, scorer_path=None, workers=4):
+    """
+    Score every pending essay answer of ``quiz`` and store the results as
+    pending suggestions. ``workers`` of 0 or 1 scores in this process.
+    Returns the number of suggestions created.
+    """
+    scorer_path = scorer_path or get_scorer_path()
+    scorer_name = import_string(scorer_path).name
+    jobs = pending_essay_answers(quiz)
+
+    if workers and workers > 1:
+        executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(scorer_path,)
+        )
+        results = executor.map(_score_job, jobs, chunksize=50)
+    else:
+        executor = None
+        _init_worker(scorer_path)
+        results = map(_score_job, jobs)
+
+    created = 0
+    batch = []
+    try:
+        for (sitting_id, question_id), score, confidence in results:
+            batch.append(
+                EssayGradeSuggestion(
+                    sitting_id=sitting_id,
+                    question_id=question_id,
+                    score=score,
+                    confidence=confidence,
+                    correct=score >= PASS_SCORE,
+                    scorer=scorer_name,
+                )
+            )
+            if len(batch) >= BATCH_SIZE:
+                created += _save_suggestions(batch)
+                batch = []
+        created += _save_suggestions(batch)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return created
+
+
+def _save_suggestions(batch):
+    if not batch:
+        return 0
+    EssayGradeSuggestion.objects.bulk_create(batch, ignore_conflicts=True)
+    return len(batch)
+
+
+def accept_suggestions(suggestions):
+    """
+    Apply the suggested marks of the pending ``suggestions`` to their
+    sittings. Suggestions are grouped by question and outcome so each group
+    is written with one bulk_update. Returns the number accepted.
+    """
+    groups = defaultdict(list)
+    accepted = []
+    with transaction.atomic():
+        for suggestion in suggestions.filter(status=PENDING).only(
+            "id", "sitting_id", "question_id", "correct"
+        ):
+            groups[(suggestion.question_id, suggestion.correct)].append(
+                suggestion.sitting_id
+            )
+            accepted.append(suggestion.id)
+
+        for (question_id, correct), sitting_ids in groups.items():
+            Sitting.objects.bulk_mark(
+                Sitting.objects.filter(pk__in=sitting_ids), question_id, correct
+            )
+        EssayGradeSuggestion.objects.filter(pk__in=accepted).update(status=ACCEPTED)
+    return len(accepted)
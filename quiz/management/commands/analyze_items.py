@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from quiz.analysis import analyze_quiz
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = "Update question difficulty and discrimination statistics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "quiz_ids",
+            nargs="*",
+            type=int,
+            help="Quiz ids to analyse (default: every exam paper quiz)",
+        )
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Recompute from every completed sitting instead of only new ones",
+        )
+
+    def handle(self, *args, **options):
+        quizzes = Quiz.objects.filter(exam_paper=True)
+        if options["quiz_ids"]:
+            quizzes = Quiz.objects.filter(pk__in=options["quiz_ids"])
+
+        for quiz in quizzes:
+            processed = analyze_quiz(quiz, full=options["full"])
+            self.stdout.write(
+                self.style.SUCCESS(f"{quiz}: {processed} new sitting(s) analysed")
+            )
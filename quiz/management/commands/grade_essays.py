@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.grading import grade_pending_essays, get_scorer_path
+from quiz.models import Quiz
+
+
+class Command(BaseCommand):
+    help = "Suggest marks for every ungraded essay answer of a quiz"
+
+    def add_arguments(self, parser):
+        parser.add_argument("quiz_ids", nargs="+", type=int, help="Quiz ids to grade")
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of scoring processes (default: 4, 1 scores inline)",
+        )
+        parser.add_argument(
+            "--scorer",
+            default=None,
+            help="Dotted path of the scorer class (default: QUIZ_ESSAY_SCORER)",
+        )
+
+    def handle(self, *args, **options):
+        scorer_path = options["scorer"] or get_scorer_path()
+        for quiz_id in options["quiz_ids"]:
+            try:
+                quiz = Quiz.objects.get(pk=quiz_id)
+            except Quiz.DoesNotExist:
+                raise CommandError(f"Quiz {quiz_id} does not exist")
+
+            created = grade_pending_essays(
+                quiz, scorer_path=scorer_path, workers=options["workers"]
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"{quiz}: {created} essay answer(s) scored")
+            )
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0004_remove_question_content_en_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="quiz",
+            name="max_questions",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Number of questions drawn from the question pool on each attempt.",
+                null=True,
+                verbose_name="Max Questions",
+            ),
+        ),
+        migrations.AddField(
+            model_name="sitting",
+            name="shuffle_seed",
+            field=models.PositiveIntegerField(default=0, verbose_name="Shuffle Seed"),
+        ),
+    ]
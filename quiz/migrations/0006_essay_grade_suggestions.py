@@ -0,0 +1,75 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0005_quiz_max_questions_sitting_shuffle_seed"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="essayquestion",
+            name="answer_keywords",
+            field=models.TextField(
+                blank=True,
+                help_text="Comma separated keywords or phrases expected in a good answer. Used to suggest a mark for each essay answer.",
+                verbose_name="Answer Keywords",
+            ),
+        ),
+        migrations.CreateModel(
+            name="EssayGradeSuggestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("score", models.FloatField(verbose_name="Score")),
+                ("confidence", models.FloatField(verbose_name="Confidence")),
+                ("correct", models.BooleanField(verbose_name="Suggested correct")),
+                ("scorer", models.CharField(max_length=100, verbose_name="Scorer")),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("accepted", "Accepted"),
+                            ("rejected", "Rejected"),
+                        ],
+                        default="pending",
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "question",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="quiz.essayquestion",
+                        verbose_name="Question",
+                    ),
+                ),
+                (
+                    "sitting",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="quiz.sitting",
+                        verbose_name="Sitting",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Essay grade suggestion",
+                "verbose_name_plural": "Essay grade suggestions",
+                "unique_together": {("sitting", "question")},
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0006_essay_grade_suggestions"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ItemAnalysisState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_end", models.DateTimeField(blank=True, null=True)),
+                ("last_sitting_id", models.BigIntegerField(default=0)),
+                ("sittings_processed", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "quiz",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="quiz.quiz",
+                        verbose_name="Quiz",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ItemStatistic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("attempts", models.PositiveIntegerField(default=0)),
+                ("correct_count", models.PositiveIntegerField(default=0)),
+                ("score_sum", models.FloatField(default=0)),
+                ("score_square_sum", models.FloatField(default=0)),
+                ("correct_score_sum", models.FloatField(default=0)),
+                ("distractor_counts", models.JSONField(blank=True, default=dict)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "question",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="quiz.question",
+                        verbose_name="Question",
+                    ),
+                ),
+                (
+                    "quiz",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="quiz.quiz",
+                        verbose_name="Quiz",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Item statistic",
+                "verbose_name_plural": "Item statistics",
+                "unique_together": {("quiz", "question")},
+            },
+        ),
+    ]
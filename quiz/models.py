@@ -1,7 +1,7 @@
 import re
 import json
 
-from django.db import models
+from django.db import models, transaction
 from django.urls import reverse
 from django.core.exceptions import ValidationError, ImproperlyConfigured
 from django.core.validators import (
@@ -11,11 +11,13 @@ from django.core.validators import (
 from django.utils.translation import gettext_lazy as _
 from django.utils.timezone import now
 from django.conf import settings
-from django.db.models.signals import pre_save
+from django.core.cache import cache
+from django.db.models.signals import pre_save, pre_delete, m2m_changed
 
 from django.db.models import Q
 
 from model_utils.managers import InheritanceManager
+from core.utils import cache_is_shared
 from course.models import Course
 from .utils import *
 
@@ -31,6 +33,16 @@ CATEGORY_OPTIONS = (
     ("practice", _("Practice Quiz")),
 )
 
+QUESTION_IDS_CACHE_TIMEOUT = 60 * 60
+
+
+def question_ids_cache_key(quiz_id):
+    return f"quiz:{quiz_id}:question_ids"
+
+
+def invalidate_question_ids(quiz_ids):
+    cache.delete_many([question_ids_cache_key(quiz_id) for quiz_id in quiz_ids])
+
 
 class QuizManager(models.Manager):
     def search(self, query=None):
@@ -65,8 +77,14 @@ class Quiz(models.Model):
         help_text=_("Display the questions in a random order or as they are set?"),
     )
 
-    # max_questions = models.PositiveIntegerField(blank=True, null=True, verbose_name=_("Max Questions"),
-    #     help_text=_("Number of questions to be answered on each attempt."))
+    max_questions = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        verbose_name=_("Max Questions"),
+        help_text=_(
+            "Number of questions drawn from the question pool on each attempt."
+        ),
+    )
 
     answers_at_end = models.BooleanField(
         blank=False,
@@ -135,9 +153,28 @@ class Quiz(models.Model):
     def get_questions(self):
         return self.question_set.all().select_subclasses()
 
+    def get_question_ids(self, refresh=False):
+        """
+        Ids of the question pool, cached until the pool changes when the cache
+        is shared by every process; ``refresh`` reads them again
+        """
+        pool = self.question_set.order_by("id").values_list("id", flat=True)
+        if not cache_is_shared():
+            # Other processes could not invalidate a local copy
+            return list(pool)
+        key = question_ids_cache_key(self.pk)
+        question_ids = None if refresh else cache.get(key)
+        if question_ids is None:
+            question_ids = list(pool)
+            cache.set(key, question_ids, QUESTION_IDS_CACHE_TIMEOUT)
+        return question_ids
+
     @property
     def get_max_score(self):
-        return self.get_questions().count()
+        pool_size = len(self.get_question_ids())
+        if self.max_questions:
+            return min(self.max_questions, pool_size)
+        return pool_size
 
     def get_absolute_url(self):
         # return reverse('quiz_start_page', kwargs={'pk': self.pk})
@@ -234,23 +271,46 @@ class Progress(models.Model):
             )
 
 
+class SittingQuerySet(models.query.QuerySet):
+    def for_marker(self, user):
+        """Completed sittings the given user is allowed to mark"""
+        queryset = self.filter(complete=True)
+        if not user.is_superuser:
+            queryset = queryset.filter(
+                quiz__course__in=Course.objects.filter(
+                    allocated_course__lecturer__pk=user.id
+                )
+            )
+        return queryset
+
+
 class SittingManager(models.Manager):
-    def new_sitting(self, user, quiz, course):
-        if quiz.random_order is True:
-            question_set = quiz.question_set.all().select_subclasses().order_by("?")
-        else:
-            question_set = quiz.question_set.all().select_subclasses()
+    def get_queryset(self):
+        return SittingQuerySet(self.model, using=self._db)
+
+    def _draw(self, quiz, shuffle_seed, refresh=False):
+        return draw_question_ids(
+            quiz.get_question_ids(refresh=refresh),
+            shuffle_seed,
+            shuffle=quiz.random_order,
+            limit=quiz.max_questions,
+        )
 
-        question_set = [item.id for item in question_set]
+    def new_sitting(self, user, quiz, course):
+        # The seed is stored on the sitting so the drawn questions and the
+        # order of their choices can be replayed for review and regrading.
+        shuffle_seed = new_shuffle_seed()
+        question_set = self._draw(quiz, shuffle_seed)
+        existing = quiz.question_set.filter(id__in=question_set)
+        if not question_set or existing.count() != len(question_set):
+            # The cached pool is outdated, e.g. a question was just removed
+            question_set = self._draw(quiz, shuffle_seed, refresh=True)
 
         if len(question_set) == 0:
             raise ImproperlyConfigured(
                 _("Question set of the quiz is empty. Please configure questions properly")
             )
 
-        # if quiz.max_questions and quiz.max_questions < len(question_set):
-        #     question_set = question_set[:quiz.max_questions]
-
         questions = ",".join(map(str, question_set)) + ","
 
         new_sitting = self.create(
@@ -260,6 +320,7 @@ class SittingManager(models.Manager):
             question_order=questions,
             question_list=questions,
             incorrect_questions="",
+            shuffle_seed=shuffle_seed,
             current_score=0,
             complete=False,
             user_answers="{}",
@@ -282,6 +343,48 @@ class SittingManager(models.Manager):
             ]
         return sitting
 
+    def for_marker(self, user):
+        return self.get_queryset().for_marker(user)
+
+    def bulk_mark(self, sittings, question_id, correct=None):
+        """
+        Mark ``question_id`` as correct or incorrect on every sitting of the
+        ``sittings`` queryset, or toggle it when ``correct`` is None.
+        Sittings are loaded in one query and written back with bulk_update.
+        Returns the number of sittings that changed.
+        """
+        changed = []
+        with transaction.atomic():
+            sittings = sittings.select_for_update().only(
+                "id", "question_order", "incorrect_questions", "current_score", "complete"
+            )
+            for sitting in sittings:
+                if question_id not in sitting._question_ids():
+                    continue
+                incorrect = sitting.get_incorrect_questions
+                was_incorrect = question_id in incorrect
+                if correct is None:
+                    make_incorrect = not was_incorrect
+                else:
+                    make_incorrect = not correct
+                if make_incorrect == was_incorrect:
+                    continue
+
+                if make_incorrect:
+                    incorrect.append(question_id)
+                    if sitting.complete:
+                        sitting.current_score -= 1
+                else:
+                    incorrect.remove(question_id)
+                    sitting.current_score += 1
+                sitting.incorrect_questions = ",".join(map(str, incorrect))
+                changed.append(sitting)
+
+            self.bulk_update(
+                changed, ["incorrect_questions", "current_score"], batch_size=500
+            )
+        return len(changed)
+
 
 class Sitting(models.Model):
     user = models.ForeignKey(
@@ -318,6 +421,9 @@ class Sitting(models.Model):
     user_answers = models.TextField(
         blank=True, default="{}", verbose_name=_("User Answers")
     )
+    shuffle_seed = models.PositiveIntegerField(
+        default=0, verbose_name=_("Shuffle Seed")
+    )
     start = models.DateTimeField(auto_now_add=True, verbose_name=_("Start"))
     end = models.DateTimeField(null=True, blank=True, verbose_name=_("End"))
 
@@ -413,15 +519,16 @@ class Sitting(models.Model):
 
     def get_questions(self, with_answers=False):
         question_ids = self._question_ids()
+        position = {question_id: index for index, question_id in enumerate(question_ids)}
         questions = sorted(
             self.quiz.question_set.filter(id__in=question_ids).select_subclasses(),
-            key=lambda q: question_ids.index(q.id),
+            key=lambda q: position[q.id],
         )
 
         if with_answers:
             user_answers = json.loads(self.user_answers)
             for question in questions:
-                question.user_answer = user_answers[str(question.id)]
+                question.user_answer = user_answers.get(str(question.id))
 
         return questions
 
@@ -471,6 +578,24 @@ class Question(models.Model):
         return self.content
 
 
+def question_quiz_changed_receiver(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            invalidate_question_ids([instance.pk])
+    elif action in ("post_add", "post_remove"):
+        invalidate_question_ids(pk_set)
+    elif action == "pre_clear":
+        invalidate_question_ids(instance.quiz.values_list("id", flat=True))
+
+
+def question_pre_delete_receiver(sender, instance, *args, **kwargs):
+    invalidate_question_ids(instance.quiz.values_list("id", flat=True))
+
+
+m2m_changed.connect(question_quiz_changed_receiver, sender=Question.quiz.through)
+pre_delete.connect(question_pre_delete_receiver, sender=Question)
+
+
 class MCQuestion(Question):
     choice_order = models.CharField(
         max_length=30,
@@ -491,22 +616,26 @@ class MCQuestion(Question):
         else:
             return False
 
-    def order_choices(self, queryset):
+    def order_choices(self, queryset, seed=None):
         if self.choice_order == "content":
             return queryset.order_by("choice")
         if self.choice_order == "random":
-            return queryset.order_by("?")
+            if seed is None:
+                seed = new_shuffle_seed()
+            return seeded_shuffle(queryset.order_by("id"), seed, salt=self.id)
         if self.choice_order == "none":
             return queryset.order_by()
         return queryset
 
-    def get_choices(self):
-        return self.order_choices(Choice.objects.filter(question=self))
+    def get_choices(self, seed=None):
+        return self.order_choices(Choice.objects.filter(question=self), seed)
 
-    def get_choices_list(self):
+    def get_choices_list(self, seed=None):
         return [
             (choice.id, choice.choice)
-            for choice in self.order_choices(Choice.objects.filter(question=self))
+            for choice in self.order_choices(
+                Choice.objects.filter(question=self), seed
+            )
         ]
 
     def answer_choice_to_string(self, guess):
@@ -545,6 +674,18 @@ class Choice(models.Model):
 
 
 class EssayQuestion(Question):
+    answer_keywords = models.TextField(
+        blank=True,
+        verbose_name=_("Answer Keywords"),
+        help_text=_(
+            "Comma separated keywords or phrases expected in a good answer. "
+            "Used to suggest a mark for each essay answer."
+        ),
+    )
+
+    def get_answer_keywords(self):
+        return [k.strip() for k in self.answer_keywords.split(",") if k.strip()]
+
     def check_if_correct(self, guess):
         return False
 
@@ -563,3 +704,112 @@ class EssayQuestion(Question):
     class Meta:
         verbose_name = _("Essay style question")
         verbose_name_plural = _("Essay style questions")
+
+
+PENDING = "pending"
+ACCEPTED = "accepted"
+REJECTED = "rejected"
+
+SUGGESTION_STATUS = (
+    (PENDING, _("Pending")),
+    (ACCEPTED, _("Accepted")),
+    (REJECTED, _("Rejected")),
+)
+
+
+class EssayGradeSuggestion(models.Model):
+    """A mark suggested by an essay scorer, waiting for a lecturer to accept it"""
+
+    sitting = models.ForeignKey(
+        Sitting, verbose_name=_("Sitting"), on_delete=models.CASCADE
+    )
+    question = models.ForeignKey(
+        EssayQuestion, verbose_name=_("Question"), on_delete=models.CASCADE
+    )
+    score = models.FloatField(verbose_name=_("Score"))
+    confidence = models.FloatField(verbose_name=_("Confidence"))
+    correct = models.BooleanField(verbose_name=_("Suggested correct"))
+    scorer = models.CharField(max_length=100, verbose_name=_("Scorer"))
+    status = models.CharField(
+        max_length=10, choices=SUGGESTION_STATUS, default=PENDING
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("Essay grade suggestion")
+        verbose_name_plural = _("Essay grade suggestions")
+        unique_together = ("sitting", "question")
+
+    def __str__(self):
+        return f"{self.question} ({self.score:.2f})"
+
+
+class ItemStatistic(models.Model):
+    """
+    Running item-analysis totals for one question of a quiz.
+
+    Only sufficient statistics are stored so that newly completed sittings can
+    be added without re-reading older ones; the indices are derived from them.
+    """
+
+    quiz = models.ForeignKey(Quiz, verbose_name=_("Quiz"), on_delete=models.CASCADE)
+    question = models.ForeignKey(
+        Question, verbose_name=_("Question"), on_delete=models.CASCADE
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    # Sums over attempts of the sitting score y and of x * y, x being 1 when
+    # the question was answered correctly.
+    score_sum = models.FloatField(default=0)
+    score_square_sum = models.FloatField(default=0)
+    correct_score_sum = models.FloatField(default=0)
+    distractor_counts = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Item statistic")
+        verbose_name_plural = _("Item statistics")
+        unique_together = ("quiz", "question")
+
+    def __str__(self):
+        return f"{self.quiz} - {self.question}"
+
+    @property
+    def p_value(self):
+        """Share of attempts answered correctly (item difficulty)"""
+        if not self.attempts:
+            return None
+        return self.correct_count / self.attempts
+
+    @property
+    def discrimination(self):
+        """
+        Corrected point-biserial correlation between answering this question
+        correctly and the score on the rest of the quiz.
+        """
+        n = self.attempts
+        x = self.correct_count
+        # Remove the item itself from the sitting score (x * x == x).
+        y = self.score_sum - x
+        xy = self.correct_score_sum - x
+        yy = self.score_square_sum - 2 * self.correct_score_sum + x
+
+        variance = (n * x - x * x) * (n * yy - y * y)
+        if n < 2 or variance <= 0:
+            return None
+        return (n * xy - x * y) / variance**0.5
+
+
+class ItemAnalysisState(models.Model):
+    """Watermark of the last completed sitting included in the statistics"""
+
+    quiz = models.OneToOneField(
+        Quiz, verbose_name=_("Quiz"), on_delete=models.CASCADE
+    )
+    last_end = models.DateTimeField(null=True, blank=True)
+    last_sitting_id = models.BigIntegerField(default=0)
+    sittings_processed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.quiz} ({self.sittings_processed})"
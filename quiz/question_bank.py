@@ -0,0 +1,326 @@
+"""
+Bulk import and export of quiz question banks.
+
+Two formats are supported:
+
+* ``jsonl`` - one question per line::
+
+    {"type": "mc", "content": "...", "explanation": "...", "choice_order": "random",
+     "choices": [{"choice": "...", "correct": true}, ...]}
+    {"type": "essay", "content": "...", "explanation": "...", "answer_keywords": "..."}
+
+* ``csv`` - columns ``type, content, explanation, choice_order,
+  answer_keywords, correct, option1 ... optionN`` where ``correct`` is the
+  1-based number of the correct option.
+
+Imports are written in chunked transactions with ``bulk_create``. Django
+cannot bulk create multi-table inherited models, so the parent ``Question``
+rows are bulk created first and the ``MCQuestion``/``EssayQuestion`` child
+rows are then inserted with one ``executemany`` per chunk.
+"""
+
+import csv
+import io
+import json
+import re
+
+from django.db import connection, transaction
+from django.db.models import Count
+
+from .models import (
+    Question,
+    MCQuestion,
+    EssayQuestion,
+    Choice,
+    CHOICE_ORDER_OPTIONS,
+    invalidate_question_ids,
+)
+
+JSONL = "jsonl"
+CSV = "csv"
+FORMATS = ((JSONL, "JSON Lines"), (CSV, "CSV"))
+
+MC = "mc"
+ESSAY = "essay"
+
+CHUNK_SIZE = 500
+CSV_COLUMNS = [
+    "type",
+    "content",
+    "explanation",
+    "choice_order",
+    "answer_keywords",
+    "correct",
+]
+CHOICE_ORDERS = {value for value, _ in CHOICE_ORDER_OPTIONS}
+OPTION_RE = re.compile(r"^option(\d+)$")
+
+
+class QuestionBankError(ValueError):
+    pass
+
+
+# ########################################################
+# Export
+# ########################################################
+def iter_question_records(quiz, chunk_size=CHUNK_SIZE):
+    """Yield one dict per question of ``quiz``, reading in fixed-size chunks"""
+    question_ids = list(quiz.question_set.order_by("id").values_list("id", flat=True))
+    for start in range(0, len(question_ids), chunk_size):
+        chunk = question_ids[start : start + chunk_size]
+        choices = {}
+        for choice in Choice.objects.filter(question_id__in=chunk).order_by("id"):
+            choices.setdefault(choice.question_id, []).append(
+                {"choice": choice.choice, "correct": choice.correct}
+            )
+
+        questions = Question.objects.filter(id__in=chunk).order_by("id")
+        for question in questions.select_subclasses():
+            record = {
+                "content": question.content,
+                "explanation": question.explanation,
+            }
+            if isinstance(question, MCQuestion):
+                record.update(
+                    type=MC,
+                    choice_order=question.choice_order or "",
+                    choices=choices.get(question.id, []),
+                )
+            elif isinstance(question, EssayQuestion):
+                record.update(type=ESSAY, answer_keywords=question.answer_keywords)
+            else:
+                continue
+            yield record
+
+
+def export_questions(quiz, fmt=JSONL):
+    """Yield the question bank of ``quiz`` as lines of text"""
+    records = iter_question_records(quiz)
+    if fmt == JSONL:
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+        return
+
+    options = (
+        Choice.objects.filter(question__quiz=quiz)
+        .values("question")
+        .annotate(count=Count("id"))
+        .order_by("-count")
+        .values_list("count", flat=True)
+        .first()
+    ) or 0
+    header = CSV_COLUMNS + [f"option{n}" for n in range(1, options + 1)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for record in records:
+        choices = record.get("choices", [])
+        correct = next((str(n) for n, c in enumerate(choices, 1) if c["correct"]), "")
+        writer.writerow(
+            [
+                record["type"],
+                record["content"],
+                record["explanation"],
+                record.get("choice_order", ""),
+                record.get("answer_keywords", ""),
+                correct,
+            ]
+            + [c["choice"] for c in choices]
+        )
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+# ########################################################
+# Import
+# ########################################################
+def read_records(stream, fmt=JSONL):
+    """Yield ``(line_number, record)`` from a text stream"""
+    if fmt == JSONL:
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None
+        return
+
+    reader = csv.DictReader(stream)
+    for number, row in enumerate(reader, 2):
+        options = sorted(
+            (key for key in row if key and OPTION_RE.match(key)),
+            key=lambda key: int(OPTION_RE.match(key).group(1)),
+        )
+        correct = (row.get("correct") or "").strip()
+        record = {
+            "type": (row.get("type") or "").strip().lower(),
+            "content": row.get("content") or "",
+            "explanation": row.get("explanation") or "",
+            "choice_order": (row.get("choice_order") or "").strip(),
+            "answer_keywords": row.get("answer_keywords") or "",
+            "choices": [
+                {"choice": row[key], "correct": str(n) == correct}
+                for n, key in enumerate(options, 1)
+                if row[key]
+            ],
+        }
+        yield number, record
+
+
+def _text(record, field):
+    """The ``field`` of a record as text; numbers are accepted as written"""
+    value = record.get(field)
+    if value is None:
+        return ""
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise QuestionBankError(f"{field} must be text")
+    return str(value)
+
+
+def clean_record(record):
+    """Validate one record the way the question forms do; return it cleaned"""
+    if not isinstance(record, dict):
+        raise QuestionBankError("not a valid record")
+
+    kind = record.get("type")
+    content = _text(record, "content").strip()
+    if kind not in (MC, ESSAY):
+        raise QuestionBankError(f"unknown question type {kind!r}")
+    if not content:
+        raise QuestionBankError("question content is required")
+    if len(content) > Question._meta.get_field("content").max_length:
+        raise QuestionBankError("question content is too long")
+
+    cleaned = {
+        "type": kind,
+        "content": content,
+        "explanation": _text(record, "explanation"),
+    }
+    if kind == ESSAY:
+        cleaned["answer_keywords"] = _text(record, "answer_keywords")
+        return cleaned
+
+    choices = record.get("choices") or []
+    if not isinstance(choices, list):
+        raise QuestionBankError("choices must be a list")
+    choices = [
+        {"choice": _text(c, "choice").strip(), "correct": bool(c.get("correct"))}
+        for c in choices
+        if isinstance(c, dict)
+    ]
+    if len(choices) < 2 or not all(c["choice"] for c in choices):
+        raise QuestionBankError("at least two named choices are required")
+    if sum(c["correct"] for c in choices) != 1:
+        raise QuestionBankError("exactly one choice must be marked as correct")
+    choice_order = _text(record, "choice_order") or None
+    if choice_order is not None and choice_order not in CHOICE_ORDERS:
+        raise QuestionBankError(f"unknown choice order {choice_order!r}")
+
+    cleaned.update(choice_order=choice_order, choices=choices)
+    return cleaned
+
+
+def _insert_child_rows(model, instances):
+    """Insert the child table rows of multi-table inherited ``instances``"""
+    fields = model._meta.local_concrete_fields
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ", ".join(connection.ops.quote_name(f.column) for f in fields)
+    placeholders = ", ".join(["%s"] * len(fields))
+    rows = [
+        [f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields]
+        for obj in instances
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows
+        )
+
+
+def _create_parents(parents):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Question.objects.bulk_create(parents)
+    # Without RETURNING the new ids are unknown, fall back to one INSERT each.
+    for parent in parents:
+        parent.save()
+    return parents
+
+
+def _import_chunk(quiz, records):
+    parents = _create_parents(
+        [Question(content=r["content"], explanation=r["explanation"]) for r in records]
+    )
+
+    mc_questions, essays, choices = [], [], []
+    for parent, record in zip(parents, records):
+        if record["type"] == MC:
+            mc_questions.append(
+                MCQuestion(
+                    question_ptr_id=parent.id, choice_order=record["choice_order"]
+                )
+            )
+            choices.extend(
+                Choice(question_id=parent.id, choice=c["choice"], correct=c["correct"])
+                for c in record["choices"]
+            )
+        else:
+            essays.append(
+                EssayQuestion(
+                    question_ptr_id=parent.id,
+                    answer_keywords=record["answer_keywords"],
+                )
+            )
+
+    if mc_questions:
+        _insert_child_rows(MCQuestion, mc_questions)
+    if essays:
+        _insert_child_rows(EssayQuestion, essays)
+    Choice.objects.bulk_create(choices)
+
+    through = Question.quiz.through
+    through.objects.bulk_create(
+        [through(question_id=parent.id, quiz_id=quiz.id) for parent in parents]
+    )
+
+
+def import_questions(quiz, stream, fmt=JSONL, chunk_size=CHUNK_SIZE):
+    """
+    Import every valid record of ``stream`` into ``quiz``. Each chunk of
+    ``chunk_size`` questions is committed in its own transaction.
+    Returns ``(created, errors)`` where errors is a list of
+    ``(line_number, message)``.
+    """
+    created = 0
+    errors = []
+    chunk = []
+
+    def flush():
+        nonlocal created, chunk
+        if chunk:
+            with transaction.atomic():
+                _import_chunk(quiz, chunk)
+            created += len(chunk)
+            chunk = []
+
+    number = 0
+    try:
+        for number, record in read_records(stream, fmt):
+            try:
+                chunk.append(clean_record(record))
+            except QuestionBankError as error:
+                errors.append((number, str(error)))
+                continue
+            if len(chunk) >= chunk_size:
+                flush()
+    except UnicodeDecodeError:
+        # Nothing after the undecodable line can be read
+        errors.append((number + 1, "the file is not UTF-8 text"))
+    except csv.Error as error:
+        errors.append((number + 1, f"not valid CSV: {error}"))
+    flush()
+
+    # The m2m rows were bulk created, so no m2m_changed signal was sent.
+    invalidate_question_ids([quiz.id])
+    return created, errors
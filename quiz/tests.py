@@ -1,3 +1,343 @@
-from django.test import TestCase
+import io
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+
+from course.models import Program, Course
+from .analysis import analyze_quiz
+from .grading import KeywordScorer, accept_suggestions, grade_pending_essays
+from .models import (
+    Quiz,
+    MCQuestion,
+    Choice,
+    Sitting,
+    EssayQuestion,
+    EssayGradeSuggestion,
+    ItemStatistic,
+    PENDING,
+    REJECTED,
+    question_ids_cache_key,
+)
+from .question_bank import CSV, JSONL, export_questions, import_questions
+from .utils import draw_question_ids
+
+User = get_user_model()
+
+# The quiz views, mounted for the tests that request them
+urlpatterns = [path("quiz/", include("quiz.urls"))]
+
+# The question pools are only cached when every process shares them
+shared_cache = override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": tempfile.mkdtemp(),
+        }
+    }
+)
+
+
+class QuizTestMixin:
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="student", password="password")
+        program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Algorithms", code="CS101", program=program, semester="First"
+        )
+        self.quiz = Quiz.objects.create(course=self.course, title="Midterm")
+        self.questions = []
+        for number in range(6):
+            question = MCQuestion.objects.create(
+                content=f"Question {number}", choice_order="random"
+            )
+            question.quiz.add(self.quiz)
+            for letter in "abcd":
+                Choice.objects.create(
+                    question=question, choice=letter, correct=letter == "a"
+                )
+            self.questions.append(question)
+
+
+class QuestionOrderTests(QuizTestMixin, TestCase):
+    def test_draw_is_reproducible_for_a_seed(self):
+        ids = list(range(1, 51))
+        self.assertEqual(
+            draw_question_ids(ids, 42, shuffle=True),
+            draw_question_ids(ids, 42, shuffle=True),
+        )
+        self.assertCountEqual(draw_question_ids(ids, 42, shuffle=True), ids)
+
+    def test_pool_draw_keeps_set_order_without_random_order(self):
+        drawn = draw_question_ids(list(range(1, 51)), 7, limit=10)
+        self.assertEqual(len(drawn), 10)
+        self.assertEqual(drawn, sorted(drawn))
+
+    def test_new_sitting_draws_from_pool_without_random_sort(self):
+        self.quiz.random_order = True
+        self.quiz.max_questions = 4
+        self.quiz.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            sitting = Sitting.objects.new_sitting(self.user, self.quiz, self.course)
+
+        self.assertFalse(
+            any("RANDOM" in query["sql"].upper() for query in queries.captured_queries)
+        )
+        self.assertEqual(len(sitting._question_ids()), 4)
+        self.assertEqual(sitting.get_max_score, 4)
+        self.assertEqual(self.quiz.get_max_score, 4)
+
+    def test_choice_order_is_stable_for_a_sitting_seed(self):
+        question = self.questions[0]
+        self.assertEqual(
+            question.get_choices_list(seed=1234), question.get_choices_list(seed=1234)
+        )
+
+    @shared_cache
+    def test_question_id_cache_follows_pool_changes(self):
+        self.assertEqual(len(self.quiz.get_question_ids()), 6)
+        self.questions[0].quiz.remove(self.quiz)
+        self.assertEqual(len(self.quiz.get_question_ids()), 5)
+        self.questions[1].delete()
+        self.assertEqual(len(self.quiz.get_question_ids()), 4)
+
+    @shared_cache
+    def test_outdated_pool_is_read_again(self):
+        pool = [question.id for question in self.questions]
+        # A question removed by a process that did not share this cache
+        cache.set(question_ids_cache_key(self.quiz.pk), pool + [max(pool) + 1])
+
+        sitting = Sitting.objects.new_sitting(self.user, self.quiz, self.course)
+
+        self.assertCountEqual(sitting._question_ids(), pool)
+        self.assertEqual(self.quiz.get_question_ids(), pool)
+
+
+class BulkMarkingTests(QuizTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.sittings = []
+        for _ in range(3):
+            sitting = Sitting.objects.new_sitting(self.user, self.quiz, self.course)
+            sitting.current_score = 6
+            sitting.mark_quiz_complete()
+            self.sittings.append(sitting)
+        self.question_id = self.questions[0].id
+
+    def test_bulk_mark_updates_every_sitting_at_once(self):
+        sittings = Sitting.objects.filter(pk__in=[s.pk for s in self.sittings])
+
+        # savepoint, one SELECT, one UPDATE, release
+        with self.assertNumQueries(4):
+            updated = Sitting.objects.bulk_mark(
+                sittings, self.question_id, correct=False
+            )
+
+        self.assertEqual(updated, 3)
+        for sitting in sittings.all():
+            self.assertEqual(sitting.get_incorrect_questions, [self.question_id])
+            self.assertEqual(sitting.current_score, 5)
+
+        self.assertEqual(
+            Sitting.objects.bulk_mark(sittings, self.question_id, False), 0
+        )
+        self.assertEqual(Sitting.objects.bulk_mark(sittings, self.question_id), 3)
+        self.assertTrue(all(s.current_score == 6 for s in sittings.all()))
+
+    def test_marker_only_sees_allocated_courses(self):
+        lecturer = User.objects.create_user(
+            username="lecturer", password="password", is_lecturer=True
+        )
+        self.assertFalse(Sitting.objects.for_marker(lecturer).exists())
+        admin = User.objects.create_superuser(username="admin", password="password")
+        self.assertEqual(Sitting.objects.for_marker(admin).count(), 3)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_batch_marking_only_redirects_to_this_site(self):
+        User.objects.create_superuser(username="admin", password="password")
+        self.client.login(username="admin", password="password")
+        data = {
+            "sitting_ids": [s.pk for s in self.sittings],
+            "qid": self.question_id,
+            "action": "incorrect",
+        }
+        url = reverse("quiz_marking_batch")
+
+        response = self.client.post(url, {**data, "next": "https://evil.example/"})
+        self.assertRedirects(
+            response, reverse("quiz_marking"), fetch_redirect_response=False
+        )
+        response = self.client.post(url, {**data, "next": "/quiz/marking/1/"})
+        self.assertRedirects(
+            response, "/quiz/marking/1/", fetch_redirect_response=False
+        )
+
+
+class EssayGradingTests(QuizTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.essay = EssayQuestion.objects.create(
+            content="Explain merge sort", answer_keywords="divide, merge, recursion"
+        )
+        self.essay.quiz.add(self.quiz)
+        self.quiz.max_questions = None
+        self.quiz.save()
+
+    def take(self, answer):
+        sitting = Sitting.objects.new_sitting(self.user, self.quiz, self.course)
+        sitting.add_incorrect_question(self.essay)
+        sitting.add_user_answer(self.essay, answer)
+        sitting.mark_quiz_complete()
+        return sitting
+
+    def test_keyword_scorer(self):
+        scorer = KeywordScorer()
+        score, confidence = scorer.score(
+            "", ["divide", "merge"], "We divide then merge"
+        )
+        self.assertEqual(score, 1.0)
+        self.assertGreater(confidence, 0)
+        self.assertEqual(scorer.score("", [], "anything"), (0.0, 0.0))
+
+    def test_pending_answers_are_scored_once_and_accepted_in_bulk(self):
+        good = self.take("Divide the list, sort by recursion and merge the halves.")
+        bad = self.take("I do not know.")
+
+        self.assertEqual(grade_pending_essays(self.quiz, workers=1), 2)
+        self.assertEqual(grade_pending_essays(self.quiz, workers=1), 0)
+
+        accepted = accept_suggestions(EssayGradeSuggestion.objects.all())
+        self.assertEqual(accepted, 2)
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertNotIn(self.essay.id, good.get_incorrect_questions)
+        self.assertEqual(good.current_score, 1)
+        self.assertIn(self.essay.id, bad.get_incorrect_questions)
+        self.assertEqual(bad.current_score, 0)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_review_needs_a_selection_or_an_all_action(self):
+        self.take("Divide the list, sort by recursion and merge the halves.")
+        self.take("Divide and merge.")
+        grade_pending_essays(self.quiz, workers=1)
+        first, second = EssayGradeSuggestion.objects.order_by("pk")
+        User.objects.create_superuser(username="admin", password="password")
+        self.client.login(username="admin", password="password")
+        url = reverse("quiz_essay_suggestions", args=[self.quiz.pk])
+
+        self.client.post(url, {"action": "accept"})
+        self.client.post(url, {"action": "reject", "suggestion_ids": ["x"]})
+        self.assertEqual(EssayGradeSuggestion.objects.filter(status=PENDING).count(), 2)
+
+        self.client.post(url, {"action": "reject", "suggestion_ids": [first.pk, "x"]})
+        first.refresh_from_db()
+        self.assertEqual(first.status, REJECTED)
+        self.client.post(url, {"action": "accept_all"})
+        self.assertFalse(EssayGradeSuggestion.objects.filter(status=PENDING).exists())
+
+
+class QuestionBankTests(QuizTestMixin, TestCase):
+    def test_jsonl_round_trip_preserves_subclasses_and_choices(self):
+        exported = "".join(export_questions(self.quiz, JSONL))
+        target = Quiz.objects.create(course=self.course, title="Final")
+
+        created, errors = import_questions(target, io.StringIO(exported), JSONL)
+
+        self.assertEqual((created, errors), (6, []))
+        imported = list(target.get_questions())
+        self.assertTrue(all(isinstance(q, MCQuestion) for q in imported))
+        self.assertEqual(len(imported[0].get_choices_list(seed=1)), 4)
+        self.assertEqual(len(target.get_question_ids()), 6)
+
+    def test_csv_import_reports_invalid_rows(self):
+        bank = (
+            "type,content,explanation,choice_order,answer_keywords,correct,option1,option2\n"
+            "mc,2 + 2?,,content,,2,3,4\n"
+            "essay,Explain recursion,,,base case,,,\n"
+            "mc,No answer,,,,,a,b\n"
+        )
+        target = Quiz.objects.create(course=self.course, title="Final")
+
+        created, errors = import_questions(target, io.StringIO(bank), CSV)
+
+        self.assertEqual(created, 2)
+        self.assertEqual([line for line, _ in errors], [4])
+        mc = MCQuestion.objects.get(content="2 + 2?")
+        self.assertEqual(mc.choice_set.get(correct=True).choice, "4")
+        self.assertEqual(
+            EssayQuestion.objects.get(quiz=target).answer_keywords, "base case"
+        )
+
+    def test_malformed_files_are_reported_not_raised(self):
+        target = Quiz.objects.create(course=self.course, title="Final")
+        bank = (
+            "type,content,correct,option1,optionx,option2\n" "mc,2 + 2?,2,3,ignored,4\n"
+        )
+        self.assertEqual(import_questions(target, io.StringIO(bank), CSV), (1, []))
+        self.assertEqual(
+            list(MCQuestion.objects.get(quiz=target).choice_set.values_list("choice")),
+            [("3",), ("4",)],
+        )
+
+        bank = (
+            '{"type": "essay", "content": {"text": "?"}}\n'
+            '{"type": "essay", "content": 42}\n'
+            '{"type": "mc", "content": "Pick", "choices": 3}\n'
+        )
+        created, errors = import_questions(target, io.StringIO(bank), JSONL)
+        self.assertEqual(created, 1)
+        self.assertEqual([line for line, _ in errors], [1, 3])
+
+        raw = io.BytesIO('{"type": "essay", "content": "ok"}\n'.encode() + b"\xff\n")
+        stream = io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+        created, errors = import_questions(target, stream, JSONL)
+        self.assertEqual(errors, [(1, "the file is not UTF-8 text")])
+
+
+class ItemAnalysisTests(QuizTestMixin, TestCase):
+    def take(self, score, wrong=()):
+        sitting = Sitting.objects.new_sitting(self.user, self.quiz, self.course)
+        for question in self.questions:
+            choice = question.choice_set.get(choice="b" if question in wrong else "a")
+            sitting.add_user_answer(question, choice.id)
+            if question in wrong:
+                sitting.add_incorrect_question(question)
+        sitting.current_score = score
+        sitting.mark_quiz_complete()
+        return sitting
+
+    def test_runs_only_read_new_sittings(self):
+        first = self.questions[0]
+        self.take(6)
+        self.take(2, wrong=self.questions[:4])
+        self.assertEqual(analyze_quiz(self.quiz, chunk_size=1), 2)
+        self.assertEqual(analyze_quiz(self.quiz), 0)
+
+        self.take(5, wrong=[first])
+        self.assertEqual(analyze_quiz(self.quiz), 1)
+
+        statistic = ItemStatistic.objects.get(quiz=self.quiz, question=first)
+        self.assertEqual(statistic.attempts, 3)
+        self.assertAlmostEqual(statistic.p_value, 1 / 3)
+        self.assertGreater(statistic.discrimination, 0)
+        wrong_choice = first.choice_set.get(choice="b")
+        self.assertEqual(statistic.distractor_counts[str(wrong_choice.id)], 2)
+
+        incremental = {
+            s.question_id: (s.attempts, s.correct_count, s.score_sum)
+            for s in ItemStatistic.objects.all()
+        }
+        self.assertEqual(analyze_quiz(self.quiz, full=True), 3)
+        self.assertEqual(
+            incremental,
+            {
+                s.question_id: (s.attempts, s.correct_count, s.score_sum)
+                for s in ItemStatistic.objects.all()
+            },
+        )
@@ -6,6 +6,12 @@ urlpatterns = [
     path("progress/", view=QuizUserProgressView.as_view(), name="quiz_progress"),
     # path('marking/<int:pk>/', view=QuizMarkingList.as_view(), name='quiz_marking'),
     path("marking_list/", view=QuizMarkingList.as_view(), name="quiz_marking"),
+    path("marking/batch/", quiz_marking_batch, name="quiz_marking_batch"),
+    path(
+        "marking/<int:quiz_id>/essays/",
+        essay_suggestions,
+        name="quiz_essay_suggestions",
+    ),
     path(
         "marking/<int:pk>/",
         view=QuizMarkingDetail.as_view(),
@@ -15,10 +21,21 @@ urlpatterns = [
     path("<slug>/quiz_add/", QuizCreateView.as_view(), name="quiz_create"),
     path("<slug>/<int:pk>/add/", QuizUpdateView.as_view(), name="quiz_update"),
     path("<slug>/<int:pk>/delete/", quiz_delete, name="quiz_delete"),
+    path("<slug>/<int:quiz_id>/analysis/", item_analysis, name="quiz_item_analysis"),
     path(
         "mc-question/add/<slug>/<int:quiz_id>/",
         MCQuestionCreate.as_view(),
         name="mc_create",
     ),
+    path(
+        "question-bank/<slug>/<int:quiz_id>/import/",
+        question_bank_import,
+        name="question_bank_import",
+    ),
+    path(
+        "question-bank/<slug>/<int:quiz_id>/export/",
+        question_bank_export,
+        name="question_bank_export",
+    ),
     # path('mc-question/add/<int:pk>/<quiz_pk>/', MCQuestionCreate.as_view(), name='mc_create'),
 ]
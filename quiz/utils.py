@@ -28,3 +28,38 @@ def unique_slug_generator(instance, new_slug=None):
         )
         return unique_slug_generator(instance, new_slug=new_slug)
     return slug
+
+
+def new_shuffle_seed():
+    """Return a fresh seed for reproducible in-process shuffling."""
+    return random.SystemRandom().randrange(1, 2**31)
+
+
+def seeded_shuffle(items, seed, salt=""):
+    """
+    Shuffle a copy of ``items`` in Python with a deterministic generator.
+    The same ``seed`` and ``salt`` always yield the same order, so the
+    database never has to sort with ORDER BY RANDOM().
+    """
+    items = list(items)
+    random.Random(f"{seed}:{salt}").shuffle(items)
+    return items
+
+
+def draw_question_ids(question_ids, seed, shuffle=False, limit=None):
+    """
+    Draw ``limit`` ids out of ``question_ids`` (all of them when ``limit`` is
+    empty) using ``seed``. Drawn ids keep their original order unless
+    ``shuffle`` is set.
+    """
+    question_ids = list(question_ids)
+    rng = random.Random(seed)
+    if limit and limit < len(question_ids):
+        position = {qid: index for index, qid in enumerate(question_ids)}
+        drawn = rng.sample(question_ids, limit)
+        if not shuffle:
+            drawn.sort(key=position.__getitem__)
+        return drawn
+    if shuffle:
+        rng.shuffle(question_ids)
+    return question_ids
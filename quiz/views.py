@@ -1,7 +1,11 @@
+import io
+
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, render, redirect
 from django.utils.decorators import method_decorator
+from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.generic import (
     DetailView,
     ListView,
@@ -12,16 +16,38 @@ from django.views.generic import (
 )
 from django.contrib import messages
 from django.db import transaction
+from django.db.models import Q
+from django.views.decorators.http import require_POST
 
 from accounts.decorators import lecturer_required
-from .models import Course, Progress, Sitting, EssayQuestion, Quiz, MCQuestion, Question
+from core.utils import keyset_paginate
+from .models import (
+    Course,
+    Progress,
+    Sitting,
+    EssayQuestion,
+    EssayGradeSuggestion,
+    ItemAnalysisState,
+    ItemStatistic,
+    Choice,
+    Quiz,
+    MCQuestion,
+    Question,
+    PENDING,
+    REJECTED,
+)
+from .grading import accept_suggestions
 from .forms import (
     QuizAddForm,
     MCQuestionForm,
     MCQuestionFormSet,
     QuestionForm,
     EssayForm,
+    QuestionImportForm,
 )
+from .question_bank import import_questions, export_questions, CSV, JSONL
+
+MARKING_ACTIONS = {"correct": True, "incorrect": False, "toggle": None}
 
 
 @method_decorator([login_required, lecturer_required], name="dispatch")
@@ -136,6 +162,83 @@ class MCQuestionCreate(CreateView):
         return super(MCQuestionCreate, self).form_invalid(form)
 
 
+@login_required
+@lecturer_required
+def question_bank_export(request, slug, quiz_id):
+    quiz = get_object_or_404(Quiz, pk=quiz_id, course__slug=slug)
+    fmt = CSV if request.GET.get("format") == CSV else JSONL
+    content_type = "text/csv" if fmt == CSV else "application/jsonl"
+    response = StreamingHttpResponse(
+        export_questions(quiz, fmt), content_type=f"{content_type}; charset=utf-8"
+    )
+    response["Content-Disposition"] = f'attachment; filename="{quiz.slug}.{fmt}"'
+    return response
+
+
+@login_required
+@lecturer_required
+def question_bank_import(request, slug, quiz_id):
+    course = get_object_or_404(Course, slug=slug)
+    quiz = get_object_or_404(Quiz, pk=quiz_id, course=course)
+    errors = []
+    if request.method == "POST":
+        form = QuestionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            stream = io.TextIOWrapper(
+                form.cleaned_data["file"].file, encoding="utf-8-sig", newline=""
+            )
+            created, errors = import_questions(
+                quiz, stream, fmt=form.cleaned_data["format"]
+            )
+            messages.success(request, f"{created} question(s) imported.")
+            if not errors:
+                return redirect("quiz_index", course.slug)
+            messages.warning(request, f"{len(errors)} line(s) were skipped.")
+    else:
+        form = QuestionImportForm()
+
+    return render(
+        request,
+        "quiz/question_import_form.html",
+        {"course": course, "quiz_obj": quiz, "form": form, "errors": errors[:100]},
+    )
+
+
+@login_required
+@lecturer_required
+def item_analysis(request, slug, quiz_id):
+    """Difficulty, discrimination and distractor use of every quiz question"""
+    course = get_object_or_404(Course, slug=slug)
+    quiz = get_object_or_404(Quiz, pk=quiz_id, course=course)
+    statistics = list(
+        ItemStatistic.objects.filter(quiz=quiz)
+        .select_related("question")
+        .order_by("question_id")
+    )
+    choices = Choice.objects.filter(
+        question_id__in=[s.question_id for s in statistics]
+    ).order_by("id")
+    for statistic in statistics:
+        statistic.distractors = []
+    by_question = {s.question_id: s for s in statistics}
+    for choice in choices:
+        statistic = by_question[choice.question_id]
+        statistic.distractors.append(
+            (choice, statistic.distractor_counts.get(str(choice.id), 0))
+        )
+
+    return render(
+        request,
+        "quiz/item_analysis.html",
+        {
+            "course": course,
+            "quiz": quiz,
+            "statistics": statistics,
+            "state": ItemAnalysisState.objects.filter(quiz=quiz).first(),
+        },
+    )
+
+
 @login_required
 def quiz_list(request, slug):
     quizzes = Quiz.objects.filter(course__slug=slug).order_by("-timestamp")
@@ -184,56 +287,155 @@ class QuizUserProgressView(TemplateView):
 @method_decorator([login_required, lecturer_required], name="dispatch")
 class QuizMarkingList(QuizMarkerMixin, SittingFilterTitleMixin, ListView):
     model = Sitting
+    page_size = 50
 
-    # def get_context_data(self, **kwargs):
-    #     context = super(QuizMarkingList, self).get_context_data(**kwargs)
-    #     context['queryset_counter'] = super(QuizMarkingList, self).get_queryset().filter(complete=True).filter(course__allocated_course__lecturer__pk=self.request.user.id).count()
-    #     context['marking_list'] = super(QuizMarkingList, self).get_queryset().filter(complete=True).filter(course__allocated_course__lecturer__pk=self.request.user.id)
-    #     return context
     def get_queryset(self):
-        if self.request.user.is_superuser:
-            queryset = super(QuizMarkingList, self).get_queryset().filter(complete=True)
-        else:
-            queryset = (
-                super(QuizMarkingList, self)
-                .get_queryset()
-                .filter(
-                    quiz__course__allocated_course__lecturer__pk=self.request.user.id
-                )
-                .filter(complete=True)
-            )
+        queryset = (
+            super(QuizMarkingList, self)
+            .get_queryset()
+            .for_marker(self.request.user)
+            .select_related("user", "quiz", "quiz__course")
+        )
 
         # search by user
         user_filter = self.request.GET.get("user_filter")
         if user_filter:
             queryset = queryset.filter(user__username__icontains=user_filter)
 
+        # search by course code or title
+        course_filter = self.request.GET.get("course_filter")
+        if course_filter:
+            queryset = queryset.filter(
+                Q(quiz__course__code__icontains=course_filter)
+                | Q(quiz__course__title__icontains=course_filter)
+            )
+
         return queryset
 
+    def get_context_data(self, **kwargs):
+        sittings, next_cursor = keyset_paginate(
+            self.object_list,
+            cursor=self.request.GET.get("cursor"),
+            per_page=self.page_size,
+        )
+        context = super(QuizMarkingList, self).get_context_data(
+            object_list=sittings, **kwargs
+        )
+        context["sitting_list"] = sittings
+        context["next_cursor"] = next_cursor
+        filters = self.request.GET.copy()
+        filters.pop("cursor", None)
+        context["filter_query"] = filters.urlencode()
+        return context
+
 
 @method_decorator([login_required, lecturer_required], name="dispatch")
 class QuizMarkingDetail(QuizMarkerMixin, DetailView):
     model = Sitting
 
+    def get_queryset(self):
+        return Sitting.objects.for_marker(self.request.user).select_related(
+            "user", "quiz"
+        )
+
     def post(self, request, *args, **kwargs):
         sitting = self.get_object()
 
         q_to_toggle = request.POST.get("qid", None)
         if q_to_toggle:
-            q = Question.objects.get_subclass(id=int(q_to_toggle))
-            if int(q_to_toggle) in sitting.get_incorrect_questions:
-                sitting.remove_incorrect_question(q)
-            else:
-                sitting.add_incorrect_question(q)
+            Sitting.objects.bulk_mark(
+                Sitting.objects.filter(pk=sitting.pk), int(q_to_toggle)
+            )
 
         return self.get(request)
 
     def get_context_data(self, **kwargs):
         context = super(QuizMarkingDetail, self).get_context_data(**kwargs)
         context["questions"] = context["sitting"].get_questions(with_answers=True)
+        context["incorrect_questions"] = set(context["sitting"].get_incorrect_questions)
         return context
 
 
+@login_required
+@lecturer_required
+@require_POST
+def quiz_marking_batch(request):
+    """Mark one question as correct, incorrect or toggled on many sittings"""
+    sitting_ids = [pk for pk in request.POST.getlist("sitting_ids") if pk.isdigit()]
+    question_id = request.POST.get("qid", "")
+    action = request.POST.get("action", "toggle")
+
+    if not sitting_ids or not question_id.isdigit() or action not in MARKING_ACTIONS:
+        messages.error(request, "Select sittings, a question and a marking action.")
+    else:
+        updated = Sitting.objects.bulk_mark(
+            Sitting.objects.for_marker(request.user).filter(pk__in=sitting_ids),
+            int(question_id),
+            correct=MARKING_ACTIONS[action],
+        )
+        messages.success(request, f"{updated} sitting(s) updated.")
+
+    next_url = request.POST.get("next")
+    if not url_has_allowed_host_and_scheme(
+        next_url,
+        allowed_hosts={request.get_host()},
+        require_https=request.is_secure(),
+    ):
+        next_url = "quiz_marking"
+    return redirect(next_url)
+
+
+@login_required
+@lecturer_required
+def essay_suggestions(request, quiz_id):
+    """Review and bulk-accept the essay marks suggested by the grading job"""
+    quiz = get_object_or_404(Quiz, pk=quiz_id)
+    suggestions = EssayGradeSuggestion.objects.filter(
+        sitting__in=Sitting.objects.for_marker(request.user).filter(quiz=quiz),
+        status=PENDING,
+    )
+
+    if request.method == "POST":
+        action = request.POST.get("action", "")
+        # Only the explicit "..._all" actions apply to every pending suggestion
+        apply_to_all = action.endswith("_all")
+        action = action[: -len("_all")] if apply_to_all else action
+        suggestion_ids = [
+            pk for pk in request.POST.getlist("suggestion_ids") if pk.isdigit()
+        ]
+        if action not in ("accept", "reject") or not (apply_to_all or suggestion_ids):
+            messages.error(request, "Select suggestions, or apply to all of them.")
+            return redirect("quiz_essay_suggestions", quiz_id=quiz.pk)
+
+        selected = suggestions
+        if not apply_to_all:
+            selected = selected.filter(pk__in=suggestion_ids)
+        try:
+            min_confidence = float(request.POST.get("min_confidence") or 0)
+        except ValueError:
+            min_confidence = 0
+        selected = selected.filter(confidence__gte=min_confidence)
+
+        if action == "reject":
+            count = selected.update(status=REJECTED)
+            messages.success(request, f"{count} suggestion(s) rejected.")
+        else:
+            count = accept_suggestions(selected)
+            messages.success(request, f"{count} suggestion(s) accepted.")
+        return redirect("quiz_essay_suggestions", quiz_id=quiz.pk)
+
+    return render(
+        request,
+        "quiz/essay_suggestion_list.html",
+        {
+            "quiz": quiz,
+            "suggestions": suggestions.select_related(
+                "sitting__user", "question"
+            ).order_by("-confidence"),
+        },
+    )
+
+
 # @method_decorator([login_required, student_required], name='dispatch')
 @method_decorator([login_required], name="dispatch")
 class QuizTake(FormView):
@@ -282,7 +484,7 @@ class QuizTake(FormView):
     def get_form_kwargs(self):
         kwargs = super(QuizTake, self).get_form_kwargs()
 
-        return dict(kwargs, question=self.question)
+        return dict(kwargs, question=self.question, seed=self.sitting.shuffle_seed)
 
     def form_valid(self, form):
         self.form_valid_user(form)
@@ -321,7 +523,7 @@ class QuizTake(FormView):
                 "previous_answer": guess,
                 "previous_outcome": is_correct,
                 "previous_question": self.question,
-                "answers": self.question.get_choices(),
+                "answers": self.question.get_choices(seed=self.sitting.shuffle_seed),
                 "question_type": {self.question.__class__.__name__: True},
             }
         else:
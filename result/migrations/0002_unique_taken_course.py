@@ -0,0 +1,38 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:59
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def remove_duplicates(apps, schema_editor):
+    """Keep one registration per student and course, the most graded one"""
+    TakenCourse = apps.get_model("result", "TakenCourse")
+    duplicates = (
+        TakenCourse.objects.values("student_id", "course_id")
+        .annotate(rows=Count("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        rows = TakenCourse.objects.filter(
+            student_id=duplicate["student_id"], course_id=duplicate["course_id"]
+        ).order_by("-total", "id")
+        TakenCourse.objects.filter(
+            pk__in=list(rows.values_list("pk", flat=True)[1:])
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("result", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="takencourse",
+            constraint=models.UniqueConstraint(
+                fields=("student", "course"), name="unique_taken_course"
+            ),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_seats(apps, schema_editor):
+    Course = apps.get_model("course", "Course")
+    TakenCourse = apps.get_model("result", "TakenCourse")
+    taken = (
+        TakenCourse.objects.filter(course=OuterRef("pk"))
+        .order_by()
+        .values("course")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    Course.objects.update(seats_taken=Coalesce(Subquery(taken), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("course", "0006_course_capacity_waitlist"),
+        ("result", "0002_unique_taken_course"),
+    ]
+
+    operations = [
+        migrations.RunPython(count_seats, migrations.RunPython.noop),
+    ]
@@ -95,6 +95,13 @@ class TakenCourse(models.Model):
     point = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
     comment = models.CharField(choices=COMMENT, max_length=200, blank=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["student", "course"], name="unique_taken_course"
+            )
+        ]
+
     def get_absolute_url(self):
         return reverse("course_detail", kwargs={"slug": self.course.slug})
 
@@ -1,3 +1,25 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Extraction, SearchDocument
+
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    list_display = ["title", "kind", "updated_at"]
+    list_filter = ["kind"]
+    search_fields = ["title"]
+    readonly_fields = ["content_type", "object_id", "updated_at"]
+
+
+@admin.register(Extraction)
+class ExtractionAdmin(admin.ModelAdmin):
+    list_display = ["upload", "status", "chunks", "extracted_at"]
+    list_filter = ["status"]
+    readonly_fields = [
+        "sha256",
+        "chunks",
+        "error",
+        "queued_at",
+        "claimed_at",
+        "extracted_at",
+    ]
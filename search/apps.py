@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class SearchConfig(AppConfig):
     name = "search"
+
+    def ready(self):
+        # Keep the search index in sync with the indexed models
+        from . import signals  # noqa: F401
@@ -0,0 +1,116 @@
+"""
+Text extraction from uploaded course files.
+
+DOCX, PPTX and XLSX files are zip archives of XML parts and are read with
+the standard library. PDF files need the optional ``pypdf`` package
+(``requirements/pdf.txt``). Nothing here touches Django, so the functions
+can run in a separate worker process.
+"""
+import io
+import re
+import zipfile
+from xml.etree import ElementTree
+
+CHUNK_SIZE = 1000
+MAX_CHUNKS = 200
+# Larger XML parts are not read, against zip bombs
+MAX_PART_SIZE = 20 * 1024 * 1024
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+A = "{http://schemas.openxmlformats.org/drawingml/2006/main}"
+S = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+SLIDE_RE = re.compile(r"ppt/slides/slide(\d+)\.xml$")
+
+
+class UnsupportedFormat(Exception):
+    pass
+
+
+def _part(archive, name):
+    info = archive.getinfo(name)
+    if info.file_size > MAX_PART_SIZE:
+        raise ValueError(f"{name} is too large to extract")
+    return ElementTree.fromstring(archive.read(info))
+
+
+def _paragraphs(root, paragraph_tag, text_tag):
+    for paragraph in root.iter(paragraph_tag):
+        text = "".join(node.text or "" for node in paragraph.iter(text_tag))
+        if text.strip():
+            yield text
+
+
+def docx_text(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        root = _part(archive, "word/document.xml")
+    return "\n".join(_paragraphs(root, f"{W}p", f"{W}t"))
+
+
+def pptx_text(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        slides = sorted(
+            (int(match.group(1)), name)
+            for name in archive.namelist()
+            for match in [SLIDE_RE.match(name)]
+            if match
+        )
+        return "\n".join(
+            paragraph
+            for _, name in slides
+            for paragraph in _paragraphs(_part(archive, name), f"{A}p", f"{A}t")
+        )
+
+
+def xlsx_text(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        if "xl/sharedStrings.xml" not in archive.namelist():
+            return ""
+        root = _part(archive, "xl/sharedStrings.xml")
+    return "\n".join(_paragraphs(root, f"{S}si", f"{S}t"))
+
+
+def pdf_text(data):
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise UnsupportedFormat("pypdf is not installed")
+    reader = PdfReader(io.BytesIO(data))
+    return "\n".join(page.extract_text() or "" for page in reader.pages)
+
+
+EXTRACTORS = {
+    "docx": docx_text,
+    "pptx": pptx_text,
+    "xlsx": xlsx_text,
+    "pdf": pdf_text,
+}
+
+
+def extract_text(data, extension):
+    extractor = EXTRACTORS.get(extension.lower().lstrip("."))
+    if extractor is None:
+        raise UnsupportedFormat(f"No text extractor for .{extension}")
+    return extractor(data)
+
+
+def chunk_text(text, size=CHUNK_SIZE, limit=MAX_CHUNKS):
+    """Split ``text`` into chunks of about ``size`` characters, on whitespace"""
+    chunks = []
+    current = []
+    length = 0
+    for word in text.split():
+        if length + len(word) > size and current:
+            chunks.append(" ".join(current))
+            if len(chunks) == limit:
+                return chunks
+            current, length = [], 0
+        current.append(word)
+        length += len(word) + 1
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def extract_chunks(data, extension):
+    """Entry point of the worker processes"""
+    return chunk_text(extract_text(data, extension))
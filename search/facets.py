@@ -0,0 +1,112 @@
+"""
+Facets of search results.
+
+Every ``SearchDocument`` carries its content type, program, level, semester
+and year. ``facet_counts`` groups the matching documents by all facets at
+once, in the same query that finds them, and splits the groups into counts
+per facet value in Python, so showing the filters costs a single query over
+the match set whatever the number of facets.
+"""
+from collections import Counter, OrderedDict
+
+from django.db.models import Count
+from django.utils.translation import gettext_lazy as _
+
+from course.models import LEVEL, SEMESTER, YEARS, Program
+
+FACETS = OrderedDict(
+    [
+        ("kind", _("Type")),
+        ("program", _("Program")),
+        ("level", _("Level")),
+        ("semester", _("Semester")),
+        ("year", _("Year")),
+    ]
+)
+# Facet -> SearchDocument column
+COLUMNS = {
+    "kind": "kind",
+    "program": "program_id",
+    "level": "level",
+    "semester": "semester",
+    "year": "year",
+}
+KIND_LABELS = {
+    "news": _("News"),
+    "event": _("Event"),
+    "program": _("Program"),
+    "course": _("Course"),
+    "quiz": _("Quiz"),
+    "material": _("Material"),
+}
+
+
+def selected_facets(params):
+    """The facet values chosen in the query string ``params``"""
+    selected = {}
+    for facet, column in COLUMNS.items():
+        value = params.get(facet)
+        if not value:
+            continue
+        if column in ("program_id", "year"):
+            try:
+                value = int(value)
+            except ValueError:
+                continue
+        selected[facet] = value
+    return selected
+
+
+def apply_facets(queryset, selected):
+    return queryset.filter(
+        **{COLUMNS[facet]: value for facet, value in selected.items()}
+    )
+
+
+def _labels(facet, values):
+    if facet == "kind":
+        return {value: KIND_LABELS.get(value, value) for value in values}
+    if facet == "program":
+        return dict(
+            Program.objects.filter(pk__in=values).values_list("pk", "title")
+        )
+    choices = {"level": LEVEL, "semester": SEMESTER, "year": YEARS}[facet]
+    # YEARS repeats some values; the first label wins
+    labels = {}
+    for value, label in choices:
+        labels.setdefault(str(value), label)
+    return {value: labels.get(str(value), value) for value in values}
+
+
+def facet_counts(queryset, selected=None):
+    """
+    ``{facet: [{"value", "label", "count", "selected"}]}`` for the objects
+    matched by ``queryset``, most frequent values first.
+    """
+    selected = selected or {}
+    groups = (
+        queryset.order_by()
+        .values(*COLUMNS.values())
+        .annotate(objects=Count("object_id", distinct=True))
+    )
+    counts = {facet: Counter() for facet in FACETS}
+    for group in groups:
+        for facet, column in COLUMNS.items():
+            if group[column] not in (None, ""):
+                counts[facet][group[column]] += group["objects"]
+
+    facets = OrderedDict()
+    for facet, counter in counts.items():
+        if not counter:
+            continue
+        labels = _labels(facet, list(counter))
+        facets[facet] = [
+            {
+                "value": value,
+                "label": labels.get(value, value),
+                "count": count,
+                "selected": selected.get(facet) == value,
+            }
+            for value, count in counter.most_common()
+        ]
+    return facets
@@ -0,0 +1,125 @@
+"""
+Database full-text backends of the search index.
+
+On PostgreSQL ``search_searchdocument`` gets a generated ``tsvector`` column
+with a GIN index; on SQLite an external content FTS5 table kept in sync by
+triggers. Either way the database maintains the full-text index itself, the
+application only writes ``SearchDocument`` rows. Other databases fall back to
+plain lookups on the index table.
+
+SQLite drops the triggers whenever Django remakes ``search_searchdocument``
+to alter it, so migrations that change the table must call ``install`` again.
+"""
+TABLE = "search_searchdocument"
+FTS_TABLE = "search_searchdocument_fts"
+
+# Title matches weigh more than body matches
+POSTGRESQL_INSTALL = [
+    f"""
+    ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(title, '')), 'A')
+        || setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+    ) STORED
+    """,
+    f"CREATE INDEX IF NOT EXISTS {TABLE}_search_vector ON {TABLE} USING GIN (search_vector)",
+]
+POSTGRESQL_UNINSTALL = [
+    f"DROP INDEX IF EXISTS {TABLE}_search_vector",
+    f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, body, content='{TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_au AFTER UPDATE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+INSTALL_SQL = {"postgresql": POSTGRESQL_INSTALL, "sqlite": SQLITE_INSTALL}
+UNINSTALL_SQL = {"postgresql": POSTGRESQL_UNINSTALL, "sqlite": SQLITE_UNINSTALL}
+
+# Conditions and ranks, each taking the match expression as only parameter
+MATCH_SQL = {
+    "postgresql": f"{TABLE}.search_vector @@ to_tsquery('simple', %s)",
+    "sqlite": f"{TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)",
+}
+RANK_SQL = {
+    "postgresql": f"ts_rank({TABLE}.search_vector, to_tsquery('simple', %s))",
+    # bm25() is lower for better matches
+    "sqlite": (
+        f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+        f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {TABLE}.id"
+    ),
+}
+
+
+def match_expression(vendor, terms):
+    """Query matching all ``terms`` as prefixes; terms are ``\\w+`` words"""
+    if vendor == "postgresql":
+        return " & ".join(f"{term}:*" for term in terms)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def install(schema_editor):
+    for statement in INSTALL_SQL.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+def uninstall(schema_editor):
+    for statement in UNINSTALL_SQL.get(schema_editor.connection.vendor, ()):
+        schema_editor.execute(statement)
+
+
+# Highlighted excerpts; the marks are replaced by HTML once the text is escaped
+START_MARK = "\ue000"
+STOP_MARK = "\ue001"
+SNIPPET_SQL = {
+    "postgresql": (
+        f"SELECT id, ts_headline('simple', body, to_tsquery('simple', %s), "
+        f"'StartSel=\"{START_MARK}\", StopSel=\"{STOP_MARK}\", MaxWords=30, MinWords=12') "
+        f"FROM {TABLE} WHERE id IN ({{ids}})"
+    ),
+    "sqlite": (
+        f"SELECT rowid, snippet({FTS_TABLE}, 1, '{START_MARK}', '{STOP_MARK}', '…', 24) "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid IN ({{ids}})"
+    ),
+}
+
+
+def raw_snippets(connection, ids, terms):
+    """``{document id: excerpt with marks}``, or None without full-text support"""
+    sql = SNIPPET_SQL.get(connection.vendor)
+    if sql is None or not ids:
+        return None
+    sql = sql.format(ids=", ".join(["%s"] * len(ids)))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match_expression(connection.vendor, terms), *ids])
+        return dict(cursor.fetchall())
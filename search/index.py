@@ -0,0 +1,230 @@
+"""
+Maintenance of the unified search index.
+
+``INDEXED_MODELS`` maps each searchable model to the function turning one of
+its objects into the fields of its ``SearchDocument``. Search results are
+ranked and paginated on ``SearchDocument``; ``load_objects`` then fetches the
+objects of one page only, with one query per model. The text of uploaded
+files is added as further chunks of their document by ``search.materials``.
+"""
+
+import re
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, transaction
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from core.models import NewsAndEvents
+from course.models import Course, Program, Upload
+from quiz.models import Quiz
+
+from . import fulltext
+from .models import SearchDocument, query_terms
+
+SNIPPET_LENGTH = 200
+
+BATCH_SIZE = 500
+FACET_FIELDS = ("program_id", "level", "semester", "year")
+
+
+def _join(*parts):
+    return "\n".join(str(part) for part in parts if part)
+
+
+def course_facets(course):
+    if course is None:
+        return {}
+    return {
+        "program_id": course.program_id,
+        "level": course.level or "",
+        "semester": course.semester or "",
+        "year": course.year,
+    }
+
+
+def news_document(news):
+    return {
+        "kind": (news.posted_as or "news").lower(),
+        "title": news.title or "",
+        "body": _join(news.summary, news.posted_as),
+    }
+
+
+def program_document(program):
+    return {
+        "kind": "program",
+        "title": program.title,
+        "body": _join(program.summary),
+        "program_id": program.pk,
+    }
+
+
+def course_document(course):
+    return {
+        "kind": "course",
+        "title": course.title or "",
+        "body": _join(course.code, course.summary, course.slug),
+        **course_facets(course),
+    }
+
+
+def quiz_document(quiz):
+    return {
+        "kind": "quiz",
+        "title": quiz.title,
+        "body": _join(quiz.description, quiz.category, quiz.slug),
+        **course_facets(quiz.course),
+    }
+
+
+def material_document(upload):
+    return {
+        "kind": "material",
+        "title": upload.title,
+        "body": _join(upload.course.title, upload.course.code, upload.file.name),
+        **course_facets(upload.course),
+    }
+
+
+INDEXED_MODELS = {
+    NewsAndEvents: news_document,
+    Program: program_document,
+    Course: course_document,
+    Quiz: quiz_document,
+    Upload: material_document,
+}
+
+# Related objects the search results template shows
+RESULT_RELATED = {
+    Course: ["program"],
+    Quiz: ["course"],
+    Upload: ["course"],
+}
+
+
+def document_fields(instance):
+    fields = INDEXED_MODELS[type(instance)](instance)
+    fields["title"] = fields["title"][:255]
+    return fields
+
+
+def facet_fields(instance):
+    fields = document_fields(instance)
+    return {name: fields[name] for name in FACET_FIELDS if name in fields}
+
+
+def index_object(instance):
+    SearchDocument.objects.update_or_create(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+        chunk=0,
+        defaults=document_fields(instance),
+    )
+
+
+def refresh_course_facets(course):
+    """Copy the facets of ``course`` to the documents of its quizzes and files"""
+    for model, lookup in ((Quiz, "course"), (Upload, "course")):
+        SearchDocument.objects.filter(
+            content_type=ContentType.objects.get_for_model(model),
+            object_id__in=model.objects.filter(**{lookup: course}).values("pk"),
+        ).update(**course_facets(course))
+
+
+def unindex_object(instance):
+    SearchDocument.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance),
+        object_id=instance.pk,
+    ).delete()
+
+
+def rebuild_index(batch_size=BATCH_SIZE):
+    """
+    Recreate the documents of the indexed objects, keeping the extracted
+    file chunks; returns the number of indexed objects.
+    """
+    total = 0
+    with transaction.atomic():
+        SearchDocument.objects.filter(chunk=0).delete()
+        for model in INDEXED_MODELS:
+            content_type = ContentType.objects.get_for_model(model)
+            batch = []
+            instances = model.objects.select_related(*RESULT_RELATED.get(model, ()))
+            for instance in instances.order_by("pk").iterator(batch_size):
+                batch.append(
+                    SearchDocument(
+                        content_type=content_type,
+                        object_id=instance.pk,
+                        **document_fields(instance),
+                    )
+                )
+                if len(batch) >= batch_size:
+                    total += len(SearchDocument.objects.bulk_create(batch))
+                    batch = []
+            total += len(SearchDocument.objects.bulk_create(batch))
+    return total
+
+
+def _python_snippet(body, terms):
+    """Excerpt around the first term, when the database cannot make one"""
+    found = re.search("|".join(re.escape(term) for term in terms), body, re.I)
+    start = max(found.start() - SNIPPET_LENGTH // 2, 0) if found else 0
+    excerpt = body[start : start + SNIPPET_LENGTH]
+    pattern = r"\b(%s)" % "|".join(re.escape(term) for term in terms)
+    return re.sub(
+        pattern, rf"{fulltext.START_MARK}\1{fulltext.STOP_MARK}", excerpt, flags=re.I
+    )
+
+
+def snippets(documents, query, using="default"):
+    """Highlighted excerpts of the file chunks among ``documents``, as HTML"""
+    chunks = [document for document in documents if document.chunk]
+    terms = query_terms(query)
+    if not chunks or not terms:
+        return {}
+    raw = fulltext.raw_snippets(
+        connections[using], [document.pk for document in chunks], terms
+    )
+    if raw is None:
+        raw = {
+            document.pk: _python_snippet(document.body, terms) for document in chunks
+        }
+    return {
+        pk: mark_safe(
+            escape(text)
+            .replace(fulltext.START_MARK, "<mark>")
+            .replace(fulltext.STOP_MARK, "</mark>")
+        )
+        for pk, text in raw.items()
+    }
+
+
+def load_objects(documents, snippet_html=None):
+    """
+    The indexed objects of ``documents``, in the same order. An object
+    matched by several chunks is listed once, with ``search_snippet`` set
+    from its best chunk.
+    """
+    snippet_html = snippet_html or {}
+    documents = list(documents)
+    wanted = {}
+    for document in documents:
+        wanted.setdefault(document.content_type_id, []).append(document.object_id)
+
+    loaded = {}
+    for content_type_id, ids in wanted.items():
+        model = ContentType.objects.get_for_id(content_type_id).model_class()
+        queryset = model.objects.filter(pk__in=set(ids))
+        if model in RESULT_RELATED:
+            queryset = queryset.select_related(*RESULT_RELATED[model])
+        for instance in queryset:
+            loaded[content_type_id, instance.pk] = instance
+
+    objects = []
+    for document in documents:
+        instance = loaded.pop((document.content_type_id, document.object_id), None)
+        if instance is not None:
+            instance.search_snippet = snippet_html.get(document.pk)
+            objects.append(instance)
+    return objects
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from search.materials import BATCH_SIZE, WORKERS, extract_pending, extraction_pool
+
+
+class Command(BaseCommand):
+    help = "Extract the text of uploaded course files into the search index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=WORKERS,
+            help="Number of extraction processes, 0 to extract in this process",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            "--loop",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running, polling the queue every SECONDS when it is idle",
+        )
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        with extraction_pool(options["workers"]) as pool:
+            while True:
+                done, failed = extract_pending(pool, batch_size=options["batch_size"])
+                total_done += done
+                total_failed += failed
+                if done or failed:
+                    continue
+                if not options["loop"]:
+                    break
+                time.sleep(options["loop"])
+
+        self.stdout.write(
+            self.style.SUCCESS(f"{total_done} extracted, {total_failed} failed")
+        )
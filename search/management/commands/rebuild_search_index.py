@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from search.index import BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Recreate the search index from the indexed models"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        total = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"{total} objects indexed"))
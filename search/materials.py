@@ -0,0 +1,201 @@
+"""
+Indexing of the text of uploaded course files.
+
+Saving an ``Upload`` only marks its ``Extraction`` as pending, so the upload
+request never waits for the extraction. ``extract_pending`` claims pending
+files, skips those whose SHA-256 did not change since their last extraction
+and hands the others to a pool of worker processes. The chunks of text they
+return replace the previous chunks of the file in ``SearchDocument``.
+
+Run the ``extract_materials`` command as the extraction worker. With
+``SEARCH_EXTRACTION_AUTO`` (on by default) a process that saves an upload
+also starts one background thread draining the queue.
+"""
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import close_old_connections, connection, transaction
+from django.utils import timezone
+
+from course.models import Upload
+
+from .extraction import UnsupportedFormat, extract_chunks
+from .index import facet_fields
+from .models import (
+    Extraction,
+    SearchDocument,
+    PENDING,
+    RUNNING,
+    DONE,
+    FAILED,
+    UNSUPPORTED,
+)
+
+WORKERS = 2
+# Files of a batch are held in memory until their extraction is submitted
+BATCH_SIZE = 10
+# A file claimed for longer than this belongs to a worker that died.
+CLAIM_TIMEOUT = timedelta(minutes=30)
+
+
+def queue_extraction(upload):
+    Extraction.objects.update_or_create(
+        upload=upload,
+        defaults={"status": PENDING, "queued_at": timezone.now(), "error": ""},
+    )
+    if getattr(settings, "SEARCH_EXTRACTION_AUTO", True):
+        transaction.on_commit(kick_extraction)
+
+
+@contextmanager
+def extraction_pool(workers=WORKERS):
+    """Worker processes for ``extract_pending``; None extracts in-process"""
+    if workers < 1:
+        yield None
+        return
+    # Spawned workers only import search.extraction, not a copy of this process
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        yield pool
+
+
+def _claim(limit, now):
+    Extraction.objects.filter(
+        status=RUNNING, claimed_at__lt=now - CLAIM_TIMEOUT
+    ).update(status=PENDING)
+
+    with transaction.atomic():
+        due = Extraction.objects.filter(status=PENDING)
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        extractions = list(due.order_by("queued_at", "id")[:limit])
+        Extraction.objects.filter(pk__in=[e.pk for e in extractions]).update(
+            status=RUNNING, claimed_at=now
+        )
+    return extractions
+
+
+def _finish(extraction, status, **fields):
+    # A file saved again meanwhile was queued anew and stays pending
+    return Extraction.objects.filter(
+        pk=extraction.pk, status=RUNNING, queued_at=extraction.queued_at
+    ).update(status=status, extracted_at=timezone.now(), **fields)
+
+
+def _chunks(upload):
+    return SearchDocument.objects.filter(
+        content_type=ContentType.objects.get_for_model(Upload),
+        object_id=upload.pk,
+        chunk__gt=0,
+    )
+
+
+def store_chunks(extraction, upload, chunks, sha256):
+    facets = facet_fields(upload)
+    with transaction.atomic():
+        if not _finish(extraction, DONE, sha256=sha256, chunks=len(chunks), error=""):
+            return
+        _chunks(upload).delete()
+        SearchDocument.objects.bulk_create(
+            SearchDocument(
+                content_type=ContentType.objects.get_for_model(Upload),
+                object_id=upload.pk,
+                chunk=number,
+                kind="material",
+                title=upload.title[:255],
+                body=text,
+                **facets,
+            )
+            for number, text in enumerate(chunks, 1)
+        )
+
+
+def _extension(upload):
+    return os.path.splitext(upload.file.name)[1].lstrip(".").lower()
+
+
+def extract_pending(pool=None, batch_size=BATCH_SIZE):
+    """
+    Extract one batch of pending files, in ``pool`` or in-process. Returns
+    ``(done, failed)`` counts; unsupported formats count as done.
+    """
+    extractions = _claim(batch_size, timezone.now())
+    uploads = Upload.objects.select_related("course").in_bulk(
+        [e.upload_id for e in extractions]
+    )
+
+    done = failed = 0
+    jobs = []
+    for extraction in extractions:
+        upload = uploads.get(extraction.upload_id)
+        if upload is None:
+            continue
+        try:
+            with upload.file.open("rb") as file:
+                data = file.read()
+        except (OSError, ValueError) as error:
+            _finish(extraction, FAILED, error=str(error))
+            failed += 1
+            continue
+
+        sha256 = hashlib.sha256(data).hexdigest()
+        if sha256 == extraction.sha256:
+            # Same file as last time, only its title or course may have changed
+            _chunks(upload).update(title=upload.title[:255], **facet_fields(upload))
+            _finish(extraction, DONE)
+            done += 1
+            continue
+
+        arguments = (data, _extension(upload))
+        result = pool.submit(extract_chunks, *arguments) if pool else arguments
+        jobs.append((extraction, upload, sha256, result))
+
+    for extraction, upload, sha256, result in jobs:
+        try:
+            chunks = result.result() if pool else extract_chunks(*result)
+        except UnsupportedFormat as error:
+            _finish(extraction, UNSUPPORTED, error=str(error))
+            done += 1
+        except Exception as error:
+            _finish(extraction, FAILED, error=str(error) or error.__class__.__name__)
+            failed += 1
+        else:
+            store_chunks(extraction, upload, chunks, sha256)
+            done += 1
+    return done, failed
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+class ExtractionThread(threading.Thread):
+    """Drain the extraction queue in the background until it is empty"""
+
+    def __init__(self):
+        threading.Thread.__init__(self, daemon=True)
+
+    def run(self):
+        workers = getattr(settings, "SEARCH_EXTRACTION_WORKERS", WORKERS)
+        try:
+            with extraction_pool(workers) as pool:
+                while extract_pending(pool) != (0, 0):
+                    pass
+        finally:
+            close_old_connections()
+
+
+def kick_extraction():
+    """Start the background extraction thread of this process unless it runs"""
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None or not _extractor.is_alive():
+            _extractor = ExtractionThread()
+            _extractor.start()
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from search import fulltext
+
+
+def install(apps, schema_editor):
+    fulltext.install(schema_editor)
+
+
+def uninstall(apps, schema_editor):
+    fulltext.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("search", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+from search import fulltext
+
+
+def reinstall_fulltext(apps, schema_editor):
+    # SQLite remade search_searchdocument and dropped its triggers
+    fulltext.install(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("course", "0005_videoprogress"),
+        ("search", "0002_fulltext"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Extraction",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                            ("unsupported", "Unsupported format"),
+                        ],
+                        db_index=True,
+                        default="pending",
+                        max_length=20,
+                    ),
+                ),
+                ("sha256", models.CharField(blank=True, max_length=64)),
+                ("chunks", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+                ("queued_at", models.DateTimeField(default=django.utils.timezone.now)),
+                ("claimed_at", models.DateTimeField(blank=True, null=True)),
+                ("extracted_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RemoveConstraint(
+            model_name="searchdocument",
+            name="unique_search_document",
+        ),
+        migrations.AddField(
+            model_name="searchdocument",
+            name="chunk",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddConstraint(
+            model_name="searchdocument",
+            constraint=models.UniqueConstraint(
+                fields=("content_type", "object_id", "chunk"),
+                name="unique_search_document",
+            ),
+        ),
+        migrations.AddField(
+            model_name="extraction",
+            name="upload",
+            field=models.OneToOneField(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="extraction",
+                to="course.upload",
+            ),
+        ),
+        migrations.RunPython(reinstall_fulltext, migrations.RunPython.noop),
+    ]
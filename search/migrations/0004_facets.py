@@ -0,0 +1,49 @@
+# Generated by Django 4.2.16 on 2026-10-19 14:57
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from search import fulltext
+
+
+def reinstall_fulltext(apps, schema_editor):
+    # SQLite remade search_searchdocument and dropped its triggers
+    fulltext.install(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("course", "0005_videoprogress"),
+        ("search", "0003_materials"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="searchdocument",
+            name="level",
+            field=models.CharField(blank=True, max_length=25),
+        ),
+        migrations.AddField(
+            model_name="searchdocument",
+            name="program",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="course.program",
+            ),
+        ),
+        migrations.AddField(
+            model_name="searchdocument",
+            name="semester",
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name="searchdocument",
+            name="year",
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(reinstall_fulltext, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,146 @@
-from django.db import models
+import re
 
-# Create your models here.
+from django.contrib.contenttypes.models import ContentType
+from django.db import connections, models
+from django.utils import timezone
+from django.db.models import (
+    BooleanField,
+    Case,
+    F,
+    FloatField,
+    Q,
+    Value,
+    When,
+    Window,
+)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+
+from . import fulltext
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+UNSUPPORTED = "unsupported"
+EXTRACTION_STATUSES = (
+    (PENDING, "Pending"),
+    (RUNNING, "Running"),
+    (DONE, "Done"),
+    (FAILED, "Failed"),
+    (UNSUPPORTED, "Unsupported format"),
+)
+
+# Longer queries are cut down to this many terms
+MAX_TERMS = 8
+TERM_RE = re.compile(r"\w+")
+
+
+def query_terms(query):
+    return TERM_RE.findall((query or "").lower())[:MAX_TERMS]
+
+
+class SearchDocumentQuerySet(models.QuerySet):
+    def search(self, query):
+        """
+        Documents matching every term of ``query`` as a prefix, annotated with
+        a ``rank`` (higher is better) and ordered by it. An object whose file
+        chunks match several times is only represented by its best document.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return self.none()
+
+        vendor = connections[self.db].vendor
+        if vendor in fulltext.MATCH_SQL:
+            match, rank = fulltext.MATCH_SQL[vendor], fulltext.RANK_SQL[vendor]
+            expression = fulltext.match_expression(vendor, terms)
+            queryset = self.filter(
+                RawSQL(match, (expression,), output_field=BooleanField())
+            ).annotate(rank=RawSQL(rank, (expression,), output_field=FloatField()))
+        else:
+            # No full-text support, match the terms on the index table alone
+            lookups = Q()
+            for term in terms:
+                lookups &= Q(title__icontains=term) | Q(body__icontains=term)
+            queryset = self.filter(lookups).annotate(
+                rank=Case(
+                    When(title__icontains=terms[0], then=Value(1.0)),
+                    default=Value(0.0),
+                    output_field=FloatField(),
+                )
+            )
+        # One row per object, so that counts and pages are in objects
+        best = Window(
+            RowNumber(),
+            partition_by=[F("content_type_id"), F("object_id")],
+            order_by=[F("rank").desc(), F("chunk").asc()],
+        )
+        return (
+            queryset.annotate(object_rank=best)
+            .filter(object_rank=1)
+            .order_by("-rank", "-updated_at", "-id")
+        )
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable object, or one chunk of the text of its file, in the
+    unified search index. Kept up to date by the signal receivers in
+    ``search.signals`` and by ``search.materials``.
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    # 0 for the object itself, 1 and up for the text extracted from its file
+    chunk = models.PositiveIntegerField(default=0)
+    kind = models.CharField(max_length=20, db_index=True)
+    title = models.CharField(max_length=255)
+    body = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Facets, taken from the course the object belongs to
+    program = models.ForeignKey(
+        "course.Program",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+    )
+    level = models.CharField(max_length=25, blank=True)
+    semester = models.CharField(max_length=20, blank=True)
+    year = models.PositiveSmallIntegerField(null=True, blank=True)
+
+    objects = SearchDocumentQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_type", "object_id", "chunk"],
+                name="unique_search_document",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.title}"
+
+
+class Extraction(models.Model):
+    """Text extraction state of one uploaded course file"""
+
+    upload = models.OneToOneField(
+        "course.Upload", on_delete=models.CASCADE, related_name="extraction"
+    )
+    status = models.CharField(
+        max_length=20, choices=EXTRACTION_STATUSES, default=PENDING, db_index=True
+    )
+    # Hash of the file the stored chunks were extracted from
+    sha256 = models.CharField(max_length=64, blank=True)
+    chunks = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    queued_at = models.DateTimeField(default=timezone.now)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    extracted_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.upload_id}: {self.status}"
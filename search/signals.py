@@ -0,0 +1,46 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from course.models import Course, Upload
+
+from .index import INDEXED_MODELS, index_object, refresh_course_facets, unindex_object
+from .materials import queue_extraction
+from .typeahead import TYPEAHEAD_MODELS, typeahead
+
+
+def update_search_document(sender, instance, raw=False, created=False, **kwargs):
+    if not raw:
+        index_object(instance)
+        if sender is Course and not created:
+            refresh_course_facets(instance)
+
+
+def delete_search_document(sender, instance, **kwargs):
+    unindex_object(instance)
+
+
+def update_typeahead(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(partial(typeahead.changed, instance))
+
+
+def delete_typeahead(sender, instance, **kwargs):
+    transaction.on_commit(partial(typeahead.changed, instance, deleted=True))
+
+
+def extract_upload_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue_extraction(instance)
+
+
+for model in INDEXED_MODELS:
+    post_save.connect(update_search_document, sender=model)
+    post_delete.connect(delete_search_document, sender=model)
+
+for model in TYPEAHEAD_MODELS:
+    post_save.connect(update_typeahead, sender=model)
+    post_delete.connect(delete_typeahead, sender=model)
+
+post_save.connect(extract_upload_text, sender=Upload)
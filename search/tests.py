@@ -1,3 +1,357 @@
-from django.test import TestCase
+import io
+import tempfile
+import time
+import zipfile
+from xml.sax.saxutils import escape
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.models import NewsAndEvents
+from course.models import Course, Program, Upload
+from quiz.models import Quiz
+
+from .facets import apply_facets, facet_counts
+from .index import load_objects, rebuild_index, snippets
+from .materials import extract_pending, extraction_pool
+from .models import DONE, UNSUPPORTED, Extraction, SearchDocument
+from .typeahead import PrefixIndex, Typeahead
+from .views import SearchView
+
+# The typeahead version is only read when every process shares them
+shared_cache = override_settings(
+    CACHES={
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": tempfile.mkdtemp(),
+        }
+    }
+)
+
+
+class SearchIndexTests(TestCase):
+    def setUp(self):
+        self.program = Program.objects.create(
+            title="Computer Science", summary="Algorithms and databases"
+        )
+        self.course = Course.objects.create(
+            title="Databases",
+            code="CS301",
+            summary="Relational algebra",
+            program=self.program,
+        )
+        self.quiz = Quiz.objects.create(
+            course=self.course, title="Normal forms", category="exam"
+        )
+        self.news = NewsAndEvents.objects.create(
+            title="Library hours", summary="Open late for exams", posted_as="News"
+        )
+
+    def search(self, query):
+        return [document.title for document in SearchDocument.objects.search(query)]
+
+    def test_signals_keep_the_index_in_sync(self):
+        self.assertEqual(SearchDocument.objects.count(), 4)
+        self.assertEqual(self.search("cs30"), ["Databases"])
+
+        self.course.title = "Data Management"
+        self.course.save()
+        self.assertEqual(self.search("management"), ["Data Management"])
+
+        self.quiz.delete()
+        self.assertEqual(self.search("normal"), [])
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search("databases"), ["Databases", "Computer Science"])
+        self.assertEqual(self.search("exam"), ["Normal forms", "Library hours"])
+        self.assertEqual(self.search("open exam"), ["Library hours"])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_rebuild_restores_missing_documents(self):
+        SearchDocument.objects.all().delete()
+        self.assertEqual(rebuild_index(batch_size=2), 4)
+        self.assertEqual(self.search("library"), ["Library hours"])
+
+    def test_view_loads_only_the_page_objects(self):
+        for n in range(25):
+            Program.objects.create(title=f"Program {n}")
+        request = RequestFactory().get("/search/", {"q": "program"})
+        view = SearchView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+
+        # count, page of documents, programs, facet groups, program labels
+        with self.assertNumQueries(5):
+            context = view.get_context_data()
+        self.assertEqual(context["count"], 25)
+        self.assertEqual(len(context["object_list"]), 20)
+        self.assertIsInstance(context["object_list"][0], Program)
+
+
+class TypeaheadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.program = Program.objects.create(title="Computer Science")
+        self.course = Course.objects.create(
+            title="Databases", code="CS301", program=self.program
+        )
+        Quiz.objects.create(course=self.course, title="Database design")
+        self.typeahead = Typeahead()
+
+    def labels(self, prefix, typeahead=None):
+        return [
+            entry["label"] for entry in (typeahead or self.typeahead).search(prefix)
+        ]
+
+    def test_matches_labels_words_and_codes(self):
+        self.assertEqual(self.labels("data"), ["Database design", "Databases (CS301)"])
+        self.assertEqual(self.labels("cs3"), ["Databases (CS301)"])
+        self.assertEqual(self.labels("Sci"), ["Computer Science"])
+        self.assertEqual(self.labels("computer s"), ["Computer Science"])
+        self.assertEqual(self.labels("x"), [])
+
+    def test_rebuild_sorts_once_like_single_adds(self):
+        entries = [
+            ((kind, n), {"label": f"{kind} {n} title"}, [f"K{n}"])
+            for kind in ("course", "quiz")
+            for n in range(50)
+        ]
+        built = PrefixIndex.build(entries)
+        added = PrefixIndex()
+        for entry in reversed(entries):
+            added.add(*entry)
+
+        self.assertEqual(built._pairs, added._pairs)
+        self.assertEqual(len(built), 100)
+        self.assertEqual(built.search("k4", limit=2), added.search("k4", limit=2))
+
+    def test_lookups_stay_in_memory(self):
+        self.labels("data")
+        prefixes = ["d", "da", "dat", "cs", "c", "comp", "q", "database d"]
+        timings = []
+        with self.assertNumQueries(0):
+            for n in range(500):
+                started = time.perf_counter()
+                self.labels(prefixes[n % len(prefixes)])
+                timings.append(time.perf_counter() - started)
+        timings.sort()
+        self.assertLess(timings[int(len(timings) * 0.99)], 0.01)
+
+    @shared_cache
+    def test_changes_are_applied_in_place_and_seen_by_other_processes(self):
+        other = Typeahead()
+        self.labels("data")
+        self.labels("data", other)
+
+        course = Course.objects.create(
+            title="Data Mining", code="CS402", program=self.program
+        )
+        self.typeahead.changed(course)
+        with self.assertNumQueries(0):
+            self.assertIn("Data Mining (CS402)", self.labels("data"))
+        # The other index is rebuilt because the shared version moved on
+        self.assertIn("Data Mining (CS402)", self.labels("data", other))
+
+        self.typeahead.changed(course, deleted=True)
+        with self.assertNumQueries(0):
+            self.assertNotIn("Data Mining (CS402)", self.labels("data"))
+
+    def test_local_cache_indexes_expire(self):
+        expiring = Typeahead(local_max_age=0)
+        self.labels("data")
+        self.labels("data", expiring)
+
+        # Saved by another process, which cannot bump a local version
+        Course.objects.create(title="Data Mining", code="CS402", program=self.program)
+        self.assertNotIn("Data Mining (CS402)", self.labels("data"))
+        self.assertIn("Data Mining (CS402)", self.labels("data", expiring))
+
+
+def docx(*paragraphs):
+    body = "".join(
+        f"<w:p><w:r><w:t>{escape(text)}</w:t></w:r></w:p>" for text in paragraphs
+    )
+    data = io.BytesIO()
+    with zipfile.ZipFile(data, "w") as archive:
+        archive.writestr(
+            "word/document.xml",
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/'
+            f'wordprocessingml/2006/main"><w:body>{body}</w:body></w:document>',
+        )
+    return data.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class MaterialTests(TestCase):
+    def setUp(self):
+        program = Program.objects.create(title="Biology")
+        self.course = Course.objects.create(
+            title="Plants", code="BIO1", program=program
+        )
+        self.upload = Upload.objects.create(
+            title="Week 1",
+            course=self.course,
+            file=SimpleUploadedFile(
+                "week1.docx", docx("Light reactions", "Photosynthesis <b>& water")
+            ),
+        )
+
+    def search(self, query):
+        documents = list(SearchDocument.objects.search(query))
+        return load_objects(documents, snippets(documents, query))
+
+    def test_file_text_is_searchable_with_highlights(self):
+        self.assertEqual(Extraction.objects.get().status, "pending")
+        self.assertEqual(self.search("photosynthesis"), [])
+
+        with extraction_pool(1) as pool:
+            self.assertEqual(extract_pending(pool), (1, 0))
+
+        [result] = self.search("photosynth")
+        self.assertEqual(result, self.upload)
+        self.assertIn("<mark>Photosynthesis</mark>", result.search_snippet)
+        self.assertIn("&lt;b&gt;&amp;", result.search_snippet)
+
+    def test_matching_chunks_of_a_file_are_one_result(self):
+        extract_pending()
+        content_type = ContentType.objects.get_for_model(Upload)
+        SearchDocument.objects.bulk_create(
+            SearchDocument(
+                content_type=content_type,
+                object_id=self.upload.pk,
+                chunk=chunk,
+                kind="material",
+                title="Week 1",
+                body=f"Chlorophyll, part {chunk}",
+            )
+            for chunk in range(2, 47)
+        )
+        request = RequestFactory().get("/search/", {"q": "chlorophyll"})
+        view = SearchView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        context = view.get_context_data()
+
+        self.assertEqual(context["count"], 1)
+        [result] = context["object_list"]
+        self.assertEqual(result, self.upload)
+        self.assertIn("<mark>Chlorophyll</mark>", result.search_snippet)
+        [kind] = context["facets"]["kind"]
+        self.assertEqual(kind["count"], 1)
+
+    def test_anonymous_search_shows_no_file_text(self):
+        with extraction_pool(1) as pool:
+            extract_pending(pool)
+        request = RequestFactory().get("/search/", {"q": "photosynthesis"})
+        request.user = AnonymousUser()
+
+        response = SearchView.as_view()(request)
+
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(b"hotosynthesis", response.content)
+
+    def test_unchanged_files_are_not_extracted_again(self):
+        extract_pending()
+        self.upload.title = "Week one"
+        self.upload.save()
+
+        # claim (5 with the savepoint), upload, chunk titles, status
+        with self.assertNumQueries(8):
+            self.assertEqual(extract_pending(), (1, 0))
+        extraction = Extraction.objects.get()
+        self.assertEqual((extraction.status, extraction.chunks), (DONE, 1))
+        self.assertEqual(
+            set(
+                SearchDocument.objects.filter(kind="material").values_list(
+                    "title", flat=True
+                )
+            ),
+            {"Week one"},
+        )
+
+    def test_unsupported_formats_keep_the_title_document(self):
+        Upload.objects.create(
+            title="Archive",
+            course=self.course,
+            file=SimpleUploadedFile("notes.zip", b"PK"),
+        )
+        extract_pending()
+        self.assertEqual(
+            Extraction.objects.get(upload__title="Archive").status, UNSUPPORTED
+        )
+        self.assertEqual(
+            [upload.title for upload in self.search("archive")], ["Archive"]
+        )
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        self.science = Program.objects.create(title="Science")
+        self.arts = Program.objects.create(title="Arts")
+        self.chemistry = Course.objects.create(
+            title="Lab basics",
+            code="CH1",
+            program=self.science,
+            year=1,
+            level="Bachelor",
+            semester="First",
+        )
+        Course.objects.create(
+            title="Lab advanced",
+            code="CH2",
+            program=self.science,
+            year=2,
+            level="Master",
+            semester="Second",
+        )
+        Course.objects.create(
+            title="Lab painting",
+            code="AR1",
+            program=self.arts,
+            year=1,
+            level="Bachelor",
+            semester="First",
+        )
+        Quiz.objects.create(course=self.chemistry, title="Lab safety")
+
+    def counts(self, facets, facet):
+        return {value["label"]: value["count"] for value in facets[facet]}
+
+    def test_counts_come_from_one_grouped_query(self):
+        matches = SearchDocument.objects.search("lab")
+        # facet groups, program labels
+        with self.assertNumQueries(2):
+            facets = facet_counts(matches)
+        self.assertEqual(self.counts(facets, "kind"), {"Course": 3, "Quiz": 1})
+        self.assertEqual(self.counts(facets, "program"), {"Science": 3, "Arts": 1})
+        self.assertEqual(self.counts(facets, "year"), {"1": 3, "2": 1})
+        self.assertEqual(
+            self.counts(facets, "level"), {"Bachelor Degree": 3, "Master Degree": 1}
+        )
+
+        selected = {"program": self.science.pk, "year": 1}
+        narrowed = apply_facets(matches, selected)
+        self.assertEqual(
+            [document.title for document in narrowed], ["Lab safety", "Lab basics"]
+        )
+        facets = facet_counts(narrowed, selected)
+        self.assertEqual(
+            facets["program"],
+            [
+                {
+                    "value": self.science.pk,
+                    "label": "Science",
+                    "count": 2,
+                    "selected": True,
+                }
+            ],
+        )
+
+    def test_course_changes_move_their_quizzes(self):
+        self.chemistry.program = self.arts
+        self.chemistry.save()
+        facets = facet_counts(SearchDocument.objects.search("safety"))
+        self.assertEqual(self.counts(facets, "program"), {"Arts": 1})
@@ -0,0 +1,240 @@
+"""
+In-memory typeahead over course codes and titles, program names and quiz
+titles.
+
+Every process keeps a ``PrefixIndex``: a sorted array of ``(key, entry)``
+pairs searched with ``bisect``, where the keys of an entry are its whole
+label, each word of it and, for courses, the code. Hot queries are answered
+from a small LRU cache in front of it, so a lookup does not touch the
+database.
+
+Saves and deletes update the index of the process that made them after the
+commit and bump a version number in the shared cache. Other processes see
+the new version on their next lookup and rebuild their index from the
+database. Without a shared cache they cannot see it, so an index is only
+used for ``SEARCH_TYPEAHEAD_LOCAL_MAX_AGE`` seconds before it is rebuilt.
+"""
+
+import bisect
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import NoReverseMatch
+
+from core.utils import cache_is_shared
+from course.models import Course, Program
+from quiz.models import Quiz
+
+VERSION_CACHE_KEY = "search:typeahead:version"
+LIMIT = 10
+MAX_LIMIT = 20
+LRU_SIZE = 1024
+LOCAL_MAX_AGE = 60
+WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def _url(instance):
+    try:
+        return instance.get_absolute_url()
+    except NoReverseMatch:
+        # The app of this object is not routed in this deployment
+        return None
+
+
+def program_entry(program):
+    return {"label": program.title, "url": _url(program)}, []
+
+
+def course_entry(course):
+    return {"label": str(course), "url": _url(course)}, [course.code]
+
+
+def quiz_entry(quiz):
+    url = _url(quiz) if quiz.course_id else None
+    return {"label": quiz.title, "url": url}, []
+
+
+TYPEAHEAD_MODELS = {
+    Program: ("program", program_entry, []),
+    Course: ("course", course_entry, []),
+    Quiz: ("quiz", quiz_entry, ["course"]),
+}
+
+
+class PrefixIndex:
+    """Sorted ``(key, entry id)`` pairs for prefix lookups"""
+
+    def __init__(self):
+        self._pairs = []
+        self._entries = {}
+        self._keys = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _keys_of(entry, extra_keys):
+        label = normalize(entry["label"])
+        keys = {label, *WORD_RE.findall(label)}
+        keys.update(normalize(key) for key in extra_keys if key)
+        keys.discard("")
+        return keys
+
+    @classmethod
+    def build(cls, entries):
+        """An index of ``(entry id, entry, extra keys)`` sorted once"""
+        index = cls()
+        for entry_id, entry, extra_keys in entries:
+            keys = cls._keys_of(entry, extra_keys)
+            index._pairs.extend((key, entry_id) for key in keys)
+            index._entries[entry_id] = entry
+            index._keys[entry_id] = keys
+        index._pairs.sort()
+        return index
+
+    def add(self, entry_id, entry, extra_keys=()):
+        self.remove(entry_id)
+        keys = self._keys_of(entry, extra_keys)
+        for key in keys:
+            bisect.insort(self._pairs, (key, entry_id))
+        self._entries[entry_id] = entry
+        self._keys[entry_id] = keys
+
+    def remove(self, entry_id):
+        for key in self._keys.pop(entry_id, ()):
+            index = bisect.bisect_left(self._pairs, (key, entry_id))
+            if index < len(self._pairs) and self._pairs[index] == (key, entry_id):
+                del self._pairs[index]
+        self._entries.pop(entry_id, None)
+
+    def search(self, prefix, limit=LIMIT):
+        """
+        Entries with a key starting with ``prefix``; those whose label starts
+        with it come first, then shorter labels.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = {}
+        index = bisect.bisect_left(self._pairs, (prefix,))
+        # Bound the scan for very short prefixes
+        while index < len(self._pairs) and len(found) < limit * 5:
+            key, entry_id = self._pairs[index]
+            if not key.startswith(prefix):
+                break
+            found.setdefault(entry_id, self._entries[entry_id])
+            index += 1
+        ranked = sorted(
+            found.values(),
+            key=lambda entry: (
+                not normalize(entry["label"]).startswith(prefix),
+                len(entry["label"]),
+                entry["label"],
+            ),
+        )
+        return ranked[:limit]
+
+
+class Typeahead:
+    def __init__(self, lru_size=LRU_SIZE, local_max_age=LOCAL_MAX_AGE):
+        self.lru_size = lru_size
+        self.local_max_age = local_max_age
+        self._lock = threading.Lock()
+        self._index = None
+        self._version = None
+        self._loaded_at = None
+        self._lru = OrderedDict()
+
+    def _load(self):
+        return PrefixIndex.build(
+            self._entry(kind, instance, entry)
+            for model, (kind, entry, related) in TYPEAHEAD_MODELS.items()
+            for instance in model.objects.select_related(*related).iterator()
+        )
+
+    @staticmethod
+    def _entry(kind, instance, entry):
+        fields, extra_keys = entry(instance)
+        return (
+            (kind, instance.pk),
+            {"kind": kind, "id": instance.pk, **fields},
+            extra_keys,
+        )
+
+    def _is_current(self, version):
+        if self._index is None or self._version != version:
+            return False
+        # A local version is never bumped by other processes
+        return version is not None or (
+            time.monotonic() - self._loaded_at < self.local_max_age
+        )
+
+    def _current_index(self):
+        version = None
+        if cache_is_shared():
+            cache.add(VERSION_CACHE_KEY, 0, None)
+            version = cache.get(VERSION_CACHE_KEY)
+        with self._lock:
+            if self._is_current(version):
+                return self._index
+        # Rebuild outside the lock; the version is read before the data
+        loaded_at = time.monotonic()
+        index = self._load()
+        with self._lock:
+            self._index, self._version = index, version
+            self._loaded_at = loaded_at
+            self._lru.clear()
+            return index
+
+    def search(self, prefix, limit=LIMIT):
+        index = self._current_index()
+        key = (normalize(prefix), limit)
+        with self._lock:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                return self._lru[key]
+            results = index.search(*key)
+            self._lru[key] = results
+            if len(self._lru) > self.lru_size:
+                self._lru.popitem(last=False)
+            return results
+
+    def changed(self, instance, deleted=False):
+        """Apply a committed save or delete of ``instance``"""
+        shared = cache_is_shared()
+        version = None
+        if shared:
+            cache.add(VERSION_CACHE_KEY, 0, None)
+            try:
+                version = cache.incr(VERSION_CACHE_KEY)
+            except ValueError:
+                pass
+        kind, entry, _ = TYPEAHEAD_MODELS[type(instance)]
+        added = None if deleted else self._entry(kind, instance, entry)
+        with self._lock:
+            if self._index is None:
+                return
+            if shared and (version is None or self._version != version - 1):
+                # Other changes were missed, rebuild on the next lookup
+                self._index = None
+                return
+            if deleted:
+                self._index.remove((kind, instance.pk))
+            else:
+                self._index.add(*added)
+            self._version = version
+            self._lru.clear()
+
+
+typeahead = Typeahead(
+    getattr(settings, "SEARCH_TYPEAHEAD_LRU_SIZE", LRU_SIZE),
+    getattr(settings, "SEARCH_TYPEAHEAD_LOCAL_MAX_AGE", LOCAL_MAX_AGE),
+)
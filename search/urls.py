@@ -1,6 +1,7 @@
 from django.urls import path
-from .views import SearchView
+from .views import SearchView, typeahead_api
 
 urlpatterns = [
     path("", SearchView.as_view(), name="query"),
+    path("typeahead/", typeahead_api, name="typeahead"),
 ]
@@ -1,38 +1,66 @@
-from itertools import chain
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_GET
 from django.views.generic import ListView
-from core.models import NewsAndEvents
-from course.models import Program, Course
-from quiz.models import Quiz
 
+from .facets import apply_facets, facet_counts, selected_facets
+from .index import load_objects, snippets
+from .models import SearchDocument
+from .typeahead import LIMIT, MAX_LIMIT, typeahead
 
+
+# Results include excerpts of the uploaded course files, which are only
+# available to signed in users
+@method_decorator(login_required, name="dispatch")
 class SearchView(ListView):
     template_name = "search/search_view.html"
     paginate_by = 20
-    count = 0
 
     def get_context_data(self, *args, **kwargs):
         context = super().get_context_data(*args, **kwargs)
-        context["count"] = self.count or 0
+        paginator = context["paginator"]
+        context["count"] = paginator.count if paginator else 0
         context["query"] = self.request.GET.get("q")
+        # Only the objects of the current page are loaded
+        documents = list(context["object_list"])
+        context["object_list"] = load_objects(
+            documents, snippets(documents, context["query"])
+        )
+        context["facets"] = self.get_facets()
+        params = self.request.GET.copy()
+        params.pop("page", None)
+        context["page_query"] = params.urlencode()
         return context
 
     def get_queryset(self):
-        request = self.request
-        query = request.GET.get("q", None)
-
+        query = self.request.GET.get("q", None)
+        self.selected = selected_facets(self.request.GET)
         if query is not None:
-            news_events_results = NewsAndEvents.objects.search(query)
-            program_results = Program.objects.search(query)
-            course_results = Course.objects.search(query)
-            quiz_results = Quiz.objects.search(query)
-
-            # combine querysets
-            queryset_chain = chain(
-                news_events_results, program_results, course_results, quiz_results
-            )
-            queryset = sorted(
-                queryset_chain, key=lambda instance: instance.pk, reverse=True
-            )
-            self.count = len(queryset)  # since queryset is actually a list
-            return queryset
-        return NewsAndEvents.objects.none()  # just an empty queryset as default
+            return apply_facets(SearchDocument.objects.search(query), self.selected)
+        return SearchDocument.objects.none()
+
+    def get_facets(self):
+        """Facet counts of the results, each value with the URL toggling it"""
+        facets = facet_counts(self.object_list, self.selected)
+        for facet, values in facets.items():
+            for value in values:
+                params = self.request.GET.copy()
+                params.pop("page", None)
+                if value["selected"]:
+                    params.pop(facet, None)
+                else:
+                    params[facet] = value["value"]
+                value["url"] = "?" + params.urlencode()
+        return facets
+
+
+@require_GET
+def typeahead_api(request):
+    """Suggestions for the prefix ``q``, answered from memory"""
+    query = request.GET.get("q", "")
+    try:
+        limit = min(max(int(request.GET.get("limit", LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        limit = LIMIT
+    return JsonResponse({"query": query, "results": typeahead.search(query, limit)})